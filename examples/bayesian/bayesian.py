@@ -1,7 +1,12 @@
-from GPyOpt.methods import BayesianOptimization
-
-from morpheus.molecule import Smiles, Molecule
-from morpheus.reaction import ReactionTemplate, Reaction
+# searches the NHCs of lowest CO2 addition ΔG with batch bayesian optimization, instead of calculating all of them
+#
+# the same as the command
+#   morpheus -S "<SMARTS>" -sf examples/bayesian/data/nhc.smiles "" -s "" "O=C=O" -gfn 0 --solvent dmso \
+#       -cs -csm rdkit -csl 200 -f csv -o nhc optimize --iterations 20
+
+from morpheus.molecule import Smiles
+from morpheus.optimize import BatchOptimizer
+from morpheus.reaction import ReactionTemplate
 from morpheus.simulation import Simulation
 from morpheus.simulation.options import (
     SimulationOptions,
@@ -11,54 +16,32 @@ from morpheus.simulation.options import (
     Solvent,
 )
 
-smiles_file = open("examples/bayesian/data/nhc.smiles", "r")
-
 smiles_list = []
-for line in smiles_file:
+for line in open("examples/bayesian/data/nhc.smiles", "r"):
     try:
-        smiles_list.append(Smiles(line))
-    except:
-      pass
-
-bounds = [{"name": "index", "type": "continuous", "domain": (0, len(smiles_list) - 1)}]
-
+        smiles_list.append(Smiles(line.strip()))
+    except ValueError:
+        pass
 
 co2_addition = ReactionTemplate(
-    r"[#6-;v3;D2:1]~1~[#7+;v4:2]~[$([#6;v4]),$([#7;v3]):3]~[$([#6;v4;X3]),$([#7;v3;X2]):4]~[$([#7;v3]),$([#16;v2]):5]1>>[#6+0;v4;X3:1](C(=O)[O-])-1=[#7+;v4;X3:2]-[$([#6;v4;X3]),$([#7;v3;X2]):3]=[$([#6;v4;X3]),$([#7;v3;X2]):4]-[$([#7;v3]),$([#16;v2]):5]1"
+    r"[#6-;v3;D2:1]~1~[#7+;v4:2]~[$([#6;v4]),$([#7;v3]):3]~[$([#6;v4;X3]),$([#7;v3;X2]):4]~[$([#7;v3]),$([#16;v2]):5]1.[#8:6]=[#6:7]=[#8:8]>>[#6+0;v4;X3:1](-[#6:7](=[#8:6])-[#8-:8])-1=[#7+;v4;X3:2]-[$([#6;v4;X3]),$([#7;v3;X2]):3]=[$([#6;v4;X3]),$([#7;v3;X2]):4]-[$([#7;v3]),$([#16;v2]):5]1"
 )
 
 options = SimulationOptions(
     gfn_level=GFNLevel.GFN0,
-    xtb_cores=12,
+    xtb_cores=2,
     solvent=Solvent.DMSO,
     conformer_search_options=ConformerSearchOptions(
         method=ConformerSearchMethod.RDKIT, rdkit_level=200
     ),
 )
 
-simulation = Simulation(options)
-
-co2 = Molecule(Smiles("O=C=O"))
-delta_g_co2 = simulation.calculate_delta_g(co2)
-
-def objective(params) -> float:
-    i = int(params[0][0])
-    r = Reaction(co2_addition)
-    r.add_reactants([smiles_list[i]])
-    r.run_reaction()
-    if r.products:
-        delta_g = simulation.calculate_delta_g(r.products[0])-delta_g_co2
-        return delta_g
-    return 2**308
-
-
-optimizer = BayesianOptimization(
-    f=objective, domain=bounds, model_type="GP", initial_design_numdata=5
-)
-optimizer.run_optimization(max_iter=int(len(smiles_list)/10))
-
-print(optimizer.x_opt)
-print(smiles_list[int(optimizer.x_opt[0])])
-print(optimizer.fx_opt)
+# a batch is calculated in parallel on every core, CO2 is calculated once and then read from the cache
+optimizer = BatchOptimizer(co2_addition, [smiles_list, [Smiles("O=C=O")]], Simulation(options), seed=0)
+for step in optimizer.run(iterations=20):
+    best = step.best
+    print(f"batch {step.iteration}: {step.calculated} calculated, best {best.reactants[0] if best else None} {best.delta_g if best else None}")
 
-print(len(optimizer.get_evaluations()))
\ No newline at end of file
+best = optimizer.best()
+print(best.reactants[0], best.products, best.delta_g)
+print(f"{len(optimizer.results)} of {len(optimizer.candidate_combinations)} reactions calculated")
@@ -0,0 +1,70 @@
+"""
+Compares the per-conformer UFF loop, which `Molecule.optimize_molecule_rdkit` used
+before, with the bulk multi-threaded RDKit calls it uses now.
+
+usage: python conformers.py [SMILES ...] [--conformers N] [--threads N] [--repeat N]
+"""
+import argparse
+import os
+import time
+
+import rdkit.Chem as _rdc
+from rdkit.Chem import AllChem as _rdca
+
+# NHC catalysts and substrates of the examples
+DEFAULT_SMILES = [
+    "CC(C)(C)N1C=C[N+](=C1)C(C)(C)C",
+    "CC1=CC(=C(C(=C1)C)N2C=C[N+](=C2)C3=C(C=C(C=C3)C)C)C",
+    "C(O)(C=C)1CC2CCC1C=C2",
+    "CCCCCCCCC(=O)OCC(C)C",
+]
+
+
+def loop(smiles: str, conformers: int) -> float:
+    mol = _rdc.AddHs(_rdc.MolFromSmiles(smiles))
+    conformer_ids = _rdca.EmbedMultipleConfs(mol, numConfs=conformers, params=_rdca.ETDG())
+    energies = []
+    for conf_id in conformer_ids:
+        _rdca.UFFOptimizeMolecule(mol, confId=conf_id)
+        energies.append(_rdca.UFFGetMoleculeForceField(mol, confId=conf_id).CalcEnergy())
+    return min(energies)
+
+
+def bulk(smiles: str, conformers: int, threads: int) -> float:
+    mol = _rdc.AddHs(_rdc.MolFromSmiles(smiles))
+    params = _rdca.ETDG()
+    params.numThreads = threads
+    _rdca.EmbedMultipleConfs(mol, numConfs=conformers, params=params)
+    return min(energy for _not_converged, energy in _rdca.UFFOptimizeMoleculeConfs(mol, numThreads=threads))
+
+
+def measure(function, repeat: int, *args) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        energy = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), energy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("smiles", nargs="*", default=DEFAULT_SMILES)
+    parser.add_argument("--conformers", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.conformers} conformers, {args.threads} threads, best of {args.repeat}")
+    print(f"{'SMILES':<56}{'loop (s)':>10}{'bulk (s)':>10}{'speedup':>9}{'ΔE min (kcal/mol)':>20}")
+    for smiles in args.smiles:
+        loop_time, loop_energy = measure(loop, args.repeat, smiles, args.conformers)
+        bulk_time, bulk_energy = measure(bulk, args.repeat, smiles, args.conformers, args.threads)
+        print(
+            f"{smiles:<56}{loop_time:>10.2f}{bulk_time:>10.2f}{loop_time / bulk_time:>8.1f}x"
+            f"{bulk_energy - loop_energy:>20.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Counts the RDKit parses and SMILES writes per reaction of a small screen, with the
+shared `MoleculeRegistry` and with the registry disabled (`maxsize` 0, every lookup
+parses again). The disabled row is not the code before the registry, it only shows
+what the interning saves on the current code path.
+
+Every reaction is enumerated like a worker of `ReactionPipeline` does, and the keys,
+prepared molecules and comparisons of its species are taken as a calculation would.
+
+usage: python registry.py [--repeat N]
+"""
+import argparse
+import collections
+import time
+
+import rdkit.Chem as _rdc
+
+from morpheus.molecule import Molecule, MoleculeRegistry, Smiles
+from morpheus.reaction import Reaction, ReactionTemplate, unique_outcomes
+
+TEMPLATE = r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]"
+CARBONYLS = ["C=O", "CC=O", "CCC=O", "CC(C)=O", "O=Cc1ccccc1", "CC(=O)c1ccccc1", "O=C1CCCCC1"]
+NUCLEOPHILES = ["O", "CO", "CCO", "OCCO"]
+COUNTED = ["MolFromSmiles", "MolToSmiles", "AddHs"]
+
+
+def count_calls() -> collections.Counter:
+    counts = collections.Counter()
+    for name in COUNTED:
+        function = getattr(_rdc, name)
+
+        def counted(*args, __function=function, __name=name, **kwargs):
+            counts[__name] += 1
+            return __function(*args, **kwargs)
+
+        setattr(_rdc, name, counted)
+    return counts
+
+
+def screen(template: ReactionTemplate):
+    for carbonyl in CARBONYLS:
+        for nucleophile in NUCLEOPHILES:
+            reaction = Reaction(template)
+            reaction.add_reactants([Smiles(carbonyl), Smiles(nucleophile)])
+            reaction.run_reaction()
+            outcome = unique_outcomes(reaction.products)[0]
+            species = outcome.reactants + outcome.products
+            # cache keys are looked up before and after a calculation
+            for molecule in species:
+                molecule.canonical, molecule.canonical
+                molecule.prepared_molecule
+            assert species[0] == Molecule(Smiles(carbonyl))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    template = ReactionTemplate(TEMPLATE)
+    reactions = len(CARBONYLS) * len(NUCLEOPHILES) * args.repeat
+    counts = count_calls()
+    registry = MoleculeRegistry.shared()
+
+    print(f"{reactions} reactions")
+    print(f"{'':<18}" + "".join(f"{name:>15}" for name in COUNTED) + f"{'time (ms)':>12}")
+    for label, maxsize in [("registry disabled", 0), ("registry", registry.maxsize)]:
+        registry.maxsize = maxsize
+        registry.clear()
+        counts.clear()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            screen(template)
+        elapsed = (time.perf_counter() - start) / reactions * 1000
+        print(f"{label:<18}" + "".join(f"{counts[name] / reactions:>15.2f}" for name in COUNTED) + f"{elapsed:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
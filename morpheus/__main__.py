@@ -1,19 +1,24 @@
-from pathlib import Path
-from typing import Callable
-import threading
 import os
 import sys
+import time
 
 from morpheus.cli.parser import parser
-from morpheus.cli.helper import chunk_into_n, flatten, get_combinations
+from morpheus.cli.helper import get_combinations
 
-from morpheus.reaction import Reaction
+from morpheus.scheduler import ReactionPipeline, ReactionResult
+from morpheus.scheduler.pipeline import solvent_name
+from morpheus.scheduler.distributed import DistributedPipeline, JobBoard, serve
 
+from morpheus.optimize import BatchOptimizer, SpeciesSurrogate
 from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.thermo import TemperatureScan
+from morpheus.simulation.workspace import collect_garbage
 
 from morpheus.utils.information import MORPHEUS
 from morpheus.utils.units import EnergyUnit, EnergyValue
 from morpheus.cli.output import Output
+from morpheus.cli.checkpoint import Checkpoint, run_fingerprint
 
 from morpheus.cli.fancy_prints import (
     log,
@@ -45,61 +50,120 @@ class Logger(object):
         for f in self.files:
             f.flush()
 
+def optimize(parsed_options, options: SimulationOptions, output: Output, report):
+    """search the reactions of lowest ΔG with batch bayesian optimization instead of calculating all"""
+    settings = parsed_options.optimize
+    optimizer = BatchOptimizer(
+        parsed_options.reaction,
+        parsed_options.reactants,
+        Simulation(options),
+        batch_size=settings.batch_size,
+        features=settings.features,
+        seed=settings.seed,
+        prefilter=parsed_options.prefilter,
+    )
+    log(
+        f"Optimizing over {bold(len(optimizer.candidate_combinations), 'yellow')} reactions "
+        f"in batches of {bold(optimizer.batch_size, 'blue')} with {bold(settings.features, 'blue')} features"
+    )
+    for step in optimizer.run(settings.iterations, settings.initial):
+        for reaction_result in step.reactions:
+            report(reaction_result)
+        best = step.best
+        log(
+            f"Batch {bold(step.iteration, 'yellow')}: {bold(step.calculated, 'yellow')} reactions calculated "
+            f"in total, {step.wall_time:.1f}s"
+            + (
+                f", best ΔG{bold(subscript_number(best.index + 1), color='yellow')} = "
+                f"{bold(EnergyValue(best.delta_g, EnergyUnit.Eh).to(EnergyUnit.kJMol), color='magenta')}"
+                if best
+                else ""
+            )
+        )
+
+    best = optimizer.best()
+    if best:
+        result(
+            f"Lowest ΔG{bold(subscript_number(best.index + 1), color='yellow')}: "
+            f"{' . '.join(best.reactants)} >> {' . '.join(best.products)}"
+        )
+
+
 def main():
     logger = Logger()
 
-    def start_thread(*args) -> threading.Thread:
-        thread = threading.Thread(target=process_chunk, args=args)
-        thread.start()
-        return thread
+    def report(reaction_result: ReactionResult):
+        reaction_idx = reaction_result.index + 1
+        prods = reaction_result.products
 
-    def process_chunk(
-        thread_idx, chunk: list[list[int]], running_idx, write: Callable[[float], None]
-    ):
-        for idx, indices in enumerate(chunk):
-            reactants = []
-            for i, index in enumerate(indices):
-                reactants.append(parsed_options.reactants[i][index])
-            reaction_idx = running_idx + 1 + idx
-
-            reaction = Reaction(parsed_options.reaction)
-            reaction.add_reactants(reactants)
-            reaction.run_reaction()
-
-            p = reaction.products[0] if reaction.products else None
-            prods = reaction.products[0].products if p else None
-
-            out = bold(
-                " . ".join(map(lambda prod: f"{prod}", prods or [])),
-                "green" if prods else "red",
-            )
-            list_obj(reaction_idx, f"{' . '.join(reactants)} >> {out}")
-            del prods
+        out = bold(
+            " . ".join(map(lambda prod: f"{prod}", prods or [])),
+            "green" if prods else "red",
+        )
+        list_obj(reaction_idx, f"{' . '.join(reaction_result.reactants)} >> {out}")
 
-            if p:
-                reaction_num = bold(reaction_idx, "blue")
-                log(f"Calculating ΔG for reaction {reaction_num}...")
+        if reaction_result.error:
+            error(f"Reaction {bold(reaction_idx, 'red')} failed: {reaction_result.error}")
+            return
 
-                delta_g = EnergyValue(
-                    simulation.calculate_delta_g(reaction.products[0]),
-                    EnergyUnit.Eh,
-                )
+        if not prods:
+            return
+
+        all_outcomes = parsed_options.outcomes == "all"
+        # the reaction itself holds the reported outcome
+        for outcome_idx, outcome in enumerate(reaction_result.outcomes if all_outcomes else [reaction_result]):
+            if all_outcomes:
+                log(f"Outcome {bold(outcome_idx + 1, 'yellow')}: {' . '.join(outcome.products)}")
+
+            delta_g = EnergyValue(outcome.delta_g, EnergyUnit.Eh)
 
+            # in a sweep, the first solvent might be the only one that failed
+            if outcome.delta_g is not None:
                 delta_g_print = bold(delta_g.to(EnergyUnit.kJMol), color="magenta")
 
                 result(
                     f"ΔG{bold(subscript_number(reaction_idx), color='yellow')} = {delta_g_print}"
+                    + (f" {bold('(predicted)', 'blue')}" if reaction_result.predicted else "")
                 )
 
-                output.add_reaction(p.reactants, p.products, delta_g)
-
-                try:
-                    write(thread_idx, delta_g.to(EnergyUnit.kCalMol).value)
-                except:
-                    error(f"Error, tried to write to {thread_idx}")
+            if outcome.delta_gs:
+                log(
+                    "ΔG = "
+                    + " | ".join(
+                        f"{solvent}: "
+                        + ("failed" if energy is None else f"{EnergyValue(energy, EnergyUnit.Eh).to(EnergyUnit.kJMol).value:.2f}")
+                        for solvent, energy in outcome.delta_gs.items()
+                    )
+                    + " kJ/mol"
+                )
 
-    def write(thread_idx, data):
-        thread_summary[thread_idx].append(data)
+            delta_g_t = None
+            if scan:
+                energies = scan.reaction(reaction_result.reactant_species, outcome.product_species)
+                if energies is None:
+                    delta_g_t = dict.fromkeys(scan.temperatures)
+                    error(f"No stored hessians for reaction {bold(reaction_idx, 'red')}, ΔG(T) is unknown")
+                else:
+                    delta_g_t = dict(zip(scan.temperatures, map(float, energies)))
+                    log(
+                        "ΔG(T) = "
+                        + " | ".join(
+                            f"{temperature:g} K: {EnergyValue(energy, EnergyUnit.Eh).to(EnergyUnit.kJMol).value:.2f}"
+                            for temperature, energy in delta_g_t.items()
+                        )
+                        + " kJ/mol"
+                    )
+
+            output.add_reaction(
+                reaction_idx,
+                reaction_result.reactants,
+                outcome.products,
+                delta_g,
+                delta_g_t,
+                outcome.delta_gs,
+                outcome_idx + 1 if all_outcomes else None,
+                reaction_result.predicted if parsed_options.predict is not None else None,
+            )
 
     # ensure that `morpheus` can be found in scope
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -112,14 +176,30 @@ def main():
         xtb_cores=parsed_options.xtb_cores,
         conformer_search_options=parsed_options.conformer_search,
         solvent=parsed_options.solvent,
+        cache_path=parsed_options.cache_path,
+        tmp_path=parsed_options.workspace_root,
+        backend=parsed_options.backend,
     )
 
-    simulation = Simulation(options)
-
-    output = Output(options)
+    scan = None
+    if parsed_options.temperatures:
+        scan = TemperatureScan(
+            SimulationCache.shared(options.cache_path), options, parsed_options.temperatures
+        )
+
+    # remove scratch directories left behind by crashed runs
+    collect_garbage(options.tmp_path)
+
+    output = Output(
+        options,
+        [solvent_name(solvent) for solvent in parsed_options.solvents]
+        if len(parsed_options.solvents) > 1
+        else [],
+        parsed_options.temperatures,
+    )
 
     if parsed_options.output_path:
-        outfile = open(parsed_options.output_path, "w+")
+        outfile = open(parsed_options.output_path, "a+" if parsed_options.resume else "w+")
         logger.files = (*logger.files, outfile)
         outfile.write(MORPHEUS)
         outfile.write("\n")
@@ -142,48 +222,151 @@ def main():
     command(f"Running a total of {num_reactions} reactions: ")
     del num_reactions
 
-    if options.solvent:
+    sweep = parsed_options.solvents if len(parsed_options.solvents) > 1 else None
+    if sweep:
+        names = ", ".join(solvent.value if solvent else "gas" for solvent in sweep)
+        log(f"sweeping implicit solvent models {bold(names, 'blue')}, sharing the conformer search")
+    elif options.solvent:
         log(f"using implicit solvent model {bold(options.solvent.value, 'blue')}")
 
-    # split workload
-    chunks = chunk_into_n(reactions, parsed_options.cores)
-
-    # output of the different threads
-    thread_summary = [[] for _ in range(parsed_options.cores)]
-
-    # empty array of threads
-    threads = [None for _ in range(parsed_options.cores)]
-
-    # keep the index of the first reaction each thread processes
-    running_idx = 0
-    for i in range(parsed_options.cores):
-        chunk = chunks[i]
-        threads[i] = start_thread(i, chunk, running_idx, write)
-        running_idx += len(chunk)
+    if options.backend != "xtb":
+        log(f"using calculator backend {bold(options.backend, 'blue')}")
+
+    if options.cache_path:
+        log(f"using result cache {bold(options.cache_path, 'blue')}")
+
+    checkpoint = None
+    if parsed_options.checkpoint_path:
+        try:
+            checkpoint = Checkpoint(
+                parsed_options.checkpoint_path,
+                run_fingerprint(
+                    parsed_options.reaction,
+                    parsed_options.reactants,
+                    options,
+                    sweep,
+                    {
+                        "outcomes": parsed_options.outcomes,
+                        "funnel": [repr(stage) for stage in parsed_options.funnel],
+                        "prefilter": parsed_options.prefilter,
+                        "predict": parsed_options.predict,
+                        "predict_threshold": parsed_options.predict_threshold,
+                    },
+                ),
+                resume=parsed_options.resume,
+            )
+        except ValueError as e:
+            error(f"Can not resume from {bold(parsed_options.checkpoint_path, 'red')}: {e}")
+            exit(-1)
+        if parsed_options.resume:
+            log(
+                f"Resuming with {bold(len(checkpoint.completed), 'blue')} finished reactions "
+                f"and {bold(len(checkpoint.energies), 'blue')} calculated species"
+            )
 
-    for t in threads:
-        t.join()
+    for data_filename in output.open(
+        parsed_options.output_formats, parsed_options.output_path, parsed_options.append
+    ):
+        log(f"writing data to file {bold(data_filename, 'blue')}")
+
+    if parsed_options.optimize:
+        optimize(parsed_options, options, output, report)
+        output.close()
+        return
+
+    pipeline_args = (parsed_options.reaction, parsed_options.reactants, options, parsed_options.cores)
+    # species of a sweep are journaled per solvent in the cache, not in the checkpoint
+    energies = checkpoint.energies if checkpoint and not sweep else None
+    surrogate = None
+    if parsed_options.predict is not None:
+        surrogate = (
+            SpeciesSurrogate.from_cache(SimulationCache.shared(options.cache_path), options)
+            if options.cache_path
+            else SpeciesSurrogate()
+        )
+        log(
+            f"predicting species within {bold(parsed_options.predict, 'blue')} Eh, "
+            f"trained on {bold(surrogate.observations, 'blue')} cached species"
+        )
+    prediction_args = dict(
+        surrogate=surrogate,
+        tolerance=parsed_options.predict or 0.0,
+        threshold=parsed_options.predict_threshold,
+    )
+    board = None
+    if parsed_options.coordinator_address:
+        board = JobBoard(options)
+        host, port = serve(board, parsed_options.coordinator_address, parsed_options.authkey)
+        log(f"Serving species to workers on {bold(f'{host}:{port}', 'blue')}")
+        pipeline = DistributedPipeline(
+            board,
+            *pipeline_args,
+            energies=energies,
+            outcomes=parsed_options.outcomes,
+            prefilter=parsed_options.prefilter,
+            **prediction_args,
+        )
+    else:
+        pipeline = ReactionPipeline(
+            *pipeline_args,
+            energies=energies,
+            solvents=sweep,
+            outcomes=parsed_options.outcomes,
+            prefilter=parsed_options.prefilter,
+            **prediction_args,
+        )
+
+    skipped = len(pipeline.combinations) - len(pipeline.candidate_combinations)
+    if skipped:
+        log(f"skipping {bold(skipped, 'blue')} reactions with reactants that do not match the SMARTS")
+
+    with pipeline:
+        # enumerate every reaction first, so each unique species is calculated once
+        graph = pipeline.enumerate(skip=checkpoint.completed if checkpoint else ())
+        for stage_report in pipeline.screen(parsed_options.funnel):
+            log(
+                f"Funnel stage {bold(stage_report.name, 'blue')}: "
+                f"{bold(len(stage_report.survivors), 'yellow')} of {bold(stage_report.reactions, 'yellow')} reactions survived, "
+                f"{stage_report.calculations} species in {stage_report.wall_time:.1f}s"
+            )
 
-    # flatten
-    delta_gs = flatten(thread_summary)
+        log(
+            f"Calculating {bold(graph.unique_jobs, 'yellow')} unique species "
+            f"instead of {bold(graph.naive_jobs, 'yellow')}"
+        )
+
+        start = time.perf_counter()
+        calculated = 0
+        predicted = 0
+        # results arrive in reaction order
+        for reaction_result in pipeline.calculate(
+            checkpoint.record_species if checkpoint and not sweep else None
+        ):
+            report(reaction_result)
+            calculated += 1
+            predicted += reaction_result.predicted
+            # predicted reactions are calculated again when the run is resumed
+            if checkpoint and not reaction_result.error and not reaction_result.predicted:
+                checkpoint.record_reaction(reaction_result.index)
+
+        if parsed_options.funnel:
+            log(
+                f"Final stage {bold(f'gfn{options.gfn_level.value}', 'blue')}: "
+                f"{bold(calculated, 'yellow')} reactions in {time.perf_counter() - start:.1f}s"
+            )
+        if surrogate:
+            log(
+                f"Predicted {bold(predicted, 'yellow')} of {bold(calculated, 'yellow')} reactions, "
+                f"{bold(len(pipeline.predicted), 'yellow')} of {bold(graph.unique_jobs, 'yellow')} species"
+            )
 
-    output.generate_table()
-    for f in parsed_options.output_formats:
-        if not parsed_options.output_path == None:
-            print(parsed_options.output_path)
-            data_filename = Path(f"{parsed_options.output_path}.{f.value}")
-            with open(data_filename, "w+") as data_file:
-                log(f"wrote data to file {bold(data_filename, 'blue')}")
-                data_file.write(output.data_as(f))
-        else:
-            log(f"data as {bold(f.name, 'blue')}")
-            print(output.data_as(f))
+    if board:
+        # let the workers know there is nothing left to do
+        board.finish()
 
-    if parsed_options.output_path:
-        outfile = open(parsed_options.output_path, "a+")
-        outfile.write("\n")
-        outfile.write("\n")
-        outfile.write(output.stdout)
+    output.close()
+    if checkpoint:
+        checkpoint.close()
 
 if __name__ == "__main__":
     main()
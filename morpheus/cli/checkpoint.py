@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from rdkit.Chem import rdChemReactions
+
+from morpheus.molecule import Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.simulation import SimulationOptions
+from morpheus.simulation.options import Solvent
+
+MANIFEST = "manifest.json"
+JOURNAL = "journal.jsonl"
+
+
+def run_fingerprint(
+    template: ReactionTemplate,
+    reactants: list[list[Smiles]],
+    options: SimulationOptions,
+    solvents: Optional[list[Optional[Solvent]]] = None,
+    settings: Optional[dict] = None,
+) -> str:
+    """hash of everything that decides the results of a run
+
+    `settings` are the other (JSON serializable) settings of the run that decide which
+    reactions are reported and how, e.g. the outcomes or the funnel.
+    """
+    digest = hashlib.sha256()
+    digest.update(rdChemReactions.ReactionToSmarts(template.reaction).encode("utf-8"))
+    for reactant_list in reactants:
+        digest.update(b"\0")
+        for smiles in reactant_list:
+            digest.update(smiles.__str__().encode("utf-8") + b"\n")
+    digest.update(options.fingerprint().encode("utf-8"))
+    # the solvents of a sweep
+    if solvents and len(solvents) > 1:
+        for solvent in solvents:
+            digest.update(b"\0" + (solvent.value if solvent else "").encode("utf-8"))
+    if settings:
+        digest.update(b"\0" + json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """
+    Journal of a CLI run, which allows to resume it after an interruption.
+
+    Finished reactions and the free energies of calculated species are appended to a
+    journal as soon as they are known. Resuming is refused if the SMARTS, reactants,
+    simulation options or settings differ from the run that created the checkpoint.
+    """
+
+    path: Path
+    fingerprint: str
+    completed: set[int]
+    energies: dict[str, float]
+    __journal: object
+
+    def __init__(self, path: Path, fingerprint: str, resume: bool = False) -> None:
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.completed = set()
+        self.energies = {}
+
+        manifest_path = self.path / MANIFEST
+        if resume:
+            if not manifest_path.exists():
+                raise ValueError(f"No checkpoint found in {self.path}")
+            manifest = json.loads(manifest_path.read_text())
+            if manifest.get("fingerprint") != fingerprint:
+                raise ValueError(
+                    "The SMARTS, reactants, simulation options or settings differ from the checkpointed run"
+                )
+            self.__load()
+            self.__journal = open(self.path / JOURNAL, "a")
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            manifest_path.write_text(json.dumps({"fingerprint": fingerprint}))
+            self.__journal = open(self.path / JOURNAL, "w")
+
+    def __load(self):
+        journal_path = self.path / JOURNAL
+        if not journal_path.exists():
+            return
+        complete = 0
+        with open(journal_path, "rb") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                complete += len(line)
+                if "reaction" in entry:
+                    self.completed.add(entry["reaction"])
+                elif "species" in entry:
+                    self.energies[entry["species"]] = entry["delta_g"]
+        # the last line might be incomplete if the run was killed while writing, new
+        # entries must not be appended to it
+        os.truncate(journal_path, complete)
+
+    def __append(self, entry: dict):
+        self.__journal.write(json.dumps(entry) + "\n")
+        self.__journal.flush()
+        os.fsync(self.__journal.fileno())
+
+    def record_species(self, key: str, delta_g: Optional[float]):
+        if delta_g is not None:
+            self.energies[key] = delta_g
+            self.__append({"species": key, "delta_g": delta_g})
+
+    def record_reaction(self, index: int):
+        self.completed.add(index)
+        self.__append({"reaction": index})
+
+    def close(self):
+        self.__journal.close()
@@ -1,13 +1,58 @@
-import numpy as np
 import itertools
+import math
+from typing import Iterator
 
-def chunk_into_n(lst, n):
-    return list(map(lambda a: list(a), np.array_split(lst, n)))
 
-def flatten(lst):
-    return sum(lst, [])
+class Combinations:
+    """
+    Lazy cartesian product of reactant indices.
 
-def get_combinations(lengths: list[int]) -> list[tuple[int]]:
-    rs = [range(v) for v in lengths]
-    cs = list(itertools.product(*rs))
-    return cs
\ No newline at end of file
+    The combination of index `i` is computed arithmetically, in the same order as
+    `itertools.product`, so work can be addressed by (start, stop, stride) ranges
+    without ever listing the whole product.
+    """
+
+    lengths: list[int]
+
+    def __init__(self, lengths: list[int]) -> None:
+        self.lengths = list(lengths)
+
+    def __len__(self) -> int:
+        return math.prod(self.lengths) if self.lengths else 0
+
+    def __getitem__(self, index: int) -> tuple[int, ...]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"combination index {index} out of range")
+        combination = []
+        for length in reversed(self.lengths):
+            index, i = divmod(index, length)
+            combination.append(i)
+        return tuple(reversed(combination))
+
+    def index(self, combination: tuple[int, ...]) -> int:
+        """index of `combination`, the inverse of `self[index]`"""
+        index = 0
+        for i, length in zip(combination, self.lengths):
+            index = index * length + i
+        return index
+
+    def __iter__(self) -> Iterator[tuple[int, ...]]:
+        if not len(self):
+            return iter(())
+        return itertools.product(*[range(length) for length in self.lengths])
+
+    def shard(self, start: int, stop: int, stride: int = 1) -> Iterator[tuple[int, tuple[int, ...]]]:
+        """(index, combination) of every index in range(start, stop, stride)"""
+        for index in range(start, min(stop, len(self)), stride):
+            yield index, self[index]
+
+    def shards(self, size: int) -> Iterator[range]:
+        """split all indices into consecutive ranges of at most `size` indices"""
+        for start in range(0, len(self), size):
+            yield range(start, min(start + size, len(self)))
+
+
+def get_combinations(lengths: list[int]) -> Combinations:
+    return Combinations(lengths)
@@ -1,46 +1,133 @@
-from io import StringIO
+from pathlib import Path
 from typing import Optional
-import pandas as pd
 
-from morpheus.cli.parser.options import FileFormat, Options
+from morpheus.cli.parser.options import FileFormat
+from morpheus.cli.writers import RecordWriter, open_writer
 from morpheus.simulation.options import ConformerSearchMethod, SimulationOptions
 from morpheus.molecule import Smiles
 from morpheus.utils.units import EnergyValue, EnergyUnit
 
 
 class ReactionOutput:
+    index: int
     reactants: list[Smiles]
     products: list[Smiles]
     delta_g: EnergyValue
+    delta_g_t: Optional[dict[float, Optional[float]]]
+    delta_gs: Optional[dict[str, Optional[float]]]
+    outcome: Optional[int]
+    predicted: Optional[bool]
 
     def __init__(
-        self, reactants: list[Smiles], products: list[Smiles], delta_g: EnergyValue
+        self,
+        index: int,
+        reactants: list[Smiles],
+        products: list[Smiles],
+        delta_g: EnergyValue,
+        delta_g_t: Optional[dict[float, Optional[float]]] = None,
+        delta_gs: Optional[dict[str, Optional[float]]] = None,
+        outcome: Optional[int] = None,
+        predicted: Optional[bool] = None,
     ) -> None:
+        self.index = index
         self.reactants = reactants
         self.products = products
         self.delta_g = delta_g
+        self.delta_g_t = delta_g_t
+        self.delta_gs = delta_gs
+        self.outcome = outcome
+        self.predicted = predicted
+
+    def as_record(self) -> dict:
+        record = {"index": self.index}
+        # outcomes of a reaction share its index
+        if self.outcome is not None:
+            record["outcome"] = self.outcome
+        record |= {
+            "reactants": [reactant.__str__() for reactant in self.reactants],
+            "products": [product.__str__() for product in self.products],
+            f"delta_g ({EnergyUnit.Eh.name})": None
+            if self.delta_g.value is None
+            else self.delta_g.to(EnergyUnit.Eh).value,
+        }
+        # one column per temperature, so csv rows stay aligned
+        for temperature, delta_g in (self.delta_g_t or {}).items():
+            record[f"delta_g {temperature:g}K ({EnergyUnit.Eh.name})"] = delta_g
+        for solvent, delta_g in (self.delta_gs or {}).items():
+            record[f"delta_g {solvent} ({EnergyUnit.Eh.name})"] = delta_g
+        # only runs with a prediction stage tell predicted and calculated ΔGs apart
+        if self.predicted is not None:
+            record["predicted"] = self.predicted
+        return record
 
 
 class Output:
-    options: Options
-    reactions: list[ReactionOutput]
-    df: Optional[pd.DataFrame]
-    stdout: str
+    """
+    streams every reaction to the writers of the requested formats as soon as it is known
+
+    Every record has a column for each of the `solvents` of a sweep and each of the
+    `temperatures` of a scan, even if it has no ΔG in them, so csv columns do not
+    depend on the first record.
+    """
 
-    def __init__(self, options: Options) -> None:
+    options: SimulationOptions
+    writers: list[RecordWriter]
+    solvents: list[str]
+    temperatures: list[float]
+
+    def __init__(
+        self,
+        options: SimulationOptions,
+        solvents: Optional[list[str]] = None,
+        temperatures: Optional[list[float]] = None,
+    ) -> None:
         self.options = options
+        self.writers = []
+        self.solvents = list(solvents or [])
+        self.temperatures = list(temperatures or [])
 
-        self.reactions = []
-        self.df = None
-        self.stdout = ""
+    def open(
+        self,
+        formats: list[FileFormat],
+        output_path: Optional[Path] = None,
+        append: bool = False,
+    ) -> list[Path]:
+        """open a writer per format, returns the paths of the data files"""
+        paths = []
+        for f in formats:
+            path = Path(f"{output_path}.{f.value}") if output_path else None
+            self.writers.append(open_writer(f, path, append))
+            if path:
+                paths.append(path)
+        return paths
 
-    def write(self, s):
-        self.stdout += f"{s}\n"
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
 
     def add_reaction(
-        self, reactants: list[Smiles], products: list[Smiles], delta_g: EnergyValue
+        self,
+        index: int,
+        reactants: list[Smiles],
+        products: list[Smiles],
+        delta_g: EnergyValue,
+        delta_g_t: Optional[dict[float, Optional[float]]] = None,
+        delta_gs: Optional[dict[str, Optional[float]]] = None,
+        outcome: Optional[int] = None,
+        predicted: Optional[bool] = None,
     ) -> None:
-        self.reactions.append(ReactionOutput(reactants, products, delta_g))
+        if self.solvents:
+            delta_gs = {solvent: (delta_gs or {}).get(solvent) for solvent in self.solvents}
+        if self.temperatures:
+            delta_g_t = {
+                temperature: (delta_g_t or {}).get(temperature) for temperature in self.temperatures
+            }
+        record = ReactionOutput(
+            index, reactants, products, delta_g, delta_g_t, delta_gs, outcome, predicted
+        ).as_record()
+        for writer in self.writers:
+            writer.write(record)
 
     def generate_options(self) -> str:
         l = f"""Morpheus
@@ -58,51 +145,3 @@ xtb parallel cores: {self.options.xtb_cores}"""
                 case ConformerSearchMethod.CREST:
                     l += f"   gfn level: {self.options.conformer_search.accuracy.name.lower()}"
         return l
-
-    def generate_table(self) -> pd.DataFrame:
-        """generate table from provided reaction products
-
-        Returns:
-            pandas data frame
-        """
-
-        data = {
-            f"reactants": list(
-                map(
-                    lambda reaction_output: list(
-                        map(
-                            lambda reactant: reactant.__str__(),
-                            reaction_output.reactants,
-                        )
-                    ),
-                    self.reactions,
-                )
-            ),
-            "products": list(
-                map(
-                    lambda reaction_output: list(
-                        map(lambda product: product.__str__(), reaction_output.products)
-                    ),
-                    self.reactions,
-                )
-            ),
-            f"delta_g ({EnergyUnit.Eh.name})": list(
-                map(
-                    lambda reaction: reaction.delta_g.to(EnergyUnit.Eh).value,
-                    self.reactions,
-                )
-            ),
-        }
-        df = pd.DataFrame(data)
-        self.df = df
-        return df
-
-    def data_as(self, format: FileFormat) -> str:
-        data_buffer = StringIO()
-        if not type(self.df) == type(None):
-            match format:
-                case FileFormat.JSON:
-                    self.df.to_json(data_buffer, index=False)
-                case FileFormat.CSV:
-                    self.df.to_csv(data_buffer)
-        return data_buffer.getvalue()
@@ -2,32 +2,77 @@ from pathlib import Path
 from typing import Optional
 
 from morpheus.molecule import Smiles
+from morpheus.simulation.funnel import FunnelStage
 from morpheus.simulation.options import ConformerSearchOptions, GFNLevel, Solvent
 from morpheus.reaction import ReactionTemplate
+from morpheus.utils.information import TMP_DIR
 
 from enum import Enum
 
 
 class FileFormat(Enum):
     JSON = "json"
+    JSONL = "jsonl"
     CSV = "csv"
     def from_string(f: str):
         match f:
             case "json": 
                 return FileFormat.JSON
+            case "jsonl":
+                return FileFormat.JSONL
             case "csv": 
                 return FileFormat.CSV
     
+class OptimizeOptions:
+    """settings of `morpheus optimize`"""
+
+    iterations: int
+    batch_size: Optional[int]
+    initial: Optional[int]
+    features: str
+    seed: Optional[int]
+
+    def __init__(
+        self,
+        iterations: int = 10,
+        batch_size: Optional[int] = None,
+        initial: Optional[int] = None,
+        features: str = "morgan",
+        seed: Optional[int] = None,
+    ) -> None:
+        self.iterations = iterations
+        self.batch_size = batch_size
+        self.initial = initial
+        self.features = features
+        self.seed = seed
+
+
 class Options:
     reaction: ReactionTemplate
     output_path: Path
     output_formats: list[FileFormat]
+    append: bool
+    checkpoint_path: Optional[Path]
+    resume: bool
+    coordinator_address: Optional[tuple[str, int]]
+    authkey: Optional[bytes]
     xtb_gfn: GFNLevel
     conformer_search: Optional[ConformerSearchOptions]
     cores: int
     xtb_cores: int
     reactants: list[list[Smiles]]
     solvent: Optional[Solvent]
+    solvents: list[Optional[Solvent]]
+    cache_path: Optional[Path]
+    workspace_root: Path
+    funnel: list[FunnelStage]
+    backend: str
+    temperatures: list[float]
+    outcomes: str
+    prefilter: bool
+    optimize: Optional[OptimizeOptions]
+    predict: Optional[float]
+    predict_threshold: Optional[float]
 
     def __init__(
         self,
@@ -39,7 +84,23 @@ class Options:
         xtb_cores: int,
         reaction: ReactionTemplate,
         output_formats: list[FileFormat] = [],
-        solvent: Optional[Solvent] = None
+        append: bool = False,
+        checkpoint_path: Optional[Path] = None,
+        resume: bool = False,
+        coordinator_address: Optional[tuple[str, int]] = None,
+        authkey: Optional[bytes] = None,
+        solvent: Optional[Solvent] = None,
+        solvents: list[Optional[Solvent]] = [],
+        cache_path: Optional[Path] = None,
+        workspace_root: Path = TMP_DIR,
+        funnel: list[FunnelStage] = [],
+        backend: str = "xtb",
+        temperatures: list[float] = [],
+        outcomes: str = "first",
+        prefilter: bool = True,
+        optimize: Optional[OptimizeOptions] = None,
+        predict: Optional[float] = None,
+        predict_threshold: Optional[float] = None,
     ) -> None:
         self.output_path = output_path
         self.conformer_search = conformer_search
@@ -49,4 +110,22 @@ class Options:
         self.reaction = reaction
         self.reactants = reactants
         self.output_formats = output_formats
+        self.append = append
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.coordinator_address = coordinator_address
+        self.authkey = authkey
         self.solvent = solvent
+        # every solvent of a sweep, `solvent` is the first one
+        self.solvents = solvents
+        self.cache_path = cache_path
+        self.workspace_root = workspace_root
+        self.funnel = funnel
+        self.backend = backend
+        self.temperatures = temperatures
+        self.outcomes = outcomes
+        self.prefilter = prefilter
+        self.optimize = optimize
+        # tolerance in Eh of predicted ΔGs, species are only predicted if it is set
+        self.predict = predict
+        self.predict_threshold = predict_threshold
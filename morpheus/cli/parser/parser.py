@@ -1,12 +1,14 @@
 import argparse
+import functools
 import os
 import shutil
 import sys
 from pathlib import Path
+from typing import Optional
 
 from morpheus.cli.fancy_prints import log, error, bold
 from morpheus.cli.parser import ParserOptions
-from morpheus.cli.parser.options import FileFormat
+from morpheus.cli.parser.options import FileFormat, OptimizeOptions
 from morpheus.molecule.smiles import Smiles
 from morpheus.simulation.options import (
     ConformerSearchMethod,
@@ -14,7 +16,11 @@ from morpheus.simulation.options import (
     GFNLevel,
     Solvent,
 )
-from morpheus.utils.information import TMP_DIR
+from morpheus.simulation.backend import BACKENDS, get_backend
+from morpheus.simulation.funnel import parse_stage
+from morpheus.simulation.thermo import parse_temperatures
+from morpheus.optimize.features import FEATURES
+from morpheus.utils.information import CACHE_PATH, TMP_DIR
 from morpheus.reaction import ReactionTemplate
 
 
@@ -64,6 +70,43 @@ def get_parser():
         "--conformer-search-level",
         help="for rdkit number of conformers searched, for crest {gfnff, gfn0, gfn1, gfn2}",
     )
+    parser.add_argument(
+        "--conformer-rerank",
+        help="rank the K lowest distinct rdkit conformers with xtb single points before the optimization",
+        type=int,
+        default=0,
+        metavar="K",
+    )
+    parser.add_argument(
+        "--conformer-rerank-level",
+        help="gfn level of the re-ranking single points (default: ff)",
+        choices=["ff", "0", "1", "2"],
+        default="ff",
+    )
+    parser.add_argument(
+        "--conformer-rmsd",
+        help="heavy atom RMSD in Å below which conformers are duplicates (default: 0.5)",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--conformer-window",
+        help="energy window in kcal/mol above the force field minimum for re-ranking (default: 10)",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--ensemble",
+        help="optimize the N lowest crest conformers and report their Boltzmann weighted free energy",
+        type=int,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--ensemble-window",
+        help="energy window in kcal/mol above the lowest crest conformer for --ensemble",
+        type=float,
+        metavar="KCAL",
+    )
     parser.add_argument(
         "-gfn", type=str, choices=["0", "1", "2"], help="Level of gfn", default="2"
     )
@@ -102,16 +145,101 @@ def get_parser():
         "-f",
         "--formats",
         nargs="+",
-        help="format output file",
-        choices=["json", "csv"],
+        help="format output file, records are written as soon as they are calculated",
+        choices=["json", "jsonl", "csv"],
         required=False,
     )
 
+    parser.add_argument(
+        "--append",
+        help="append to existing jsonl and csv output files instead of overwriting them",
+        action="store_true",
+    )
+
     parser.add_argument(
         "--solvent",
-        help="solvent to add to the xtb command (using -alpb)",
+        help="solvent to add to the xtb command (using -alpb); with several solvents (gas for "
+        "the gas phase, all for every solvent) the conformer search is shared and ΔG is reported "
+        "in each of them",
+        nargs="+",
         required=False,
-        choices=Solvent.solvents(),
+        choices=[*Solvent.solvents(), "gas", "all"],
+    )
+
+    parser.add_argument(
+        "--backend",
+        help="calculator backend: xtb (subprocess, default), tblite (in process single points) "
+        "or stub[:DELAY] (deterministic fake energies, for testing without xtb)",
+        default="xtb",
+    )
+
+    parser.add_argument(
+        "--outcomes",
+        help="matches of the SMARTS to calculate: the first one (default), or every distinct "
+        "one, reporting the lowest ΔG (min) or all of them (all)",
+        choices=["first", "min", "all"],
+        default="first",
+    )
+
+    parser.add_argument(
+        "--no-prefilter",
+        help="run every combination of reactants, also those with a reactant that can not match the SMARTS",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--predict",
+        type=float,
+        metavar="TOLERANCE",
+        help="predict free energies from the calculated (and cached) species, reactions whose "
+        "predicted ΔG has a standard deviation of at most TOLERANCE in Eh are not calculated",
+    )
+    parser.add_argument(
+        "--predict-threshold",
+        type=float,
+        metavar="ΔG",
+        help="with --predict, also calculate the reactions whose predicted ΔG in Eh is close to this threshold",
+    )
+
+    parser.add_argument(
+        "--temperatures",
+        help="also report ΔG at these temperatures in K, recomputed from the stored hessians "
+        "without rerunning xtb: START:STOP:STEP or a comma separated list, e.g. 250:400:10",
+    )
+
+    parser.add_argument(
+        "--funnel",
+        nargs="+",
+        metavar="STAGE",
+        help="screen reactions at cheap levels first, only survivors are calculated at -gfn. "
+        "A stage is LEVEL[:top=K][:max=ΔG], LEVEL being mmff, ff, 0, 1 or 2 and ΔG in Eh, "
+        "e.g. --funnel mmff:top=1000 0:top=100:max=0.01",
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        help="directory to journal finished reactions and species to, for resuming the run",
+    )
+    parser.add_argument(
+        "--resume",
+        help="resume the run journaled in --checkpoint, skipping finished work",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--cache",
+        help=f"path of the persistent result cache (default: {CACHE_PATH})",
+        default=CACHE_PATH,
+    )
+    parser.add_argument(
+        "--workspace-root",
+        help=f"directory for the scratch workspaces of xtb and crest, e.g. /dev/shm/morpheus (default: {TMP_DIR})",
+        default=TMP_DIR,
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="do not read or write the persistent result cache",
+        action="store_true",
     )
 
     return parser
@@ -129,7 +257,51 @@ def get_options(args) -> ParserOptions:
     xtb_cores = 1 if xtb_cores == 0 else xtb_cores
     reaction = ReactionTemplate(args.smarts)
     output_formats = list(map(lambda f: FileFormat.from_string(f), args.formats or []))
-    solvent = Solvent.from_string(args.solvent)
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else None
+    if args.resume and not checkpoint_path:
+        error(f"{bold('--resume', 'red')} requires a {bold('--checkpoint', 'red')} directory")
+        exit(-1)
+    # a resumed run extends the output files of the interrupted one
+    append = args.append or args.resume
+    if append and FileFormat.JSON in output_formats:
+        error(f"Can not append to {bold('json', 'red')} output, use {bold('jsonl', 'blue')} instead")
+        exit(-1)
+    solvents = []
+    for name in args.solvent or []:
+        solvents += Solvent.solvents() if name == "all" else [name]
+    # `gas` is not a solvent, `from_string` maps it to the gas phase
+    solvents = [Solvent.from_string(name) for name in dict.fromkeys(solvents)]
+    solvent = solvents[0] if solvents else None
+    cache_path = None if args.no_cache else Path(args.cache)
+    try:
+        get_backend(args.backend)
+    except (ImportError, ValueError) as e:
+        error(f"Invalid {bold('--backend', 'red')}: {e}")
+        exit(-1)
+    temperatures = []
+    if args.temperatures:
+        try:
+            temperatures = parse_temperatures(args.temperatures)
+        except ValueError as e:
+            error(f"Invalid {bold('--temperatures', 'red')}: {e}")
+            exit(-1)
+        if not cache_path:
+            error(f"{bold('--temperatures', 'red')} reads hessians from the cache, it can not be used with --no-cache")
+            exit(-1)
+    funnel = []
+    for spec in args.funnel or []:
+        try:
+            funnel.append(parse_stage(spec))
+        except ValueError as e:
+            error(f"Invalid {bold('--funnel', 'red')} stage: {e}")
+            exit(-1)
+    workspace_root = Path(args.workspace_root)
+    if args.predict_threshold is not None and args.predict is None:
+        error(f"{bold('--predict-threshold', 'red')} requires {bold('--predict', 'red')}")
+        exit(-1)
+    if args.predict is not None and (len(solvents) > 1 or args.subcmd == "optimize"):
+        error(f"{bold('--predict', 'red')} can not be used with a solvent sweep or {bold('optimize', 'red')}")
+        exit(-1)
 
     cs_options = None
     if do_conformer_search:
@@ -142,7 +314,7 @@ def get_options(args) -> ParserOptions:
             if cs_method == "rdkit":
                 log(f"Performing conformer search using [{bold('rdkit', 'blue')}]")
                 cs_options.method = ConformerSearchMethod.RDKIT
-                cs_options.accuracy = cs_level or 200
+                cs_options.accuracy = int(cs_level) if cs_level else 200
             elif cs_method == "crest":
                 log(f"Performing conformer search using [{bold('crest', 'blue')}]")
                 cs_options.method = ConformerSearchMethod.CREST
@@ -160,6 +332,24 @@ def get_options(args) -> ParserOptions:
             else:
                 error(f"Unknown conformer search method: [{bold(cs_method, 'red')}]")
                 exit(-1)
+        if cs_options.method == ConformerSearchMethod.CREST:
+            cs_options.ensemble = args.ensemble
+            cs_options.ensemble_window = args.ensemble_window
+            if cs_options.is_ensemble:
+                log(f"Using Boltzmann weighted {bold('crest', 'blue')} ensembles")
+        elif args.ensemble is not None or args.ensemble_window is not None:
+            error(f"{bold('--ensemble', 'red')} requires the {bold('crest', 'blue')} conformer search")
+            exit(-1)
+        if cs_options.method == ConformerSearchMethod.RDKIT:
+            cs_options.rerank = args.conformer_rerank
+            cs_options.rerank_level = GFNLevel(args.conformer_rerank_level)
+            cs_options.rmsd_threshold = args.conformer_rmsd
+            cs_options.energy_window = args.conformer_window
+            if cs_options.rerank:
+                log(
+                    f"Re-ranking the {bold(cs_options.rerank, 'blue')} best conformers "
+                    f"with {bold(f'gfn{cs_options.rerank_level.value}', 'blue')} single points"
+                )
 
     # check if all arg_smiles are valid
     for idx, smile in enumerate(arg_smiles):
@@ -178,13 +368,22 @@ def get_options(args) -> ParserOptions:
 
     xtb_gfn = GFNLevel.GFN2
     match xtb_gfn_arg:
-        case 0:
+        case "0":
             xtb_gfn = GFNLevel.GFN0
-        case 1:
+        case "1":
             xtb_gfn = GFNLevel.GFN1
-        case 2:
+        case "2":
             xtb_gfn = GFNLevel.GFN2
 
+    # fail now rather than on every species
+    levels = [xtb_gfn] + [stage.level for stage in funnel if stage.level is not None]
+    if cs_options and cs_options.rerank:
+        levels.append(cs_options.rerank_level)
+    level = unsupported_level(args.backend, levels)
+    if level is not None:
+        error(f"The {bold(args.backend, 'red')} backend can not calculate at {bold(f'gfn{level.value}', 'red')}")
+        exit(-1)
+
     def get_smiles(filename: str | None):
         if filename:
             return open(Path(filename), "r").read().splitlines()
@@ -214,6 +413,30 @@ def get_options(args) -> ParserOptions:
         )
         exit(-1)
 
+    coordinator_address = None
+    authkey = None
+    if args.subcmd == "coordinator":
+        from morpheus.scheduler.distributed import parse_address
+
+        coordinator_address = parse_address(args.bind)
+        authkey = get_authkey(args)
+        if len(solvents) > 1:
+            error(f"Remote workers calculate a single solvent, pass one {bold('--solvent', 'red')} to the coordinator")
+            exit(-1)
+
+    optimize = None
+    if args.subcmd == "optimize":
+        if len(solvents) > 1 or args.funnel or checkpoint_path:
+            error(f"{bold('optimize', 'red')} calculates a single solvent, without a funnel or checkpoint")
+            exit(-1)
+        optimize = OptimizeOptions(
+            iterations=args.iterations,
+            batch_size=args.batch_size,
+            initial=args.initial,
+            features=args.features,
+            seed=args.seed,
+        )
+
     return ParserOptions(
         output_path=output_path,
         xtb_gfn=xtb_gfn,
@@ -223,18 +446,131 @@ def get_options(args) -> ParserOptions:
         reaction=reaction,
         reactants=reactants,
         output_formats=output_formats,
+        append=append,
+        checkpoint_path=checkpoint_path,
+        resume=args.resume,
+        coordinator_address=coordinator_address,
+        authkey=authkey,
         solvent=solvent,
+        solvents=solvents,
+        cache_path=cache_path,
+        workspace_root=workspace_root,
+        funnel=funnel,
+        backend=args.backend,
+        temperatures=temperatures,
+        outcomes=args.outcomes,
+        prefilter=not args.no_prefilter,
+        optimize=optimize,
+        predict=args.predict,
+        predict_threshold=args.predict_threshold,
+    )
+
+
+def unsupported_level(backend: str, levels: list[GFNLevel]) -> Optional[GFNLevel]:
+    """the first of `levels` the calculator `backend` can not calculate at"""
+    backend_class = BACKENDS[backend.split(":")[0]]
+    return next((level for level in levels if not backend_class.supports(level)), None)
+
+
+def get_authkey(args) -> bytes:
+    authkey = args.authkey or os.environ.get("MORPHEUS_AUTHKEY")
+    if not authkey:
+        error(f"Distributed runs require {bold('--authkey', 'red')} or MORPHEUS_AUTHKEY")
+        exit(-1)
+    return authkey.encode("utf-8")
+
+
+def start_worker(_parser, args):
+    # imported here, workers do not need the rest of the cli
+    from morpheus.scheduler.distributed import parse_address, run_worker
+
+    address = parse_address(args.connect, default_host="127.0.0.1")
+    authkey = get_authkey(args)
+    # workers calculate in their own workspaces and cache, not in the coordinator's paths
+    worker = functools.partial(
+        run_worker,
+        tmp_path=Path(args.workspace_root),
+        cache_path=None if args.no_cache else Path(args.cache),
+    )
+    log(f"Connecting {bold(args.worker_processes, 'blue')} workers to {bold(args.connect, 'blue')}...")
+    try:
+        if args.worker_processes == 1:
+            done = worker(address, authkey)
+        else:
+            import multiprocessing
+
+            with multiprocessing.Pool(args.worker_processes) as pool:
+                done = sum(pool.starmap(worker, [(address, authkey)] * args.worker_processes))
+    except ConnectionError as e:
+        error(f"Could not connect to coordinator {bold(args.connect, 'red')}: {e}")
+        exit(-1)
+    log(f"Coordinator finished, calculated {bold(done, 'blue')} species")
+    exit(0)
+
+
+def start_enumerate(_parser, args):
+    # streams the reactant files instead of reading them like `get_options`
+    import itertools
+    import time
+
+    from morpheus.reaction.library import LibraryWriter, read_smiles
+
+    reaction = ReactionTemplate(args.smarts)
+    if not args.output:
+        error(f"Enumerating a library requires an {bold('--output', 'red')} file")
+        exit(-1)
+    files = args.smiles_files or []
+    arg_smiles = args.smiles or []
+    reactants = []
+    for i in range(max(len(files), len(arg_smiles))):
+        # like `get_options`, a SMILES given by `-s` is added to the file of the same reactant
+        reactant_list = read_smiles(Path(files[i])) if i < len(files) else iter(())
+        extra = [arg_smiles[i]] if i < len(arg_smiles) else []
+        reactants.append(itertools.chain(reactant_list, extra))
+    if not len(reactants) == reaction.get_num_reactants():
+        error(
+            f"Reactants given did not match the SMARTS, expected {bold(reaction.get_num_reactants(), 'red')} but got {bold(len(reactants), 'red')}"
+        )
+        exit(-1)
+    if not 0 <= args.product < reaction.get_num_products():
+        error(
+            f"Invalid {bold('--product', 'red')} {bold(args.product, 'red')}, the SMARTS has {bold(reaction.get_num_products(), 'red')} products"
+        )
+        exit(-1)
+
+    log(f"Enumerating products with {bold(args.processors, 'blue')} processes...")
+    start = time.perf_counter()
+    with LibraryWriter(Path(args.output), args.shard_lines) as writer:
+        for smiles in reaction.enumerate(
+            reactants, args.processors, all_outcomes=args.outcomes != "first", product=args.product
+        ):
+            writer.write(smiles)
+    elapsed = time.perf_counter() - start
+    log(
+        f"Wrote {bold(writer.written, 'blue')} unique products to {bold(len(writer.paths), 'blue')} files "
+        f"in {elapsed:.1f}s ({writer.written / max(elapsed, 1e-9):.0f}/s)"
     )
+    exit(0)
+
+
+def start_coordinator(_parser, _args):
+    # the coordinator runs the regular pipeline, see `main`
+    pass
+
+
+def start_optimize(_parser, _args):
+    # the optimizer runs in `main`, like the pipeline
+    pass
 
 
-def cleanup(_parser):
+def cleanup(_parser, _args):
     log("executing cleanup...")
     shutil.rmtree(TMP_DIR)
     os.mkdir(TMP_DIR)
     exit(0)
 
 
-def display_help(parser):
+def display_help(parser, _args):
     parser.print_help()
     exit(0)
 
@@ -247,9 +583,62 @@ def parse() -> ParserOptions:
     subparsers = parser.add_subparsers(dest="subcmd", help="Utility commands")
     parser_cleanup = subparsers.add_parser("clean", help="remove all tmp files")
     parser_help = subparsers.add_parser("help", help="display this help menu")
+    parser_coordinator = subparsers.add_parser(
+        "coordinator", help="serve the species of this run to remote workers"
+    )
+    parser_coordinator.add_argument(
+        "--bind", help="host:port to listen on", default="0.0.0.0:50000"
+    )
+    parser_coordinator.add_argument(
+        "--authkey", help="shared secret of coordinator and workers (or MORPHEUS_AUTHKEY)"
+    )
+    parser_worker = subparsers.add_parser(
+        "worker", help="calculate species for a remote coordinator"
+    )
+    parser_worker.add_argument(
+        "--connect", help="host:port of the coordinator", required=True
+    )
+    parser_worker.add_argument(
+        "--authkey", help="shared secret of coordinator and workers (or MORPHEUS_AUTHKEY)"
+    )
+    parser_worker.add_argument(
+        "--worker-processes", help="number of workers to start on this machine", type=int, default=1
+    )
+    parser_enumerate = subparsers.add_parser(
+        "enumerate", help="write the unique products of every reactant combination, without calculating them"
+    )
+    parser_enumerate.add_argument(
+        "--shard-lines", help="split the output into files of at most N products", type=int, metavar="N"
+    )
+    parser_enumerate.add_argument(
+        "--product", help="index of the product of the SMARTS to write (default: 0)", type=int, default=0
+    )
+    parser_optimize = subparsers.add_parser(
+        "optimize", help="search the reactions of lowest ΔG with batch bayesian optimization"
+    )
+    parser_optimize.add_argument(
+        "--iterations", help="number of proposed batches (default: 10)", type=int, default=10
+    )
+    parser_optimize.add_argument(
+        "--batch-size", help="reactions calculated in parallel per batch (default: one per xtb job slot)", type=int
+    )
+    parser_optimize.add_argument(
+        "--initial", help="random reactions calculated first (default: one batch)", type=int
+    )
+    parser_optimize.add_argument(
+        "--features",
+        help="reactant features of the surrogate: morgan fingerprints (default) or rdkit descriptors",
+        choices=FEATURES,
+        default="morgan",
+    )
+    parser_optimize.add_argument("--seed", help="seed of the random choices", type=int)
     parser_help.set_defaults(func=display_help)
     parser_cleanup.set_defaults(func=cleanup)
+    parser_coordinator.set_defaults(func=start_coordinator)
+    parser_worker.set_defaults(func=start_worker)
+    parser_enumerate.set_defaults(func=start_enumerate)
+    parser_optimize.set_defaults(func=start_optimize)
     args = parser.parse_args()
     if args.subcmd:
-        args.func(parser)
+        args.func(parser, args)
     return get_options(args)
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, Optional
+
+from morpheus.cli.parser.options import FileFormat
+
+
+class RecordWriter(ABC):
+    """
+    Writes reaction records one at a time.
+
+    Every record is flushed (and fsynced for files) as soon as it is written, so a
+    crashed run keeps everything calculated up to that point.
+    """
+
+    file: IO
+    __sync: bool
+
+    def __init__(self, file: IO, sync: bool = True) -> None:
+        self.file = file
+        self.__sync = sync
+
+    @abstractmethod
+    def write(self, record: dict):
+        pass
+
+    def flush(self):
+        self.file.flush()
+        if self.__sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        if self.__sync:
+            self.file.close()
+
+
+class JsonLinesWriter(RecordWriter):
+    def write(self, record: dict):
+        self.file.write(json.dumps(record) + "\n")
+        self.flush()
+
+
+class JsonWriter(RecordWriter):
+    """writes a JSON array of records, which is only valid once the writer is closed"""
+
+    __first: bool
+
+    def __init__(self, file: IO, sync: bool = True) -> None:
+        super().__init__(file, sync)
+        self.__first = True
+        self.file.write("[")
+
+    def write(self, record: dict):
+        self.file.write(("\n" if self.__first else ",\n") + json.dumps(record))
+        self.__first = False
+        self.flush()
+
+    def close(self):
+        self.file.write("\n]\n")
+        super().close()
+
+
+class CsvWriter(RecordWriter):
+    __writer: Optional[csv.DictWriter]
+    __header: bool
+
+    def __init__(self, file: IO, sync: bool = True, header: bool = True) -> None:
+        super().__init__(file, sync)
+        self.__writer = None
+        self.__header = header
+
+    def write(self, record: dict):
+        # multi component SMILES are joined with "."
+        row = {
+            key: ".".join(value) if isinstance(value, list) else value
+            for key, value in record.items()
+        }
+        if self.__writer is None:
+            # the columns are fixed by the header: missing values are left empty, and
+            # values without a column are dropped rather than failing the whole run
+            self.__writer = csv.DictWriter(
+                self.file, fieldnames=list(row.keys()), restval="", extrasaction="ignore"
+            )
+            if self.__header:
+                self.__writer.writeheader()
+        self.__writer.writerow(row)
+        self.flush()
+
+
+def open_writer(format: FileFormat, path: Optional[Path], append: bool = False) -> RecordWriter:
+    """open a writer for `format`, writing to `path` or to stdout if no path is given
+
+    In `append` mode an existing file is extended instead of truncated, which is only
+    possible for line based formats.
+    """
+    if append and format == FileFormat.JSON:
+        raise ValueError("json output can not be appended to, use jsonl instead")
+
+    if path is None:
+        file, sync = sys.stdout, False
+    else:
+        file, sync = open(path, "a" if append else "w", newline=""), True
+
+    match format:
+        case FileFormat.JSON:
+            return JsonWriter(file, sync)
+        case FileFormat.JSONL:
+            return JsonLinesWriter(file, sync)
+        case FileFormat.CSV:
+            has_header = append and path is not None and path.exists() and path.stat().st_size > 0
+            return CsvWriter(file, sync, header=not has_header)
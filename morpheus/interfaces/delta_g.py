@@ -1,8 +1,24 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from morpheus.simulation.instance import SimulationInstance
 
 class IDeltaG(ABC):
+  __slots__ = ()
+
   @abstractmethod
   def calculate_delta_g(self, instance: SimulationInstance) -> float:
     pass
+
+  async def calculate_delta_g_async(self, instance: SimulationInstance) -> float:
+    return await asyncio.to_thread(self.calculate_delta_g, instance)
+
+  def calculate_force_field_energy(self) -> Optional[float]:
+    """MMFF94 energy in Eh, a cheap score for screening funnels, `None` if unknown"""
+    return None
+
+  def species(self) -> Optional[tuple[list[str], list[str]]]:
+    """canonical SMILES of the consumed and produced species, ΔG = Σ produced - Σ consumed,
+    `None` if unknown"""
+    return None
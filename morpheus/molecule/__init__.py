@@ -1,2 +1,3 @@
 from .molecule import Molecule
-from .smiles import Smiles, CanonicalSmiles
\ No newline at end of file
+from .smiles import Smiles, CanonicalSmiles
+from .registry import MoleculeRegistry
\ No newline at end of file
@@ -1,18 +1,92 @@
+import asyncio
 from pathlib import Path
 from typing import Optional
 
 import rdkit.Chem as _rdc
 from rdkit.Chem import AllChem as _rdca
+from rdkit.Chem import rdMolAlign as _rdMolAlign
 
+from morpheus.molecule.registry import MoleculeRegistry
 from morpheus.molecule.smiles import CanonicalSmiles, Smiles
 from morpheus.simulation.options import ConformerSearchMethod
 from morpheus.simulation.instance import SimulationInstance
+from morpheus.simulation.result import CalculationResult, boltzmann_average
 from morpheus.interfaces.delta_g import IDeltaG
+from morpheus.utils.units import EnergyUnit, EnergyValue
 
 import subprocess
 
 
+def prune_conformers(
+    mol: _rdc.Mol,
+    conformer_ids: list[int],
+    energies: list[float],
+    rmsd_threshold: float,
+    energy_window: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> list[int]:
+    """
+    Lowest energy, distinct conformers of `mol`.
+
+    Conformers more than `energy_window` above the minimum are dropped, the others are
+    visited by energy and kept unless their heavy atom RMSD to a kept conformer is below
+    `rmsd_threshold`. Stops as soon as `limit` conformers are kept.
+    """
+    ordered = sorted(zip(energies, conformer_ids))
+    minimum = ordered[0][0] if ordered else 0.0
+    heavy_atoms = [atom.GetIdx() for atom in mol.GetAtoms() if atom.GetAtomicNum() > 1]
+    # aligning moves the conformers, so a copy is compared
+    probe = _rdc.Mol(mol)
+
+    kept = []
+    for energy, conf_id in ordered:
+        if energy_window is not None and energy - minimum > energy_window:
+            break
+        if all(
+            _rdMolAlign.AlignMol(probe, probe, prbCid=conf_id, refCid=other, atomMap=[(i, i) for i in heavy_atoms])
+            >= rmsd_threshold
+            for other in kept
+        ):
+            kept.append(conf_id)
+            if limit is not None and len(kept) >= limit:
+                break
+    return kept
+
+
+def read_xyz_ensemble(path: Path) -> list[tuple[Optional[float], str]]:
+    """(energy, xyz block) of every structure of a multi structure xyz file, like crest_conformers.xyz
+
+    CREST writes the energy in Eh as the comment line of each structure.
+    """
+    try:
+        lines = open(path, "r").read().splitlines()
+    except FileNotFoundError:
+        return []
+
+    structures = []
+    start = 0
+    while start < len(lines) and lines[start].strip():
+        atoms = int(lines[start])
+        block = lines[start : start + atoms + 2]
+        try:
+            energy = float(block[1].split()[0])
+        except (IndexError, ValueError):
+            energy = None
+        structures.append((energy, "\n".join(block)))
+        start += atoms + 2
+    return structures
+
+
 class Molecule(IDeltaG):
+    """
+    A molecule and the RDKit Mol its geometry is generated in.
+
+    Parsing, canonicalization and hashing go through the shared `MoleculeRegistry`,
+    so they happen once per molecule, not once per access.
+    """
+
+    __slots__ = ("smiles", "delta_g", "__internal_mol")
+
     smiles: Smiles
     delta_g: Optional[float]
     __internal_mol: _rdc.Mol
@@ -27,7 +101,7 @@ class Molecule(IDeltaG):
         return self
 
     def __prepare_molecule(self):
-        self.__internal_mol = _rdc.AddHs(_rdc.MolFromSmiles(self.smiles))
+        self.__internal_mol = MoleculeRegistry.shared().get(self.smiles).prepared()
 
     @property
     def prepared_molecule(self) -> _rdc.Mol:
@@ -42,9 +116,13 @@ class Molecule(IDeltaG):
 
     def __eq__(self, other) -> bool:
         if isinstance(other, Molecule):
-            return _rdc.CanonSmiles(self.smiles) == _rdc.CanonSmiles(other.smiles)
+            registry = MoleculeRegistry.shared()
+            return registry.get(self.smiles).canonical == registry.get(other.smiles).canonical
         return False
 
+    def __hash__(self) -> int:
+        return MoleculeRegistry.shared().get(self.smiles).hash
+
     def obabel_fallback(self) -> _rdc.Mol:
         result = subprocess.run(
             ["obabel", f"-:{self.smiles}", "-oxyz", "-h", "--gen3d"],
@@ -66,56 +144,112 @@ class Molecule(IDeltaG):
 
     def optimize_molecule_rdkit(self, instance: SimulationInstance):
         conformer_search_options = instance.options.conformer_search
+        # conformers are embedded and optimized on the cores allocated to this job
+        threads = instance.options.xtb_cores
         params = _rdca.ETDG()
-        conformer_ids = _rdca.EmbedMultipleConfs(
+        params.numThreads = threads
+        conformer_ids = list(_rdca.EmbedMultipleConfs(
             self.__internal_mol,
             numConfs=conformer_search_options.accuracy,
             params=params,
-        )
+        ))
 
         # fallback if rdkit fails
         if len(conformer_ids) == 0:
             self.obabel_fallback()
             return
 
-        energies = []
-        for conf_id in conformer_ids:
-            _rdca.UFFOptimizeMolecule(self.__internal_mol, confId=conf_id)
-            energy = _rdca.UFFGetMoleculeForceField(
-                self.__internal_mol, confId=conf_id
-            ).CalcEnergy()
-            energies.append(energy)
-        self.__internal_mol = _rdc.Mol(
-            self.__internal_mol, confId=energies.index(min(energies))
-        )
+        # (not converged, energy) of every conformer, optimized in a single native call
+        results = _rdca.UFFOptimizeMoleculeConfs(self.__internal_mol, numThreads=threads)
+        energies = [energy for _not_converged, energy in results]
+        best = conformer_ids[energies.index(min(energies))]
+
+        if conformer_search_options.rerank:
+            # force field rankings are unreliable, let xtb pick among the best distinct conformers
+            candidates = prune_conformers(
+                self.__internal_mol,
+                conformer_ids,
+                energies,
+                conformer_search_options.rmsd_threshold,
+                conformer_search_options.energy_window,
+                conformer_search_options.rerank,
+            )
+            xtb_energies = instance.single_points(
+                [_rdc.MolToXYZBlock(self.__internal_mol, confId=conf_id) for conf_id in candidates],
+                conformer_search_options.rerank_level,
+            )
+            ranked = [(energy, conf_id) for energy, conf_id in zip(xtb_energies, candidates) if energy is not None]
+            if ranked:
+                best = min(ranked)[1]
+
+        self.__internal_mol = _rdc.Mol(self.__internal_mol, confId=best)
         _rdca.MMFFOptimizeMolecule(self.__internal_mol)
 
-    def optimize_molecule_crest(self, instance: SimulationInstance):
+    def calculate_force_field_energy(self) -> Optional[float]:
+        """MMFF94 energy of an optimized conformer in Eh, `None` if MMFF has no parameters"""
+        self.__prepare_molecule()
+        if _rdca.EmbedMolecule(self.__internal_mol, randomSeed=0xF00D) == -1:
+            return None
+        properties = _rdca.MMFFGetMoleculeProperties(self.__internal_mol)
+        if properties is None:
+            return None
+        force_field = _rdca.MMFFGetMoleculeForceField(self.__internal_mol, properties)
+        force_field.Minimize(maxIts=500)
+        return EnergyValue(force_field.CalcEnergy(), EnergyUnit.kCalMol).to(EnergyUnit.Eh).value
+
+    def crest_command(self, instance: SimulationInstance) -> list:
+        return [
+            "crest",
+            instance.inp_path,
+            "-v3",
+            "-chrg",
+            "0",
+            "-uhf",
+            "0",
+            "--T",
+            f"{instance.options.xtb_cores}",
+            f"-gfn{instance.options.conformer_search.accuracy.value}",
+        ]
+
+    def __prepare_crest(self, instance: SimulationInstance):
         self.__embed_molecule()
         _rdca.MMFFOptimizeMolecule(self.__internal_mol)
         _rdc.MolToXYZFile(self.__internal_mol, Path(f"{instance.inp_path}"))
-        subprocess.Popen(
-            [
-                "crest",
-                instance.inp_path,
-                "-v3",
-                "-chrg",
-                "0",
-                "-uhf",
-                "0",
-                "--T",
-                f"{instance.options.xtb_cores}",
-                f"-gfn{instance.options.conformer_search.accuracy.value}",
-            ],
-            cwd=instance.tmp_path,
-            # stdout=subprocess.DEVNULL,
-            stderr=subprocess.STDOUT,
-        ).wait()
 
+    def __read_crest(self, instance: SimulationInstance):
         self.__internal_mol = _rdc.MolFromXYZFile(
             Path(f"{instance.tmp_path}/crest_best.xyz").__str__()
         )
 
+    def __read_crest_ensemble(self, instance: SimulationInstance) -> list[str]:
+        """xyz blocks of the lowest CREST conformers selected by the ensemble options"""
+        conformer_search_options = instance.options.conformer_search
+        conformers = sorted(
+            (energy, xyz)
+            for energy, xyz in read_xyz_ensemble(instance.tmp_path / "crest_conformers.xyz")
+            if energy is not None
+        )
+        if conformer_search_options.ensemble_window is not None and conformers:
+            window = EnergyValue(conformer_search_options.ensemble_window, EnergyUnit.kCalMol)
+            limit = conformers[0][0] + window.to(EnergyUnit.Eh).value
+            conformers = [(energy, xyz) for energy, xyz in conformers if energy <= limit]
+        if conformer_search_options.ensemble is not None:
+            conformers = conformers[: conformer_search_options.ensemble]
+        # without an ensemble file, the best conformer is the whole ensemble
+        return [xyz for _energy, xyz in conformers] or [_rdc.MolToXYZBlock(self.__internal_mol)]
+
+    def optimize_molecule_crest(self, instance: SimulationInstance):
+        self.__prepare_crest(instance)
+        instance.runner.run(self.crest_command(instance), cwd=instance.tmp_path, quiet=False)
+        self.__read_crest(instance)
+
+    async def optimize_molecule_crest_async(self, instance: SimulationInstance):
+        await asyncio.to_thread(self.__prepare_crest, instance)
+        await instance.runner.run_async(
+            self.crest_command(instance), cwd=instance.tmp_path, quiet=False
+        )
+        self.__read_crest(instance)
+
     def optimize_molecule(self, instance: SimulationInstance):
         conformer_search_options = instance.options.conformer_search
         match conformer_search_options.method:
@@ -134,12 +268,33 @@ class Molecule(IDeltaG):
     def canonical(self) -> CanonicalSmiles:
         return CanonicalSmiles(self.smiles)
 
+    def species(self) -> tuple[list[str], list[str]]:
+        return [], [self.canonical.__str__()]
+
     def calculate_delta_g(self, instance: SimulationInstance) -> float:
-        return instance.cache.read(self.canonical) or instance.cache.write(
-            self.canonical, self.calculate_delta_g_real(instance)
+        return instance.cache.compute(
+            self.canonical,
+            instance.options,
+            lambda: self.calculate_result_real(instance),
         )
 
-    def calculate_delta_g_real(self, instance: SimulationInstance) -> float:
+    async def calculate_delta_g_async(self, instance: SimulationInstance) -> float:
+        return await instance.cache.compute_async(
+            self.canonical,
+            instance.options,
+            lambda: self.calculate_result_real_async(instance),
+        )
+
+    def calculate_result(self, instance: SimulationInstance) -> Optional[CalculationResult]:
+        """full thermochemistry of the molecule, served from the cache when possible"""
+        self.calculate_delta_g(instance)
+        return instance.cache.read_result(self.canonical, instance.options)
+
+    async def calculate_result_async(self, instance: SimulationInstance) -> Optional[CalculationResult]:
+        await self.calculate_delta_g_async(instance)
+        return instance.cache.read_result(self.canonical, instance.options)
+
+    def generate_geometry(self, instance: SimulationInstance):
         self.__prepare_molecule()
 
         self.__embed_molecule()
@@ -149,6 +304,51 @@ class Molecule(IDeltaG):
             self.__embed_molecule()
             _rdca.MMFFOptimizeMolecule(self.__internal_mol)
 
-        instance.generate_inp_file(_rdc.MolToXYZBlock(self.__internal_mol))
+    def starting_geometries(self, instance: SimulationInstance) -> list[str]:
+        """xyz blocks the xtb calculation starts from, every conformer of an ensemble"""
+        self.generate_geometry(instance)
+        if instance.options.conformer_search and instance.options.conformer_search.is_ensemble:
+            return self.__read_crest_ensemble(instance)
+        return [_rdc.MolToXYZBlock(self.__internal_mol)]
+
+    def calculate_result_real(
+        self, instance: SimulationInstance, geometries: Optional[list[str]] = None
+    ) -> Optional[CalculationResult]:
+        if geometries is None:
+            geometries = self.starting_geometries(instance)
+
+        if instance.options.conformer_search and instance.options.conformer_search.is_ensemble:
+            return boltzmann_average(instance.calculate_ensemble(geometries))
+
+        return instance.calculate(geometries[0])
+
+    def calculate_delta_g_from(self, instance: SimulationInstance, geometries: list[str]) -> float:
+        """free energy starting from already searched `geometries`, e.g. shared between solvents"""
+        return instance.cache.compute(
+            self.canonical,
+            instance.options,
+            lambda: self.calculate_result_real(instance, geometries),
+        )
+
+    async def calculate_result_real_async(self, instance: SimulationInstance) -> Optional[CalculationResult]:
+        conformer_search_options = instance.options.conformer_search
+        if conformer_search_options and conformer_search_options.method == ConformerSearchMethod.CREST:
+            self.__prepare_molecule()
+            await self.optimize_molecule_crest_async(instance)
+            if conformer_search_options.is_ensemble:
+                return boltzmann_average(
+                    await instance.calculate_ensemble_async(self.__read_crest_ensemble(instance))
+                )
+        else:
+            # RDKit releases the GIL for embedding and force field optimizations
+            await asyncio.to_thread(self.generate_geometry, instance)
+
+        return await instance.calculate_async(_rdc.MolToXYZBlock(self.__internal_mol))
+
+    def calculate_delta_g_real(self, instance: SimulationInstance) -> float:
+        result = self.calculate_result_real(instance)
+        return result.free_energy if result else None
 
-        return instance.calculate_delta_g()
+    async def calculate_delta_g_real_async(self, instance: SimulationInstance) -> float:
+        result = await self.calculate_result_real_async(instance)
+        return result.free_energy if result else None
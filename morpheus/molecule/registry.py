@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import rdkit.Chem as _rdc
+
+DEFAULT_MAXSIZE = 65536
+
+
+class MoleculeRecord:
+    """A molecule parsed once, with its canonical SMILES and hash"""
+
+    __slots__ = ("mol", "canonical", "hash", "__prepared")
+
+    mol: _rdc.Mol
+    canonical: str
+    hash: int
+    __prepared: Optional[_rdc.Mol]
+
+    def __init__(self, mol: _rdc.Mol, canonical: str) -> None:
+        self.mol = mol
+        self.canonical = canonical
+        self.hash = hash(canonical)
+        self.__prepared = None
+
+    def prepared(self) -> _rdc.Mol:
+        """a copy of the molecule with explicit hydrogens, callers may embed and modify it"""
+        if self.__prepared is None:
+            self.__prepared = _rdc.AddHs(self.mol)
+        return _rdc.Mol(self.__prepared)
+
+
+class MoleculeRegistry:
+    """
+    Interns molecules by canonical SMILES.
+
+    Every SMILES is parsed once, all spellings of a molecule share one `MoleculeRecord`.
+    Like the memory tier of `SimulationCache`, the registry is a bounded LRU of
+    `maxsize` SMILES, a `maxsize` of 0 disables interning.
+    """
+
+    maxsize: int
+    __records: OrderedDict[str, MoleculeRecord]
+    __lock: threading.Lock
+
+    __shared: Optional["MoleculeRegistry"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        self.maxsize = maxsize
+        self.__records = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "MoleculeRegistry":
+        """registry shared by every molecule of this process"""
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = cls()
+            return cls.__shared
+
+    def __remember(self, smiles: str, record: MoleculeRecord):
+        self.__records[smiles] = record
+        self.__records.move_to_end(smiles)
+        while len(self.__records) > self.maxsize:
+            self.__records.popitem(last=False)
+
+    def __contains__(self, smiles: str) -> bool:
+        with self.__lock:
+            return smiles in self.__records
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def get(self, smiles: str) -> MoleculeRecord:
+        """record of `smiles`, parsed only if no spelling of the molecule is known"""
+        smiles = str.__str__(smiles)
+        with self.__lock:
+            record = self.__records.get(smiles)
+            if record is not None:
+                self.__records.move_to_end(smiles)
+                return record
+
+        mol = _rdc.MolFromSmiles(smiles)
+        if mol is None:
+            raise ValueError(f"Invalid SMILES: {smiles}")
+        canonical = _rdc.MolToSmiles(mol)
+        with self.__lock:
+            record = self.__records.get(canonical) or MoleculeRecord(mol, canonical)
+            self.__remember(canonical, record)
+            self.__remember(smiles, record)
+        return record
+
+    def clear(self):
+        with self.__lock:
+            self.__records.clear()
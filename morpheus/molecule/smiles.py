@@ -1,17 +1,31 @@
 from rdkit import Chem as rdc
 
+from morpheus.molecule.registry import MoleculeRegistry
+
 class Smiles(str):
-  smiles_string: str
-  
-  def __init__(self, smiles: str) -> None:
-    if not rdc.MolFromSmiles(smiles, sanitize=False):
+  """a valid SMILES, validated once: wrapping a `Smiles` again returns it unchanged"""
+  __slots__ = ()
+
+  def __new__(cls, smiles: str) -> "Smiles":
+    if isinstance(smiles, cls):
+      return smiles
+    # interned SMILES were already parsed
+    if smiles not in MoleculeRegistry.shared() and not rdc.MolFromSmiles(smiles, sanitize=False):
       raise ValueError(f"Invalid SMILES: {smiles}")
-    else:
-      self.smiles_string = smiles
+    return super().__new__(cls, smiles)
+
+  @property
+  def smiles_string(self) -> str:
+    return str.__str__(self)
 
   def __str__(self) -> str:
-    return self.smiles_string
+    return str.__str__(self)
 
 class CanonicalSmiles(Smiles):
-  def __init__(self, smiles: Smiles) -> None:
-    self.smiles_string = rdc.CanonSmiles(smiles)
\ No newline at end of file
+  """canonical SMILES of a molecule, looked up in the shared `MoleculeRegistry`"""
+  __slots__ = ()
+
+  def __new__(cls, smiles: Smiles) -> "CanonicalSmiles":
+    if isinstance(smiles, cls):
+      return smiles
+    return str.__new__(cls, MoleculeRegistry.shared().get(smiles).canonical)
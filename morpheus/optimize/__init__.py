@@ -0,0 +1,4 @@
+from .features import CandidateFeatures
+from .surrogate import BayesianRidge, GaussianProcess
+from .optimizer import BatchOptimizer, OptimizationStep
+from .prediction import SpeciesSurrogate
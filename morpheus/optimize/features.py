@@ -0,0 +1,89 @@
+from typing import Iterable
+
+import numpy as np
+from rdkit.Chem import Descriptors, rdFingerprintGenerator
+
+from morpheus.molecule.registry import MoleculeRegistry
+
+FEATURES = ["morgan", "descriptors"]
+MORGAN_RADIUS = 2
+MORGAN_SIZE = 1024
+DESCRIPTORS = [
+    "MolWt",
+    "MolLogP",
+    "MolMR",
+    "TPSA",
+    "NumHDonors",
+    "NumHAcceptors",
+    "NumRotatableBonds",
+    "RingCount",
+    "NumAromaticRings",
+    "FractionCSP3",
+    "HeavyAtomCount",
+    "NumValenceElectrons",
+]
+
+
+def morgan_fingerprints(
+    smiles: Iterable[str], radius: int = MORGAN_RADIUS, size: int = MORGAN_SIZE, counts: bool = False
+) -> np.ndarray:
+    """Morgan fingerprint bits (or `counts`) of every molecule, SMILES that can not be parsed have none"""
+    generator = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=size)
+    fingerprint = generator.GetCountFingerprintAsNumPy if counts else generator.GetFingerprintAsNumPy
+    registry = MoleculeRegistry.shared()
+    rows = []
+    for key in smiles:
+        try:
+            rows.append(fingerprint(registry.get(key).mol))
+        except ValueError:
+            rows.append(np.zeros(size, dtype=np.uint8))
+    return np.array(rows, dtype=np.float32).reshape(-1, size)
+
+
+def descriptors(smiles: Iterable[str]) -> np.ndarray:
+    """standardized RDKit descriptors of every molecule, zero for SMILES that can not be parsed"""
+    registry = MoleculeRegistry.shared()
+    functions = [getattr(Descriptors, name) for name in DESCRIPTORS]
+    rows = []
+    for key in smiles:
+        try:
+            mol = registry.get(key).mol
+            rows.append([function(mol) for function in functions])
+        except ValueError:
+            rows.append([np.nan] * len(functions))
+    values = np.array(rows, dtype=np.float64).reshape(-1, len(functions))
+    mean = np.nanmean(values, axis=0) if len(values) else 0.0
+    scale = np.nanstd(values, axis=0) if len(values) else 1.0
+    values = (values - mean) / np.where(scale > 0, scale, 1.0)
+    return np.nan_to_num(values).astype(np.float32)
+
+
+class CandidateFeatures:
+    """
+    Features of reactions, the features of their reactants side by side.
+
+    Reactants are featurized once per position, the features of a reaction are
+    assembled from its reactant indices when they are needed.
+    """
+
+    kind: str
+    positions: list[np.ndarray]
+
+    def __init__(self, reactants: list[list[str]], kind: str = "morgan") -> None:
+        if kind not in FEATURES:
+            raise ValueError(f"unknown features {kind}, expected one of {', '.join(FEATURES)}")
+        self.kind = kind
+        featurize = morgan_fingerprints if kind == "morgan" else descriptors
+        self.positions = [featurize(reactant_list) for reactant_list in reactants]
+
+    @property
+    def kernel(self) -> str:
+        """the kernel that suits the features, Tanimoto for fingerprint bits"""
+        return "tanimoto" if self.kind == "morgan" else "rbf"
+
+    def __call__(self, combinations: np.ndarray) -> np.ndarray:
+        """features of the reactions with the reactant indices in the rows of `combinations`"""
+        combinations = np.asarray(combinations, dtype=np.int64).reshape(-1, len(self.positions))
+        return np.hstack(
+            [features[combinations[:, i]] for i, features in enumerate(self.positions)]
+        )
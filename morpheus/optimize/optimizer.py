@@ -0,0 +1,198 @@
+import asyncio
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+
+from morpheus.cli.helper import Combinations
+from morpheus.molecule import Molecule, Smiles
+from morpheus.optimize.features import CandidateFeatures
+from morpheus.optimize.surrogate import GaussianProcess, expected_improvement
+from morpheus.reaction import ReactantFilter, ReactionTemplate
+from morpheus.scheduler.jobs import ReactionResult, react
+from morpheus.simulation import Simulation
+
+# candidates scored by the surrogate per batch, larger screens are sampled
+POOL_SIZE = 20000
+
+
+class OptimizationStep:
+    """the reactions calculated in one iteration, and the best reaction so far"""
+
+    iteration: int
+    reactions: list[ReactionResult]
+    best: Optional[ReactionResult]
+    calculated: int
+    wall_time: float
+
+    def __init__(
+        self,
+        iteration: int,
+        reactions: list[ReactionResult],
+        best: Optional[ReactionResult],
+        calculated: int,
+        wall_time: float,
+    ) -> None:
+        self.iteration = iteration
+        self.reactions = reactions
+        self.best = best
+        self.calculated = calculated
+        self.wall_time = wall_time
+
+
+class BatchOptimizer:
+    """
+    Batch Bayesian optimization of the lowest ΔG of a reaction screen.
+
+    Reactions are featurized by the fingerprints (or descriptors) of their reactants. A
+    Gaussian process fitted to the calculated reactions proposes the next `batch_size`
+    reactions by expected improvement, with the kriging believer: every pick is added
+    to the surrogate at its predicted ΔG before the next one is chosen. A batch is
+    calculated concurrently on all job slots of the simulation. Species go through the
+    simulation cache, so every species is calculated once per run, and not at all if a
+    previous run cached it.
+    """
+
+    template: ReactionTemplate
+    reactants: list[list[Smiles]]
+    simulation: Simulation
+    batch_size: int
+    pool_size: int
+    combinations: Combinations
+    candidates: list[list[int]]
+    candidate_combinations: Combinations
+    features: CandidateFeatures
+    results: dict[int, ReactionResult]
+    __rng: np.random.Generator
+
+    def __init__(
+        self,
+        template: ReactionTemplate,
+        reactants: list[list[Smiles]],
+        simulation: Optional[Simulation] = None,
+        batch_size: Optional[int] = None,
+        features: str = "morgan",
+        pool_size: int = POOL_SIZE,
+        seed: Optional[int] = None,
+        prefilter: bool = True,
+    ) -> None:
+        self.template = template
+        self.reactants = reactants
+        self.simulation = simulation or Simulation()
+        self.batch_size = batch_size or self.simulation.options.parallel_jobs
+        self.pool_size = pool_size
+        self.combinations = Combinations([len(reactant_list) for reactant_list in reactants])
+        self.candidates = (
+            ReactantFilter(template).candidates(reactants)
+            if prefilter
+            else [list(range(len(reactant_list))) for reactant_list in reactants]
+        )
+        self.candidate_combinations = Combinations([len(indices) for indices in self.candidates])
+        self.features = CandidateFeatures(reactants, features)
+        # every calculated reaction, by its index among all combinations
+        self.results = {}
+        self.__rng = np.random.default_rng(seed)
+
+    def __reactant_indices(self, candidate: int) -> tuple[int, ...]:
+        return tuple(
+            self.candidates[i][j] for i, j in enumerate(self.candidate_combinations[candidate])
+        )
+
+    def __pool(self) -> tuple[list[int], np.ndarray]:
+        """indices and reactant indices of uncalculated candidates, sampled from large screens"""
+        total = len(self.candidate_combinations)
+        if total <= self.pool_size + len(self.results):
+            candidates = range(total)
+        else:
+            candidates = self.__rng.choice(total, self.pool_size, replace=False)
+        indices = []
+        reactant_indices = []
+        for candidate in candidates:
+            combination = self.__reactant_indices(int(candidate))
+            index = self.combinations.index(combination)
+            if index not in self.results:
+                indices.append(index)
+                reactant_indices.append(combination)
+        return indices, np.array(reactant_indices, dtype=np.int64).reshape(-1, len(self.reactants))
+
+    @property
+    def calculated(self) -> list[ReactionResult]:
+        return [result for result in self.results.values() if result.delta_g is not None]
+
+    def best(self) -> Optional[ReactionResult]:
+        calculated = self.calculated
+        return min(calculated, key=lambda result: result.delta_g) if calculated else None
+
+    def propose(self, size: Optional[int] = None) -> list[int]:
+        """indices of the next `size` reactions to calculate, random until two are known"""
+        size = size or self.batch_size
+        indices, pool = self.__pool()
+        if len(indices) <= size:
+            return indices
+        calculated = self.calculated
+        if len(calculated) < 2:
+            return [indices[i] for i in self.__rng.choice(len(indices), size, replace=False)]
+
+        x_pool = self.features(pool)
+        x = self.features(np.array([self.combinations[result.index] for result in calculated]))
+        y = np.array([result.delta_g for result in calculated])
+        best = float(y.min())
+        gp = GaussianProcess(self.features.kernel).fit(x, y)
+        cross = gp.covariance(x_pool, x)
+
+        chosen = []
+        for _ in range(size):
+            mean, std = gp.predict(x_pool, cross)
+            improvement = expected_improvement(mean, std, best)
+            improvement[chosen] = -np.inf
+            pick = int(np.argmax(improvement))
+            chosen.append(pick)
+            # kriging believer: the pick is assumed to have its predicted ΔG
+            x = np.vstack([x, x_pool[pick : pick + 1]])
+            y = np.append(y, mean[pick])
+            gp.fit(x, y, tune=False)
+            cross = np.hstack([cross, gp.covariance(x_pool, x_pool[pick : pick + 1])])
+        return [indices[i] for i in chosen]
+
+    async def __gather(self, keys: list[str]) -> list[Optional[float]]:
+        energies = await asyncio.gather(
+            *[self.simulation.calculate_delta_g_async(Molecule(Smiles(key))) for key in keys],
+            return_exceptions=True,
+        )
+        return [None if isinstance(energy, BaseException) else energy for energy in energies]
+
+    def evaluate(self, indices: list[int]) -> list[ReactionResult]:
+        """run and calculate the reactions `indices`, their species concurrently"""
+        results = []
+        for index in indices:
+            combination = self.combinations[index]
+            reactants = [self.reactants[i][j] for i, j in enumerate(combination)]
+            results.append(react(self.template, index, reactants))
+
+        keys = list(dict.fromkeys(
+            key for result in results if result.products and not result.error for key in result.species()
+        ))
+        energies = dict(zip(keys, asyncio.run(self.__gather(keys))))
+        for result in results:
+            if result.products and not result.error:
+                result.evaluate(energies)
+                if result.delta_g is None:
+                    missing = [key for key in result.species() if energies.get(key) is None]
+                    result.error = f"no free energy for {', '.join(missing)}"
+            self.results[result.index] = result
+        return results
+
+    def run(self, iterations: int, initial: Optional[int] = None) -> Iterator[OptimizationStep]:
+        """
+        Calculate `initial` random reactions (a batch by default), then `iterations`
+        proposed batches. Stops early once every candidate was calculated.
+        """
+        for iteration in range(iterations + 1):
+            start = time.perf_counter()
+            indices = self.propose(initial or self.batch_size) if iteration == 0 else self.propose()
+            if not indices:
+                return
+            reactions = self.evaluate(indices)
+            yield OptimizationStep(
+                iteration, reactions, self.best(), len(self.results), time.perf_counter() - start
+            )
@@ -0,0 +1,82 @@
+import math
+from typing import Iterable
+
+import numpy as np
+
+from morpheus.optimize.features import morgan_fingerprints
+from morpheus.optimize.surrogate import BayesianRidge
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import SimulationOptions
+
+PREDICTION_RADIUS = 1
+PREDICTION_SIZE = 1024
+# species calculated before any prediction is trusted
+MIN_OBSERVATIONS = 8
+
+
+class SpeciesSurrogate:
+    """
+    Predicts the free energy of a species, with an uncertainty, from calculated ones.
+
+    Free energies are close to additive over atoms and their neighbours, so a bayesian
+    ridge regression on Morgan fingerprint counts predicts them well for molecules made
+    of environments that were seen before, and reports a large uncertainty for the
+    rest. The model is updated incrementally, every species trains it once.
+    """
+
+    radius: int
+    size: int
+    model: BayesianRidge
+    trained: set[str]
+
+    def __init__(self, radius: int = PREDICTION_RADIUS, size: int = PREDICTION_SIZE, ridge: float = 1e-2) -> None:
+        self.radius = radius
+        self.size = size
+        # the last column is the bias
+        self.model = BayesianRidge(size + 1, ridge)
+        self.trained = set()
+
+    @classmethod
+    def from_cache(cls, cache: SimulationCache, options: SimulationOptions, **kwargs) -> "SpeciesSurrogate":
+        """a surrogate trained on every species in `cache` calculated with `options`"""
+        surrogate = cls(**kwargs)
+        surrogate.update_many(cache.entries(options))
+        return surrogate
+
+    @property
+    def observations(self) -> int:
+        return self.model.observations
+
+    def features(self, keys: list[str]) -> np.ndarray:
+        counts = morgan_fingerprints(keys, self.radius, self.size, counts=True).astype(np.float64)
+        return np.hstack([counts, np.ones((len(keys), 1))])
+
+    def update(self, key: str, delta_g: float):
+        self.update_many([(key, delta_g)])
+
+    def update_many(self, entries: Iterable[tuple[str, float]]) -> int:
+        """train on the (canonical SMILES, free energy) `entries` not seen before, returns their number"""
+        keys = []
+        values = []
+        for key, delta_g in entries:
+            if key not in self.trained and delta_g is not None:
+                self.trained.add(key)
+                keys.append(key)
+                values.append(delta_g)
+        if keys:
+            x = self.features(keys)
+            # SMILES that can not be parsed have no fingerprint to learn from
+            valid = x[:, :-1].any(axis=1)
+            self.model.update(x[valid], np.array(values)[valid])
+        return len(keys)
+
+    def predict(self, keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """predicted free energy and its standard deviation of every species, infinite if unknown"""
+        if not keys:
+            return np.zeros(0), np.zeros(0)
+        x = self.features(keys)
+        mean, std = self.model.predict(x)
+        if self.observations < MIN_OBSERVATIONS:
+            std[:] = math.inf
+        std[~x[:, :-1].any(axis=1)] = math.inf
+        return mean, std
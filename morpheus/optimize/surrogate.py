@@ -0,0 +1,167 @@
+import math
+from typing import Optional
+
+import numpy as np
+
+KERNELS = ["tanimoto", "rbf"]
+# noise variances tried on the normalized targets, the most likely one is kept
+NOISE_GRID = [1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+
+
+def tanimoto(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Tanimoto similarity of the rows of `a` and `b`, for fingerprint bits or counts"""
+    dot = a @ b.T
+    union = np.sum(a * a, axis=1)[:, None] + np.sum(b * b, axis=1)[None, :] - dot
+    return np.where(union > 0, dot / np.where(union > 0, union, 1.0), 1.0)
+
+
+def squared_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    distances = np.sum(a * a, axis=1)[:, None] + np.sum(b * b, axis=1)[None, :] - 2 * a @ b.T
+    return np.maximum(distances, 0.0)
+
+
+class GaussianProcess:
+    """
+    Exact Gaussian process regression in NumPy, for a few hundred observations.
+
+    Targets are normalized, the prior variance of the kernel is 1. The noise variance
+    is picked from `NOISE_GRID` by the log marginal likelihood, the length scale of
+    the `rbf` kernel is the median distance of the training points.
+    """
+
+    kernel: str
+    noise: float
+    lengthscale: float
+    __x: Optional[np.ndarray]
+    __cholesky: Optional[np.ndarray]
+    __alpha: Optional[np.ndarray]
+    __mean: float
+    __scale: float
+
+    def __init__(self, kernel: str = "tanimoto") -> None:
+        if kernel not in KERNELS:
+            raise ValueError(f"unknown kernel {kernel}, expected one of {', '.join(KERNELS)}")
+        self.kernel = kernel
+        self.noise = NOISE_GRID[0]
+        self.lengthscale = 1.0
+        self.__x = None
+        self.__cholesky = None
+        self.__alpha = None
+        self.__mean = 0.0
+        self.__scale = 1.0
+
+    def covariance(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        if self.kernel == "tanimoto":
+            return tanimoto(a, b)
+        return np.exp(-0.5 * squared_distances(a, b) / self.lengthscale**2)
+
+    def fit(self, x: np.ndarray, y: np.ndarray, tune: bool = True) -> "GaussianProcess":
+        """condition on the observations `y` at the rows of `x`, keeps the noise and
+        length scale of the previous fit unless `tune`"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.__mean = float(np.mean(y))
+        self.__scale = float(np.std(y)) or 1.0
+        target = (y - self.__mean) / self.__scale
+        if self.kernel == "rbf" and tune:
+            distances = np.sqrt(squared_distances(x, x))[np.triu_indices(len(x), 1)]
+            self.lengthscale = float(np.median(distances[distances > 0])) if np.any(distances > 0) else 1.0
+
+        covariance = self.covariance(x, x)
+        best = None
+        for noise in NOISE_GRID if tune else [self.noise]:
+            try:
+                cholesky = np.linalg.cholesky(covariance + noise * np.eye(len(x)))
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, target))
+            likelihood = (
+                -0.5 * target @ alpha
+                - np.sum(np.log(np.diag(cholesky)))
+                - 0.5 * len(x) * math.log(2 * math.pi)
+            )
+            if best is None or likelihood > best[0]:
+                best = (likelihood, noise, cholesky, alpha)
+        _likelihood, self.noise, self.__cholesky, self.__alpha = best
+        self.__x = x
+        return self
+
+    def predict(self, x: np.ndarray, cross: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Posterior mean and standard deviation at the rows of `x`.
+
+        `cross`, the covariance of `x` and the training points, can be passed when it
+        is already known.
+        """
+        if cross is None:
+            cross = self.covariance(np.asarray(x, dtype=np.float64), self.__x)
+        mean = cross @ self.__alpha
+        v = np.linalg.solve(self.__cholesky, cross.T)
+        variance = np.maximum(1.0 - np.sum(v * v, axis=0), 1e-12)
+        return self.__mean + self.__scale * mean, self.__scale * np.sqrt(variance)
+
+
+def normal_cdf(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.vectorize(math.erf, otypes=[float])(z / math.sqrt(2)))
+
+
+def expected_improvement(mean: np.ndarray, std: np.ndarray, best: float, xi: float = 0.0) -> np.ndarray:
+    """expected improvement below `best`, for minimization"""
+    improvement = best - mean - xi
+    z = improvement / std
+    return improvement * normal_cdf(z) + std * np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+
+
+class BayesianRidge:
+    """
+    Bayesian linear regression, updated one observation at a time.
+
+    Only the inverse of XᵀX + λI and Xᵀy are kept, an update is a Sherman-Morrison
+    step and memory does not grow with the observations. The noise variance is
+    estimated from the error of every observation predicted before it was added,
+    scaled by its leverage, so the uncertainty stays honest for rows unlike the
+    ones seen so far.
+    """
+
+    ridge: float
+    observations: int
+    __inverse: np.ndarray
+    __moment: np.ndarray
+    __weights: np.ndarray
+    __squared_error: float
+    __scored: int
+
+    def __init__(self, features: int, ridge: float = 1e-2) -> None:
+        self.ridge = ridge
+        self.observations = 0
+        self.__inverse = np.eye(features) / ridge
+        self.__moment = np.zeros(features)
+        self.__weights = np.zeros(features)
+        self.__squared_error = 0.0
+        self.__scored = 0
+
+    @property
+    def noise(self) -> float:
+        """noise variance, infinite until an observation was predicted"""
+        return self.__squared_error / self.__scored if self.__scored else math.inf
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        """add the observations `y` at the rows of `x`"""
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        for row, value in zip(x, y):
+            projected = self.__inverse @ row
+            leverage = float(row @ projected)
+            if self.observations:
+                self.__squared_error += float(value - row @ self.__weights) ** 2 / (1.0 + leverage)
+                self.__scored += 1
+            self.__inverse -= np.outer(projected, projected) / (1.0 + leverage)
+            self.__moment += value * row
+            self.__weights = self.__inverse @ self.__moment
+            self.observations += 1
+
+    def predict(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """predictive mean and standard deviation at the rows of `x`"""
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        leverage = np.sum((x @ self.__inverse) * x, axis=1)
+        return x @ self.__weights, np.sqrt(self.noise * (1.0 + leverage))
@@ -1 +1,2 @@
-from .reaction import Reaction, ReactionTemplate, ReactionProducts
\ No newline at end of file
+from .reaction import Reaction, ReactionTemplate, ReactionProducts, unique_outcomes
+from .prefilter import ReactantFilter
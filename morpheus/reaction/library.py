@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import itertools
+import math
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+
+from rdkit import RDLogger
+from rdkit import Chem as _rdc
+from rdkit.Chem import rdChemReactions
+
+from morpheus.cli.helper import Combinations
+from morpheus.reaction.prefilter import ReactantFilter
+from morpheus.reaction.reaction import ReactionTemplate
+from morpheus.scheduler.scheduler import Scheduler
+
+# reactions handed to a worker at once
+SHARD_SIZE = 4096
+
+
+def read_smiles(path: Path) -> Iterator[str]:
+    """SMILES of every non-empty line of a (gzip compressed) file, without loading the file"""
+    with open_text(path, "r") as file:
+        for line in file:
+            smiles = line.split()
+            if smiles:
+                yield smiles[0]
+
+
+def open_text(path: Path, mode: str) -> IO:
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class LibraryWriter:
+    """
+    Writes one SMILES per line, optionally split into shards of `shard_size` lines.
+
+    Shards of `library.smi.gz` are named `library.00000.smi.gz`, ...; a `.gz` suffix
+    compresses the output.
+    """
+
+    path: Path
+    shard_size: Optional[int]
+    written: int
+    paths: list[Path]
+    __file: Optional[IO]
+
+    def __init__(self, path: Path, shard_size: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.shard_size = shard_size
+        self.written = 0
+        self.paths = []
+        self.__file = None
+
+    def __enter__(self) -> "LibraryWriter":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def __shard_path(self, shard: int) -> Path:
+        suffixes = "".join(self.path.suffixes)
+        name = self.path.name.removesuffix(suffixes)
+        return self.path.with_name(f"{name}.{shard:05d}{suffixes}")
+
+    def write(self, smiles: str):
+        if self.__file is None or (self.shard_size and self.written % self.shard_size == 0):
+            self.close()
+            path = self.__shard_path(len(self.paths)) if self.shard_size else self.path
+            self.__file = open_text(path, "w")
+            self.paths.append(path)
+        self.__file.write(f"{smiles}\n")
+        self.written += 1
+
+    def close(self):
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+
+
+# state of an enumeration worker, set up once by `init_enumeration`
+_reaction: rdChemReactions.ChemicalReaction
+_filter: ReactantFilter
+_fixed: list[list[_rdc.Mol]]
+_all_outcomes: bool
+_product: int
+
+
+def init_enumeration(smarts: str, fixed: list[list[str]], all_outcomes: bool, product: int):
+    global _reaction, _filter, _fixed, _all_outcomes, _product
+    # products that can not be sanitized are skipped, rdkit would log every one of them
+    RDLogger.DisableLog("rdApp.*")
+    _reaction = rdChemReactions.ReactionFromSmarts(smarts)
+    _filter = ReactantFilter(ReactionTemplate(smarts))
+    _fixed = [[prepare(smiles) for smiles in reactant_list] for reactant_list in fixed]
+    _all_outcomes = all_outcomes
+    _product = product
+
+
+def prepare(smiles: str) -> Optional[_rdc.Mol]:
+    mol = _rdc.MolFromSmiles(smiles)
+    return _rdc.AddHs(mol) if mol else None
+
+
+def canonical_product(mol: _rdc.Mol) -> Optional[str]:
+    # the same SMILES as `Molecule.from_molecule(mol).canonical`, i.e. the cache key
+    try:
+        return _rdc.CanonSmiles(_rdc.MolToSmiles(_rdc.RemoveHs(mol), kekuleSmiles=True))
+    except Exception:
+        return None
+
+
+def run_enumeration_shard(job: tuple[list[str], int, int]) -> list[str]:
+    """unique canonical products of the reactions `start` to `stop` of a block of first reactants"""
+    first, start, stop = job
+    first = [prepare(smiles) for smiles in first]
+    # reactants that can not match are dropped once, not for every combination
+    first = [mol if mol and _filter.matches_molecule(0, mol) else None for mol in first]
+    reactant_lists = [first, *_fixed]
+    products = {}
+    combinations = Combinations([len(reactant_list) for reactant_list in reactant_lists])
+    for _index, indices in combinations.shard(start, stop):
+        reactants = [reactant_list[i] for reactant_list, i in zip(reactant_lists, indices)]
+        if any(reactant is None for reactant in reactants):
+            continue
+        outcomes = _reaction.RunReactants(reactants)
+        for outcome in outcomes if _all_outcomes else outcomes[:1]:
+            smiles = canonical_product(outcome[_product])
+            if smiles:
+                products[smiles] = None
+    return list(products)
+
+
+def enumeration_jobs(
+    first: Iterable[str], fixed_count: int, shard_size: int
+) -> Iterator[tuple[list[str], int, int]]:
+    """
+    Shards of at most `shard_size` reactions, streaming the first reactants.
+
+    The first reactants are read in blocks, every other reactant list is combined with
+    each block, so only a block of the first reactants is held in memory at once.
+    """
+    block_size = max(shard_size // max(fixed_count, 1), 1)
+    first = iter(first)
+    while block := list(itertools.islice(first, block_size)):
+        total = len(block) * fixed_count
+        for start in range(0, total, shard_size):
+            yield block, start, min(start + shard_size, total)
+
+
+def product_key(smiles: str) -> bytes:
+    # 8 bytes per product instead of the whole SMILES, collisions are negligible
+    return hashlib.blake2b(smiles.encode("utf-8"), digest_size=8).digest()
+
+
+def enumerate_products(
+    smarts: str,
+    first: Iterable[str],
+    fixed: list[list[str]],
+    processes: int = 1,
+    all_outcomes: bool = False,
+    product: int = 0,
+    shard_size: int = SHARD_SIZE,
+) -> Iterator[str]:
+    """
+    Unique canonical SMILES of product `product` of every reaction of the reactants.
+
+    `first` (e.g. a file read with `read_smiles`) is streamed, the reactants of the
+    other positions in `fixed` are held in memory. Shards of reactions are run in a
+    pool of `processes`, only a bounded number of them is in flight, and products are
+    yielded in a deterministic order. Memory grows with the number of unique products
+    (a 8 byte hash each), not with the number of reactions.
+    """
+    # reactants of the other positions that can not match are never sent to the workers
+    reactant_filter = ReactantFilter(ReactionTemplate(smarts))
+    fixed = [
+        [reactant_list[i] for i in reactant_filter.filter(position, reactant_list)]
+        for position, reactant_list in enumerate(fixed, 1)
+    ]
+    fixed_count = math.prod(len(reactant_list) for reactant_list in fixed)
+    if fixed_count == 0:
+        return
+    seen = set()
+    with Scheduler(
+        processes,
+        initializer=init_enumeration,
+        initargs=(smarts, fixed, all_outcomes, product),
+    ) as scheduler:
+        jobs = enumeration_jobs(first, fixed_count, shard_size)
+        for products in scheduler.map_bounded(run_enumeration_shard, jobs):
+            for smiles in products:
+                key = product_key(smiles)
+                if key not in seen:
+                    seen.add(key)
+                    yield smiles
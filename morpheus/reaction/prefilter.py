@@ -0,0 +1,65 @@
+from typing import Iterable
+
+import rdkit.Chem as _rdc
+from rdkit import DataStructs
+
+from morpheus.molecule.registry import MoleculeRegistry
+from morpheus.reaction.reaction import ReactionTemplate
+
+
+class ReactantFilter:
+    """
+    Decides once per reactant whether it can match its reactant template.
+
+    `RunReactants` only has products if every reactant matches the template at its
+    position, so combinations with a reactant that can not match are skipped without
+    running the reaction. Pattern fingerprints rule out most molecules, the rest are
+    checked with `HasSubstructMatch`. Results are cached by position and SMILES.
+    SMILES that can not be parsed are kept, running their reactions reports the error.
+    """
+
+    templates: list[_rdc.Mol]
+    __fingerprints: list[DataStructs.ExplicitBitVect]
+    __matches: dict[tuple[int, str], bool]
+
+    def __init__(self, template: ReactionTemplate) -> None:
+        template.reaction.Initialize()
+        self.templates = list(template.reaction.GetReactants())
+        self.__fingerprints = []
+        for query in self.templates:
+            query.UpdatePropertyCache(strict=False)
+            _rdc.FastFindRings(query)
+            self.__fingerprints.append(_rdc.PatternFingerprint(query))
+        self.__matches = {}
+
+    def matches_molecule(self, position: int, mol: _rdc.Mol) -> bool:
+        """uncached `matches` of a molecule with explicit hydrogens, like `prepared_molecule`"""
+        query = self.__fingerprints[position]
+        if not DataStructs.AllProbeBitsMatch(query, _rdc.PatternFingerprint(mol)):
+            return False
+        return mol.HasSubstructMatch(self.templates[position])
+
+    def __match(self, position: int, smiles: str) -> bool:
+        try:
+            record = MoleculeRegistry.shared().get(smiles)
+        except ValueError:
+            return True
+        # templates may match explicit hydrogens
+        return self.matches_molecule(position, record.prepared())
+
+    def matches(self, position: int, smiles: str) -> bool:
+        """whether `smiles` can be the reactant at `position` of the template"""
+        key = (position, smiles.__str__())
+        match = self.__matches.get(key)
+        if match is None:
+            match = self.__matches[key] = self.__match(position, key[1])
+        return match
+
+    def filter(self, position: int, reactants: Iterable[str]) -> list[int]:
+        """indices of the `reactants` that can be the reactant at `position`"""
+        return [i for i, smiles in enumerate(reactants) if self.matches(position, smiles)]
+
+    def candidates(self, reactants: list[list[str]]) -> list[list[int]]:
+        """indices of the reactants of every position that can react"""
+        return [self.filter(position, reactant_list) for position, reactant_list in enumerate(reactants)]
+
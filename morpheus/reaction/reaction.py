@@ -1,5 +1,8 @@
+import asyncio
+import os
+from pathlib import Path
 from rdkit.Chem import rdChemReactions
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 from morpheus.interfaces.delta_g import IDeltaG
 from morpheus.molecule.molecule import Molecule
@@ -25,7 +28,7 @@ class ReactionProducts(IDeltaG):
         self,
         instance: SimulationInstance,
     ) -> float:
-        simulation = Simulation(instance.options)
+        simulation = Simulation(instance.options, instance.cache, instance.runner)
 
         substrate_delta_g = sum(
             list(
@@ -46,6 +49,32 @@ class ReactionProducts(IDeltaG):
         self.delta_g = product_delta_g - substrate_delta_g
         return self.delta_g
 
+    async def calculate_delta_g_async(self, instance: SimulationInstance) -> float:
+        simulation = Simulation(instance.options, instance.cache, instance.runner)
+
+        substrate_delta_gs, product_delta_gs = await asyncio.gather(
+            simulation.gather(self.reactants), simulation.gather(self.products)
+        )
+        self.delta_g = sum(product_delta_gs) - sum(substrate_delta_gs)
+        return self.delta_g
+
+    def species(self) -> tuple[list[str], list[str]]:
+        return (
+            [molecule.canonical.__str__() for molecule in self.reactants],
+            [molecule.canonical.__str__() for molecule in self.products],
+        )
+
+    @property
+    def outcome(self) -> tuple[str, ...]:
+        """canonical SMILES of the products regardless of their order, equal for symmetric matches"""
+        return tuple(sorted(molecule.canonical.__str__() for molecule in self.products))
+
+    def calculate_force_field_energy(self) -> Optional[float]:
+        energies = [molecule.calculate_force_field_energy() for molecule in self.reactants + self.products]
+        if None in energies:
+            return None
+        return sum(energies[len(self.reactants):]) - sum(energies[: len(self.reactants)])
+
 
 class ReactionTemplate:
     reaction: rdChemReactions.ChemicalReaction
@@ -89,17 +118,61 @@ class ReactionTemplate:
     def get_num_reactants(self) -> int:
         return len(self.reaction.GetReactants())
 
+    def get_num_products(self) -> int:
+        return self.reaction.GetNumProductTemplates()
+
+    def enumerate(
+        self,
+        reactants: list[Iterable[str] | str | os.PathLike],
+        processes: int = 1,
+        all_outcomes: bool = False,
+        product: int = 0,
+    ) -> Iterator[str]:
+        """
+        Unique canonical SMILES of product `product` of every combination of `reactants`.
+
+        Every entry of `reactants` is a list of SMILES or the path of a SMILES file (a
+        `str` is a path, not SMILES), one per reactant of the template. The first one is streamed, so it should be the largest, the
+        others are held in memory. Reactions run in a pool of `processes`.
+        """
+        from morpheus.reaction.library import enumerate_products, read_smiles
+
+        if len(reactants) != self.get_num_reactants():
+            raise ValueError(
+                f"Wrong number of reactants, expected {self.get_num_reactants()} but got {len(reactants)}"
+            )
+        if not 0 <= product < self.get_num_products():
+            raise ValueError(
+                f"No product {product}, the template has {self.get_num_products()} products"
+            )
+        reactants = [
+            read_smiles(Path(reactant_list))
+            if isinstance(reactant_list, (str, os.PathLike))
+            else reactant_list
+            for reactant_list in reactants
+        ]
+        return enumerate_products(
+            rdChemReactions.ReactionToSmarts(self.reaction),
+            reactants[0],
+            [list(reactant_list) for reactant_list in reactants[1:]],
+            processes,
+            all_outcomes,
+            product,
+        )
+
 
 class Reaction(ReactionTemplate):
     reaction: rdChemReactions.ChemicalReaction
     reactants: list[Molecule]
     products: Optional[list[ReactionProducts]]
-    delta_gs: Optional[list[float]]
+    outcomes: Optional[list[ReactionProducts]]
+    delta_gs: Optional[list[Optional[float]]]
 
     def __init__(self, reaction_template: ReactionTemplate):
         self.reaction = reaction_template.reaction
         self.reactants = []
         self.products = None
+        self.outcomes = None
         self.delta_gs = None
 
     def add_reactants(self, reactants: list[Smiles]):
@@ -119,9 +192,39 @@ class Reaction(ReactionTemplate):
             self.products = super().run_reaction(self.reactants)
             return self.products
 
-    def calculate_delta_gs(self) -> list[float]:
-        self.delta_gs = []
-        pass
-
-
-__all__ = ["Reaction", "ReactionTemplate"]
+    def calculate_delta_gs(self, simulation: Optional[Simulation] = None) -> list[Optional[float]]:
+        """ΔG of every distinct outcome of the reaction, see `calculate_delta_gs_async`"""
+        return asyncio.run(self.calculate_delta_gs_async(simulation))
+
+    async def calculate_delta_gs_async(self, simulation: Optional[Simulation] = None) -> list[Optional[float]]:
+        """
+        ΔG of every distinct outcome of the reaction, in the order of `outcomes`.
+
+        Matches giving the same products (e.g. of symmetric reactants) are calculated
+        once, all outcomes are calculated concurrently and share their species
+        through the cache of `simulation`.
+        """
+        if self.products is None:
+            self.run_reaction()
+        self.outcomes = unique_outcomes(self.products or [])
+        simulation = simulation or Simulation()
+        self.delta_gs = await simulation.gather(self.outcomes)
+        return self.delta_gs
+
+    def best_outcome(self) -> Optional[ReactionProducts]:
+        """calculated outcome with the lowest ΔG"""
+        calculated = [
+            (delta_g, i) for i, delta_g in enumerate(self.delta_gs or []) if delta_g is not None
+        ]
+        return self.outcomes[min(calculated)[1]] if calculated else None
+
+
+def unique_outcomes(products: list[ReactionProducts]) -> list[ReactionProducts]:
+    """`products` without outcomes that repeat the products of an earlier one"""
+    unique = {}
+    for products_ in products:
+        unique.setdefault(products_.outcome, products_)
+    return list(unique.values())
+
+
+__all__ = ["Reaction", "ReactionTemplate", "unique_outcomes"]
@@ -0,0 +1,4 @@
+from .scheduler import Scheduler
+from .jobs import ReactionResult
+from .graph import TaskGraph
+from .pipeline import ReactionPipeline
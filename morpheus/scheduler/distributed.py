@@ -0,0 +1,260 @@
+import collections
+import copy
+import queue
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from morpheus.molecule import CanonicalSmiles, Molecule, Smiles
+from morpheus.scheduler.pipeline import ReactionPipeline
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.utils.information import CACHE_PATH, TMP_DIR
+
+DEFAULT_PORT = 50000
+HEARTBEAT_INTERVAL = 10.0
+HEARTBEAT_TIMEOUT = 60.0
+MAX_ATTEMPTS = 3
+
+
+class JobBoard:
+    """
+    Species jobs of a coordinator, leased to remote workers.
+
+    Workers request a job, send heartbeats while calculating and submit the free
+    energy or a failure. Jobs leased to a worker that stopped sending heartbeats are
+    handed out again; a job that failed `max_attempts` times is reported as failed.
+    """
+
+    options: SimulationOptions
+    timeout: float
+    max_attempts: int
+    __pending: collections.deque
+    __leases: dict[str, str]
+    __heartbeats: dict[str, float]
+    __attempts: collections.Counter
+    __answered: set[str]
+    __results: queue.Queue
+    __finished: bool
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        options: SimulationOptions,
+        timeout: float = HEARTBEAT_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> None:
+        self.options = options
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.__pending = collections.deque()
+        self.__leases = {}
+        self.__heartbeats = {}
+        self.__attempts = collections.Counter()
+        self.__answered = set()
+        self.__results = queue.Queue()
+        self.__finished = False
+        self.__lock = threading.Lock()
+
+    # --- called by workers ---
+
+    def get_options(self) -> SimulationOptions:
+        return self.options
+
+    def request(self, worker: str) -> Optional[str]:
+        """lease the next job to `worker`, `None` if there is nothing to do right now"""
+        with self.__lock:
+            self.__heartbeats[worker] = time.monotonic()
+            self.__reclaim()
+            while self.__pending:
+                key = self.__pending.popleft()
+                if key not in self.__answered:
+                    self.__leases[key] = worker
+                    return key
+            return None
+
+    def heartbeat(self, worker: str):
+        with self.__lock:
+            self.__heartbeats[worker] = time.monotonic()
+
+    def submit(self, worker: str, key: str, delta_g: Optional[float]):
+        with self.__lock:
+            self.__heartbeats[worker] = time.monotonic()
+            self.__answer(key, delta_g, None if delta_g is not None else f"no free energy for {key}")
+
+    def fail(self, worker: str, key: str, error: str):
+        with self.__lock:
+            self.__heartbeats[worker] = time.monotonic()
+            if key in self.__answered:
+                return
+            self.__leases.pop(key, None)
+            self.__attempts[key] += 1
+            if self.__attempts[key] >= self.max_attempts:
+                self.__answer(key, None, error)
+            else:
+                self.__pending.append(key)
+
+    def finished(self) -> bool:
+        return self.__finished
+
+    # --- called by the coordinator ---
+
+    def add(self, keys: list[str]):
+        with self.__lock:
+            self.__pending.extend(keys)
+
+    def finish(self):
+        self.__finished = True
+
+    def results(self, count: int) -> Iterator[tuple[str, Optional[float], Optional[str]]]:
+        """wait for `count` results, re-queueing the jobs of dead workers meanwhile"""
+        for _ in range(count):
+            while True:
+                try:
+                    yield self.__results.get(timeout=1)
+                    break
+                except queue.Empty:
+                    with self.__lock:
+                        self.__reclaim()
+
+    def workers(self) -> int:
+        """number of workers that sent a heartbeat recently"""
+        now = time.monotonic()
+        with self.__lock:
+            return sum(1 for t in self.__heartbeats.values() if now - t < self.timeout)
+
+    def __answer(self, key: str, delta_g: Optional[float], error: Optional[str]):
+        # a reclaimed job might be submitted twice, only the first answer counts
+        if key in self.__answered:
+            return
+        self.__answered.add(key)
+        self.__leases.pop(key, None)
+        self.__results.put((key, delta_g, error))
+
+    def __reclaim(self):
+        now = time.monotonic()
+        for key, worker in list(self.__leases.items()):
+            if now - self.__heartbeats.get(worker, 0) > self.timeout:
+                del self.__leases[key]
+                self.__pending.appendleft(key)
+
+
+class CoordinatorManager(BaseManager):
+    pass
+
+
+class WorkerManager(BaseManager):
+    pass
+
+
+WorkerManager.register("board")
+
+
+def serve(board: JobBoard, address: tuple[str, int], authkey: bytes) -> tuple[str, int]:
+    """serve `board` over TCP from a background thread, returns the bound address"""
+    CoordinatorManager.register("board", callable=lambda: board)
+    server = CoordinatorManager(address=address, authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.address
+
+
+def connect(address: tuple[str, int], authkey: bytes):
+    """proxy of the `JobBoard` served by the coordinator at `address`"""
+    manager = WorkerManager(address=address, authkey=authkey)
+    manager.connect()
+    return manager.board()
+
+
+def parse_address(address: str, default_host: str = "0.0.0.0") -> tuple[str, int]:
+    """parse `host:port`, `host` or `:port`"""
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+class DistributedPipeline(ReactionPipeline):
+    """
+    `ReactionPipeline` whose species are calculated by remote workers.
+
+    Reactions are enumerated locally. Species that are not in the coordinator's cache
+    are put on the `JobBoard`; every result is written to the coordinator's cache, which
+    acts as the shared result store of the run.
+    """
+
+    board: JobBoard
+
+    def __init__(self, board: JobBoard, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.board = board
+
+    def calculate_species(
+        self, keys: list[str]
+    ) -> Iterator[tuple[str, Optional[float], Optional[str]]]:
+        simulation = Simulation(self.options)
+        remote = []
+        for key in keys:
+            delta_g = simulation.cache.read(CanonicalSmiles(Smiles(key)), self.options)
+            if delta_g is None:
+                remote.append(key)
+            else:
+                yield key, delta_g, None
+
+        self.board.add(remote)
+        for key, delta_g, error in self.board.results(len(remote)):
+            simulation.cache.write(CanonicalSmiles(Smiles(key)), self.options, delta_g)
+            yield key, delta_g, error
+
+
+def run_worker(
+    address: tuple[str, int],
+    authkey: bytes,
+    calculate: Optional[Callable[[Simulation, str], Optional[float]]] = None,
+    poll_interval: float = 1.0,
+    heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    tmp_path: Path = TMP_DIR,
+    cache_path: Optional[Path] = CACHE_PATH,
+) -> int:
+    """pull species jobs from the coordinator until it has finished, returns the number of jobs done
+
+    The options of the coordinator are used with the workspace root `tmp_path` and the
+    result cache `cache_path` of this machine, no filesystem has to be shared.
+    """
+    board = connect(address, authkey)
+    worker = f"{uuid.uuid4()}"
+    options = copy.copy(board.get_options())
+    options.tmp_path = tmp_path
+    options.cache_path = cache_path
+    simulation = Simulation(options)
+    calculate = calculate or (
+        lambda simulation, key: simulation.calculate_delta_g(Molecule(Smiles(key)))
+    )
+
+    stop = threading.Event()
+
+    def heartbeat():
+        # proxies must not be shared between threads
+        heartbeat_board = connect(address, authkey)
+        while not stop.wait(heartbeat_interval):
+            heartbeat_board.heartbeat(worker)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    done = 0
+    try:
+        while not board.finished():
+            key = board.request(worker)
+            if key is None:
+                time.sleep(poll_interval)
+                continue
+            try:
+                board.submit(worker, key, calculate(simulation, key))
+            except Exception as e:
+                board.fail(worker, key, f"{type(e).__name__}: {e}")
+            done += 1
+    except (EOFError, ConnectionError):
+        # the coordinator shut down
+        pass
+    finally:
+        stop.set()
+    return done
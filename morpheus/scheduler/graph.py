@@ -0,0 +1,107 @@
+from typing import Iterable, Iterator, Optional
+
+from morpheus.scheduler.jobs import ReactionResult
+
+
+class TaskGraph:
+    """
+    Bipartite graph of reactions and the unique species they depend on.
+
+    Every species (keyed by canonical SMILES) is calculated once, no matter in how
+    many reactions it takes part. A reaction becomes ready as soon as the free
+    energies of all of its species are known; its ΔG is then a plain sum. Reactions
+    with several outcomes only fail if a reactant, or a product of every outcome,
+    fails.
+    """
+
+    reactions: dict[int, ReactionResult]
+    species: dict[str, set[int]]
+    energies: dict[str, Optional[float]]
+    naive_jobs: int
+    __missing: dict[int, int]
+    __ready: set[int]
+
+    def __init__(self, energies: Optional[dict[str, float]] = None) -> None:
+        self.reactions = {}
+        self.species = {}
+        # species already known, e.g. from a checkpoint, are not calculated again
+        self.energies = dict(energies or {})
+        self.naive_jobs = 0
+        self.__missing = {}
+        self.__ready = set()
+
+    def add_reaction(self, reaction: ReactionResult):
+        self.reactions[reaction.index] = reaction
+        keys = reaction.species()
+        self.naive_jobs += len(keys)
+
+        missing = set()
+        for key in keys:
+            self.species.setdefault(key, set()).add(reaction.index)
+            if key not in self.energies:
+                missing.add(key)
+        self.__missing[reaction.index] = len(missing)
+        if not missing:
+            self.__finish(reaction.index)
+
+    @property
+    def unique_jobs(self) -> int:
+        return len(self.species)
+
+    def retain(self, indices: Iterable[int]):
+        """drop every unfinished reaction not in `indices`, and the species only they depend on"""
+        keep = set(indices)
+        for index in [i for i in self.reactions if i not in keep and i not in self.__ready]:
+            reaction = self.reactions.pop(index)
+            del self.__missing[index]
+            for key in reaction.species():
+                dependents = self.species.get(key)
+                if dependents is None:
+                    continue
+                dependents.discard(index)
+                if not dependents:
+                    del self.species[key]
+
+    def pending_species(self) -> list[str]:
+        return [key for key in self.species if key not in self.energies]
+
+    def complete(self, key: str, delta_g: Optional[float], error: Optional[str] = None):
+        """record the free energy of the species `key`, finishing reactions that depend on it"""
+        self.energies[key] = delta_g
+        for index in self.species.get(key, ()):
+            reaction = self.reactions.get(index)
+            if reaction is None:
+                continue
+            if delta_g is None and not reaction.error and self.__fatal(reaction, key):
+                reaction.error = error or f"no free energy for {key}"
+            self.__missing[index] -= 1
+            if self.__missing[index] == 0:
+                self.__finish(index)
+
+    @staticmethod
+    def __fatal(reaction: ReactionResult, key: str) -> bool:
+        """whether the reaction has no ΔG at all without the species `key`"""
+        if key in reaction.reactant_species:
+            return True
+        outcomes = reaction.outcomes or [reaction]
+        return all(key in outcome.product_species for outcome in outcomes)
+
+    def __finish(self, index: int):
+        reaction = self.reactions[index]
+        if reaction.products and not reaction.error:
+            reaction.evaluate(self.energies)
+            # every outcome can fail on a different product
+            if all(outcome.delta_g is None for outcome in reaction.outcomes):
+                failed = [key for key in dict.fromkeys(reaction.species()) if self.energies.get(key) is None]
+                reaction.error = f"no free energy for {', '.join(failed)}"
+        self.__ready.add(index)
+
+    def pop_ready(self) -> Iterator[ReactionResult]:
+        """yield finished reactions in the order they were added, stopping at the first unfinished one"""
+        while self.reactions:
+            index = next(iter(self.reactions))
+            if index not in self.__ready:
+                return
+            self.__ready.remove(index)
+            del self.__missing[index]
+            yield self.reactions.pop(index)
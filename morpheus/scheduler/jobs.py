@@ -0,0 +1,243 @@
+from typing import Optional
+
+from morpheus.cli.helper import Combinations
+from morpheus.molecule import Molecule, Smiles
+from morpheus.reaction import Reaction, ReactionTemplate, unique_outcomes
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.options import Solvent
+
+
+class ReactionOutcome:
+    """products of one distinct match of the template on the reactants"""
+
+    products: list[str]
+    product_species: list[str]
+    delta_g: Optional[float]
+    delta_gs: Optional[dict[str, Optional[float]]]
+
+    def __init__(self, products: list[str], product_species: list[str]) -> None:
+        self.products = products
+        self.product_species = product_species
+        self.delta_g = None
+        self.delta_gs = None
+
+
+class ReactionResult:
+    """
+    A reaction of a screen.
+
+    `products`, `product_species` and `delta_g` are those of the reported outcome,
+    `outcomes` holds every outcome that is calculated (only the first match, unless
+    the pipeline evaluates all of them).
+    """
+
+    index: int
+    reactants: list[str]
+    products: Optional[list[str]]
+    reactant_species: list[str]
+    product_species: list[str]
+    outcomes: list[ReactionOutcome]
+    delta_g: Optional[float]
+    delta_gs: Optional[dict[str, Optional[float]]]
+    error: Optional[str]
+    predicted: bool
+
+    def __init__(
+        self,
+        index: int,
+        reactants: list[str],
+        products: Optional[list[str]] = None,
+        delta_g: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        self.index = index
+        self.reactants = reactants
+        self.products = products
+        self.reactant_species = []
+        self.product_species = []
+        self.outcomes = []
+        self.delta_g = delta_g
+        # ΔG in every solvent of a sweep, by solvent name
+        self.delta_gs = None
+        self.error = error
+        # whether `delta_g` depends on a predicted free energy instead of calculated ones
+        self.predicted = False
+
+    def species(self) -> list[str]:
+        """canonical SMILES of the reactants and of the products of every outcome"""
+        keys = list(self.reactant_species)
+        for outcome in self.outcomes or [ReactionOutcome(self.products, self.product_species)]:
+            keys += outcome.product_species
+        return keys
+
+    def outcome_delta_gs(self, energies: dict) -> list[Optional[float]]:
+        """ΔG of every outcome from the free energies of its species, `None` if one is unknown"""
+        outcomes = self.outcomes or [ReactionOutcome(self.products, self.product_species)]
+        reactant_energies = [energies.get(key) for key in self.reactant_species]
+        if any(energy is None for energy in reactant_energies):
+            return [None] * len(outcomes)
+        delta_gs = []
+        for outcome in outcomes:
+            product_energies = [energies.get(key) for key in outcome.product_species]
+            delta_gs.append(
+                None if any(energy is None for energy in product_energies)
+                else sum(product_energies) - sum(reactant_energies)
+            )
+        return delta_gs
+
+    def evaluate(self, energies: dict):
+        """ΔG of every outcome, the first one is reported until another one is selected"""
+        if not self.outcomes:
+            self.outcomes = [ReactionOutcome(self.products, self.product_species)]
+        for outcome, delta_g in zip(self.outcomes, self.outcome_delta_gs(energies)):
+            outcome.delta_g = delta_g
+        self.delta_g = self.outcomes[0].delta_g
+
+    def select(self, index: int):
+        """report the outcome `index`"""
+        outcome = self.outcomes[index]
+        self.products = outcome.products
+        self.product_species = outcome.product_species
+        self.delta_g = outcome.delta_g
+        self.delta_gs = outcome.delta_gs
+
+
+# state of a worker process, set up once by `init_worker`
+_template: ReactionTemplate
+_reactants: list[list[Smiles]]
+_combinations: Combinations
+_candidates: list[list[int]]
+_candidate_combinations: Combinations
+_simulation: Simulation
+_sweep: list[Simulation]
+_all_outcomes: bool
+
+
+def init_worker(
+    template: ReactionTemplate,
+    reactants: list[list[Smiles]],
+    options: SimulationOptions,
+    solvents: Optional[list[Optional[Solvent]]] = None,
+    all_outcomes: bool = False,
+    candidates: Optional[list[list[int]]] = None,
+) -> None:
+    global _template, _reactants, _combinations, _candidates, _candidate_combinations
+    global _simulation, _sweep, _all_outcomes
+    _template = template
+    _reactants = reactants
+    _combinations = Combinations([len(reactant_list) for reactant_list in reactants])
+    _candidates = candidates or [list(range(len(reactant_list))) for reactant_list in reactants]
+    _candidate_combinations = Combinations([len(indices) for indices in _candidates])
+    _simulation = Simulation(options)
+    _sweep = [Simulation(options.with_solvent(solvent)) for solvent in solvents or []]
+    _all_outcomes = all_outcomes
+
+
+def run_enumeration_job(job: tuple[range, frozenset[int]]) -> list[ReactionResult]:
+    """
+    run the reactions of all combination indices of the candidate reactants in the
+    shard of `job`, except for the skipped ones
+
+    Reactions keep the index of their combination of all reactants.
+    """
+    shard, skip = job
+    results = []
+    for index, candidate in _candidate_combinations.shard(shard.start, shard.stop, shard.step):
+        if index in skip:
+            continue
+        indices = tuple(_candidates[i][j] for i, j in enumerate(candidate))
+        results.append(run_reaction(_combinations.index(indices), indices))
+    return results
+
+
+def run_reaction(index: int, indices: tuple[int, ...]) -> ReactionResult:
+    """run the reaction for the reactant `indices`, without calculating anything"""
+    reactants = [_reactants[i][reactant_idx] for i, reactant_idx in enumerate(indices)]
+    return react(_template, index, reactants, _all_outcomes)
+
+
+def react(
+    template: ReactionTemplate, index: int, reactants: list[Smiles], all_outcomes: bool = False
+) -> ReactionResult:
+    """the reaction `index` of `reactants`, without calculating anything"""
+    result = ReactionResult(index, [reactant.__str__() for reactant in reactants])
+    try:
+        reaction = Reaction(template)
+        reaction.add_reactants(reactants)
+        reaction.run_reaction()
+        if reaction.products:
+            # symmetric matches give the same products, they are only calculated once
+            outcomes = unique_outcomes(reaction.products) if all_outcomes else reaction.products[:1]
+            result.reactant_species = [
+                molecule.canonical.__str__() for molecule in outcomes[0].reactants
+            ]
+            result.outcomes = [
+                ReactionOutcome(
+                    [product.__str__() for product in outcome.products],
+                    [molecule.canonical.__str__() for molecule in outcome.products],
+                )
+                for outcome in outcomes
+            ]
+            result.products = result.outcomes[0].products
+            result.product_species = result.outcomes[0].product_species
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def run_species_job(key: str) -> tuple[str, Optional[float], Optional[str]]:
+    """calculate the free energy of the species with the canonical SMILES `key`"""
+    try:
+        return key, _simulation.calculate_delta_g(Molecule(Smiles(key))), None
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+
+
+def run_stage_job(
+    job: tuple[str, Optional[SimulationOptions]]
+) -> tuple[str, Optional[float], Optional[str]]:
+    """score the species `key` for a funnel stage, with the MMFF94 energy if `options` is `None`"""
+    key, options = job
+    try:
+        molecule = Molecule(Smiles(key))
+        if options is None:
+            return key, molecule.calculate_force_field_energy(), None
+        return key, Simulation(options).calculate_delta_g(molecule), None
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+
+
+def run_geometry_job(key: str) -> tuple[str, Optional[list[str]], Optional[str]]:
+    """
+    conformer search of the species `key` in the gas phase, shared by every solvent of a sweep
+
+    No geometries are returned if the species is cached in every solvent.
+    """
+    try:
+        molecule = Molecule(Smiles(key))
+        if all(
+            simulation.cache.read(molecule.canonical, simulation.options) is not None
+            for simulation in _sweep
+        ):
+            return key, None, None
+        gas_phase = Simulation(_simulation.options.with_solvent(None), _simulation.cache, _simulation.runner)
+        return key, gas_phase.prepare_geometries(molecule), None
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+
+
+def run_solvent_job(
+    job: tuple[str, int, Optional[list[str]], Optional[str]]
+) -> tuple[str, int, Optional[float], Optional[str]]:
+    """calculate the species `key` in the solvent `index` of the sweep, from the shared geometries"""
+    key, index, geometries, error = job
+    if error:
+        return key, index, None, error
+    try:
+        molecule = Molecule(Smiles(key))
+        simulation = _sweep[index]
+        if geometries is None:
+            return key, index, simulation.calculate_delta_g(molecule), None
+        return key, index, simulation.calculate_delta_g_from(molecule, geometries), None
+    except Exception as e:
+        return key, index, None, f"{type(e).__name__}: {e}"
@@ -0,0 +1,368 @@
+import bisect
+import math
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from morpheus.cli.helper import Combinations
+from morpheus.molecule import Smiles
+from morpheus.optimize.prediction import SpeciesSurrogate
+from morpheus.reaction import ReactantFilter, ReactionTemplate
+from morpheus.scheduler.graph import TaskGraph
+from morpheus.scheduler.jobs import (
+    ReactionResult,
+    init_worker,
+    run_enumeration_job,
+    run_geometry_job,
+    run_solvent_job,
+    run_species_job,
+    run_stage_job,
+)
+from morpheus.scheduler.scheduler import Scheduler
+from morpheus.simulation import SimulationOptions
+from morpheus.simulation.funnel import FunnelStage, StageReport
+from morpheus.simulation.options import Solvent
+
+SHARD_SIZE = 256
+OUTCOMES = ["first", "min", "all"]
+# species calculated between two retrainings of the surrogate, per process
+PREDICTION_ROUND = 16
+# standard deviations a predicted ΔG must lie away from the threshold
+PREDICTION_Z = 2.0
+
+
+class ReactionPipeline:
+    """
+    Two phase execution of a reaction screen.
+
+    `enumerate` runs every reaction and collects the unique species of all products
+    into a `TaskGraph`. `calculate` then computes each species once in parallel and
+    yields the reactions in order, as soon as all of their species are known.
+
+    With several `solvents`, every species is conformer searched once in the gas
+    phase, and the optimizations in each solvent start from the shared geometries as
+    separate jobs. Reactions then carry a ΔG per solvent; `delta_g` is the one in the
+    first solvent.
+
+    `outcomes` decides which matches of the template are calculated: only the first
+    one (`first`), or every distinct one, reporting the lowest ΔG (`min`) or keeping
+    all of them in `ReactionResult.outcomes` (`all`).
+
+    With `prefilter`, reactants that can not match their reactant template are found
+    once, and only combinations of the remaining `candidates` are enumerated.
+    Reactions keep the index of their combination of all reactants.
+
+    With a `surrogate`, species are predicted before they are calculated. A reaction
+    whose predicted ΔG has a standard deviation of at most `tolerance` (and, with a
+    `threshold`, lies clearly on one side of it) is reported with the prediction and
+    `ReactionResult.predicted` set; only the species of the other reactions are
+    calculated. Species are calculated in rounds, most uncertain first, and the
+    surrogate learns every result before the next round is predicted.
+    """
+
+    template: ReactionTemplate
+    reactants: list[list[Smiles]]
+    options: SimulationOptions
+    processes: int
+    solvents: list[Optional[Solvent]]
+    outcomes: str
+    combinations: Combinations
+    candidates: list[list[int]]
+    candidate_combinations: Combinations
+    graph: TaskGraph
+    surrogate: Optional[SpeciesSurrogate]
+    tolerance: float
+    threshold: Optional[float]
+    predicted: set[str]
+    __scheduler: Optional[Scheduler]
+
+    def __init__(
+        self,
+        template: ReactionTemplate,
+        reactants: list[list[Smiles]],
+        options: SimulationOptions,
+        processes: int = 1,
+        energies: Optional[dict[str, float]] = None,
+        solvents: Optional[list[Optional[Solvent]]] = None,
+        outcomes: str = "first",
+        prefilter: bool = True,
+        surrogate: Optional[SpeciesSurrogate] = None,
+        tolerance: float = 0.0,
+        threshold: Optional[float] = None,
+    ) -> None:
+        if outcomes not in OUTCOMES:
+            raise ValueError(f"unknown outcomes {outcomes}, expected one of {', '.join(OUTCOMES)}")
+        if surrogate and solvents and len(solvents) > 1:
+            raise ValueError("species of a solvent sweep can not be predicted")
+        self.template = template
+        self.reactants = reactants
+        # the first solvent of a sweep is the one of `options`
+        self.solvents = list(solvents) if solvents else [options.solvent]
+        self.options = options.with_solvent(self.solvents[0])
+        self.processes = processes
+        self.outcomes = outcomes
+        self.combinations = Combinations([len(reactant_list) for reactant_list in reactants])
+        self.candidates = (
+            ReactantFilter(template).candidates(reactants)
+            if prefilter
+            else [list(range(len(reactant_list))) for reactant_list in reactants]
+        )
+        self.candidate_combinations = Combinations([len(indices) for indices in self.candidates])
+        self.graph = TaskGraph(energies)
+        self.surrogate = surrogate
+        self.tolerance = tolerance
+        self.threshold = threshold
+        # species whose free energy is a prediction
+        self.predicted = set()
+        self.__scheduler = None
+
+    def __enter__(self) -> "ReactionPipeline":
+        self.__scheduler = Scheduler(
+            self.processes,
+            initializer=init_worker,
+            initargs=(
+                self.template,
+                self.reactants,
+                self.options,
+                self.solvents,
+                self.outcomes != "first",
+                self.candidates,
+            ),
+        ).__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.__scheduler.__exit__(*exc)
+        self.__scheduler = None
+
+    def enumerate(
+        self, shards: Optional[Iterable[range]] = None, skip: Iterable[int] = ()
+    ) -> TaskGraph:
+        """run the reactions of the candidate combination indices in `shards`, except for
+        those in `skip` (indices of all combinations, like the ones of the reactions)
+
+        By default every combination of the candidate reactants is enumerated. Skipped
+        reactions are never run, shards without anything left are not even sent.
+        """
+        if shards is None:
+            size = max(min(SHARD_SIZE, len(self.candidate_combinations) // self.processes), 1)
+            shards = self.candidate_combinations.shards(size)
+        jobs = self.__enumeration_jobs(shards, sorted(self.__candidate_indices(skip)))
+        for reactions in self.__scheduler.map(run_enumeration_job, jobs):
+            for reaction in reactions:
+                self.graph.add_reaction(reaction)
+        return self.graph
+
+    def __candidate_indices(self, indices: Iterable[int]) -> set[int]:
+        """the candidate combination indices of the combination `indices` made of candidates"""
+        positions = [{index: i for i, index in enumerate(candidates)} for candidates in self.candidates]
+        result = set()
+        for index in indices:
+            if not 0 <= index < len(self.combinations):
+                continue
+            combination = self.combinations[index]
+            if all(i in position for i, position in zip(combination, positions)):
+                result.add(
+                    self.candidate_combinations.index(
+                        tuple(position[i] for i, position in zip(combination, positions))
+                    )
+                )
+        return result
+
+    @staticmethod
+    def __enumeration_jobs(shards: Iterable[range], skip: list[int]) -> Iterator[tuple[range, frozenset[int]]]:
+        """every shard with its skipped candidate indices out of the sorted `skip`"""
+        for shard in shards:
+            if not shard:
+                continue
+            lower = bisect.bisect_left(skip, min(shard))
+            upper = bisect.bisect_right(skip, max(shard))
+            skipped = frozenset(index for index in skip[lower:upper] if index in shard)
+            if len(skipped) < len(shard):
+                yield shard, skipped
+
+    def screen(self, stages: Iterable[FunnelStage]) -> Iterator[StageReport]:
+        """
+        Run the reactions of the graph through the cheap funnel `stages`.
+
+        Every stage scores the remaining reactions with the ΔG of its own level, and
+        only its survivors are kept in the graph for `calculate`. A report is yielded
+        as soon as a stage is done.
+        """
+        for stage in stages:
+            start = time.perf_counter()
+            reactions = [
+                reaction for reaction in self.graph.reactions.values()
+                if reaction.products and not reaction.error
+            ]
+            keys = list(dict.fromkeys(key for reaction in reactions for key in reaction.species()))
+            options = stage.options(self.options)
+            energies = {
+                key: energy
+                for key, energy, _error in self.__scheduler.map_unordered(
+                    run_stage_job, [(key, options) for key in keys]
+                )
+            }
+
+            scores = {}
+            for reaction in reactions:
+                # a reaction is as good as its best outcome
+                delta_gs = [
+                    delta_g for delta_g in reaction.outcome_delta_gs(energies) if delta_g is not None
+                ]
+                scores[reaction.index] = min(delta_gs) if delta_gs else None
+
+            survivors = stage.select(scores)
+            # failed reactions are not scored, they are kept to be reported
+            self.graph.retain(survivors + [
+                index for index, reaction in self.graph.reactions.items()
+                if index not in scores
+            ])
+            yield StageReport(stage.name, scores, survivors, len(keys), time.perf_counter() - start)
+
+    def calculate(
+        self, on_species: Optional[Callable[[str, Optional[float]], None]] = None
+    ) -> Iterator[ReactionResult]:
+        """calculate all pending species, yield the reactions in order as they finish
+
+        `on_species` is called with the canonical SMILES and free energy of every
+        species as soon as it is calculated, an array over the solvents of a sweep.
+        Predicted species are not passed to it.
+        """
+        if self.is_sweep:
+            species = self.calculate_sweep(self.graph.pending_species())
+        elif self.surrogate:
+            species = self.__calculate_predicted()
+        else:
+            species = self.calculate_species(self.graph.pending_species())
+        yield from self.__pop_ready()
+        for key, delta_g, error in species:
+            if key not in self.predicted:
+                if on_species:
+                    on_species(key, delta_g)
+                if self.surrogate and delta_g is not None:
+                    self.surrogate.update(key, delta_g)
+            self.graph.complete(key, delta_g, error)
+            yield from self.__pop_ready()
+
+    def __calculate_predicted(self) -> Iterator[tuple[str, Optional[float], Optional[str]]]:
+        """predicted species of confident reactions, then a round of calculated species, until none are left"""
+        pending = self.graph.pending_species()
+        while pending:
+            mean, std = self.surrogate.predict(pending)
+            predictions = {key: (float(m), float(s)) for key, m, s in zip(pending, mean, std)}
+            energies = self.graph.energies | {key: m for key, (m, _) in predictions.items()}
+            needed = set()
+            confident = set()
+            for reaction in self.graph.reactions.values():
+                keys = [key for key in reaction.species() if key in predictions]
+                if not keys:
+                    continue
+                if (
+                    reaction.products
+                    and not reaction.error
+                    and self.__is_confident(reaction, energies, predictions)
+                ):
+                    confident.update(keys)
+                else:
+                    needed.update(keys)
+
+            for key in confident - needed:
+                self.predicted.add(key)
+                yield key, predictions[key][0], None
+            # the most uncertain species teach the surrogate the most
+            calculate = sorted(
+                (key for key in pending if key not in self.predicted), key=lambda key: -predictions[key][1]
+            )
+            yield from self.calculate_species(calculate[: PREDICTION_ROUND * self.processes])
+            pending = self.graph.pending_species()
+
+    def __is_confident(
+        self, reaction: ReactionResult, energies: dict, predictions: dict[str, tuple[float, float]]
+    ) -> bool:
+        """whether the ΔG of every outcome is predicted within the tolerance, away from the threshold"""
+        reactant_variance = sum(predictions.get(key, (0, 0))[1] ** 2 for key in reaction.reactant_species)
+        for outcome, delta_g in zip(reaction.outcomes or [reaction], reaction.outcome_delta_gs(energies)):
+            if delta_g is None:
+                return False
+            std = math.sqrt(
+                reactant_variance
+                + sum(predictions.get(key, (0, 0))[1] ** 2 for key in outcome.product_species)
+            )
+            if std > self.tolerance:
+                return False
+            if self.threshold is not None and abs(delta_g - self.threshold) < PREDICTION_Z * std:
+                return False
+        return True
+
+    @property
+    def is_sweep(self) -> bool:
+        return len(self.solvents) > 1
+
+    def __pop_ready(self) -> Iterator[ReactionResult]:
+        for reaction in self.graph.pop_ready():
+            if reaction.outcomes and not reaction.error:
+                for outcome in reaction.outcomes:
+                    # energies of a sweep are arrays over the solvents, failed ones are nan
+                    if self.is_sweep and outcome.delta_g is not None:
+                        outcome.delta_gs = {
+                            solvent_name(solvent): None if np.isnan(delta_g) else float(delta_g)
+                            for solvent, delta_g in zip(self.solvents, outcome.delta_g)
+                        }
+                        outcome.delta_g = outcome.delta_gs[solvent_name(self.solvents[0])]
+                calculated = [
+                    (outcome.delta_g, i)
+                    for i, outcome in enumerate(reaction.outcomes)
+                    if outcome.delta_g is not None
+                ]
+                reaction.select(min(calculated)[1] if calculated and self.outcomes == "min" else 0)
+            reaction.predicted = any(key in self.predicted for key in reaction.species())
+            yield reaction
+
+    def calculate_species(
+        self, keys: list[str]
+    ) -> Iterator[tuple[str, Optional[float], Optional[str]]]:
+        """(key, free energy, error) of every species in `keys`, in the order they complete"""
+        return self.__scheduler.map_unordered(run_species_job, keys)
+
+    def calculate_sweep(
+        self, keys: list[str]
+    ) -> Iterator[tuple[str, Optional[np.ndarray], Optional[str]]]:
+        """
+        (key, free energy in every solvent, error) of every species in `keys`, in the
+        order they complete
+
+        Solvent jobs of a species are queued as soon as its geometries are known.
+        Energies that could not be calculated are nan; the species only fails if it
+        failed in every solvent.
+        """
+        geometries = self.__scheduler.map_unordered(run_geometry_job, keys)
+        jobs = (
+            (key, index, species_geometries, error)
+            for key, species_geometries, error in geometries
+            for index in range(len(self.solvents))
+        )
+        energies = {}
+        errors = {}
+        solved = {}
+        for key, index, delta_g, error in self.__scheduler.map_unordered(run_solvent_job, jobs):
+            energies.setdefault(key, np.full(len(self.solvents), np.nan))[index] = (
+                np.nan if delta_g is None else delta_g
+            )
+            if error:
+                errors.setdefault(key, error)
+            solved[key] = solved.get(key, 0) + 1
+            if solved[key] < len(self.solvents):
+                continue
+            del solved[key]
+            species_energies = energies.pop(key)
+            if np.isnan(species_energies).all():
+                yield key, None, errors.pop(key, None)
+            else:
+                errors.pop(key, None)
+                yield key, species_energies, None
+
+
+def solvent_name(solvent: Optional[Solvent]) -> str:
+    return solvent.value if solvent else "gas"
@@ -0,0 +1,81 @@
+import multiprocessing
+from collections import deque
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+
+class Scheduler:
+    """
+    Pool of warm worker processes pulling jobs from a shared queue.
+
+    Jobs are handed out one at a time, so a worker that finishes early takes the next
+    job instead of idling behind a static chunk. `initializer` runs once per worker and
+    is meant to set up expensive per-process state (simulation, cache, templates).
+    With a single process, jobs run inline without starting a pool.
+    """
+
+    processes: int
+    initializer: Optional[Callable[..., None]]
+    initargs: tuple
+    __pool: Optional[Pool]
+
+    def __init__(
+        self,
+        processes: int = 1,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: tuple = (),
+    ) -> None:
+        self.processes = max(processes, 1)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.__pool = None
+
+    def __enter__(self) -> "Scheduler":
+        if self.processes == 1:
+            if self.initializer:
+                self.initializer(*self.initargs)
+        else:
+            self.__pool = multiprocessing.get_context().Pool(
+                self.processes, initializer=self.initializer, initargs=self.initargs
+            )
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.__pool:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+    def map(self, job: Callable[[Any], Any], items: Iterable) -> Iterator:
+        """run `job` for every item, yield results in the order of `items` as they complete"""
+        if not self.__pool:
+            return map(job, items)
+        return self.__pool.imap(job, items, chunksize=1)
+
+    def map_unordered(self, job: Callable[[Any], Any], items: Iterable) -> Iterator:
+        """run `job` for every item, yield results in the order they complete"""
+        if not self.__pool:
+            return map(job, items)
+        return self.__pool.imap_unordered(job, items, chunksize=1)
+
+    def map_bounded(self, job: Callable[[Any], Any], items: Iterable, window: Optional[int] = None) -> Iterator:
+        """
+        `map` that keeps at most `window` jobs in flight, `items` are only consumed as
+        results are taken, so streams larger than memory can be mapped.
+        """
+        if not self.__pool:
+            return map(job, items)
+        return self.__map_bounded(job, items, window or 4 * self.processes)
+
+    def __map_bounded(self, job: Callable[[Any], Any], items: Iterable, window: int) -> Iterator:
+        # imap consumes `items` as fast as it can, pending results would pile up
+        pending = deque()
+        for item in items:
+            pending.append(self.__pool.apply_async(job, (item,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
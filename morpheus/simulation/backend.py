@@ -0,0 +1,269 @@
+import asyncio
+import functools
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+import rdkit.Chem as _rdc
+from rdkit.Chem import rdDetermineBonds as _rdDetermineBonds
+
+from morpheus.simulation.options import GFNLevel, Solvent
+from morpheus.simulation.result import (
+    CalculationResult,
+    parse_xtb_output,
+    read_xtb_hessian,
+    read_xyz,
+)
+from morpheus.simulation.workspace import Workspace
+
+ANGSTROM_TO_BOHR = 1 / 0.529177210903
+
+
+class CalculatorBackend(ABC):
+    """
+    Quantum chemistry calculator: a geometry in, structured energies out.
+
+    Backends get the `SimulationInstance` of the calculation for its options and
+    runner. Backends with `needs_workspace` run in a scratch directory, which is the
+    one of the instance unless a `workspace` is passed.
+    """
+
+    name: str
+    needs_workspace: bool = False
+
+    @classmethod
+    def supports(cls, level: GFNLevel) -> bool:
+        """whether the backend can calculate at `level`"""
+        return True
+
+    @abstractmethod
+    def calculate(
+        self, instance, xyz: str, workspace: Optional[Workspace] = None, cores: Optional[int] = None
+    ) -> Optional[CalculationResult]:
+        """optimized thermochemistry of the geometry `xyz` at the level of `instance.options`"""
+        pass
+
+    @abstractmethod
+    def single_point(
+        self, instance, xyz: str, level: GFNLevel, workspace: Optional[Workspace] = None
+    ) -> Optional[float]:
+        """total energy of the geometry `xyz` at `level`, without optimizing it"""
+        pass
+
+    async def calculate_async(
+        self, instance, xyz: str, workspace: Optional[Workspace] = None, cores: Optional[int] = None
+    ) -> Optional[CalculationResult]:
+        # in process calculations share the job slots of external ones
+        async with instance.runner.slot():
+            return await asyncio.to_thread(self.calculate, instance, xyz, workspace, cores)
+
+
+class XtbBackend(CalculatorBackend):
+    """the xtb binary, run as a subprocess on an input file, its text output is parsed"""
+
+    name = "xtb"
+    needs_workspace = True
+
+    @staticmethod
+    def read_result(workspace: Workspace) -> Optional[CalculationResult]:
+        result = parse_xtb_output(workspace.out_path)
+        if result:
+            result.geometry = read_xyz(workspace.path / "xtbopt.xyz")
+            result.hessian = read_xtb_hessian(workspace.path / "hessian")
+        return result
+
+    def calculate(self, instance, xyz, workspace=None, cores=None):
+        workspace = workspace or instance.workspace
+        write_inp_file(workspace, xyz)
+        instance.runner.run(instance.xtb_command(workspace.inp_path, cores), cwd=workspace.path)
+        return self.read_result(workspace)
+
+    async def calculate_async(self, instance, xyz, workspace=None, cores=None):
+        workspace = workspace or instance.workspace
+        write_inp_file(workspace, xyz)
+        await instance.runner.run_async(
+            instance.xtb_command(workspace.inp_path, cores), cwd=workspace.path
+        )
+        return self.read_result(workspace)
+
+    def single_point(self, instance, xyz, level, workspace=None):
+        workspace = workspace or instance.workspace
+        write_inp_file(workspace, xyz)
+        instance.runner.run(
+            instance.single_point_command(workspace.inp_path, level), cwd=workspace.path
+        )
+        result = parse_xtb_output(workspace.out_path)
+        return result.total_energy if result else None
+
+
+class TbliteBackend(CalculatorBackend):
+    """
+    In process single points through the tblite Python bindings, no fork and no files.
+
+    tblite neither optimizes geometries nor calculates hessians, so the free energy is
+    the electronic energy of the given (force field) geometry. Only GFN1 and GFN2 are
+    parametrized in tblite.
+    """
+
+    name = "tblite"
+    METHODS = {GFNLevel.GFN1: "GFN1-xTB", GFNLevel.GFN2: "GFN2-xTB"}
+
+    def __init__(self) -> None:
+        try:
+            from tblite.interface import Calculator
+        except ImportError:
+            raise ImportError("the tblite backend requires the tblite package, pip install tblite")
+        self.__calculator = Calculator
+
+    @classmethod
+    def supports(cls, level: GFNLevel) -> bool:
+        return level in cls.METHODS
+
+    def __energy(self, xyz: str, level: GFNLevel, solvent: Optional[Solvent]) -> float:
+        import numpy as np
+
+        if level not in self.METHODS:
+            raise ValueError(f"tblite does not support gfn{level.value}")
+        numbers, positions = parse_xyz(xyz)
+        calculator = self.__calculator(
+            self.METHODS[level], np.array(numbers), np.array(positions) * ANGSTROM_TO_BOHR
+        )
+        calculator.set("verbosity", 0)
+        if solvent:
+            calculator.add("alpb-solvation", solvent.value)
+        return float(calculator.singlepoint().get("energy"))
+
+    def calculate(self, instance, xyz, workspace=None, cores=None):
+        energy = self.__energy(xyz, instance.options.gfn_level, instance.options.solvent)
+        return CalculationResult(free_energy=energy, total_energy=energy)
+
+    def single_point(self, instance, xyz, level, workspace=None):
+        return self.__energy(xyz, level, instance.options.solvent)
+
+
+class StubBackend(CalculatorBackend):
+    """
+    Deterministic energies from the composition and connectivity of a geometry.
+
+    Made for testing and benchmarking scheduling and caching on machines without xtb,
+    the numbers have no physical meaning. Every calculation takes `delay` seconds.
+    """
+
+    name = "stub"
+    delay: float
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+
+    @staticmethod
+    def molecule(xyz: str) -> _rdc.Mol:
+        mol = _rdc.MolFromXYZBlock(xyz)
+        _rdDetermineBonds.DetermineConnectivity(mol)
+        return mol
+
+    @staticmethod
+    def hessian(mol: _rdc.Mol) -> np.ndarray:
+        """cartesian hessian of springs along bonds and 1-3 pairs, in Eh/bohr^2"""
+        positions = mol.GetConformer().GetPositions()
+        hessian = np.zeros((3 * mol.GetNumAtoms(), 3 * mol.GetNumAtoms()))
+        distances = _rdc.GetDistanceMatrix(mol)
+        for i in range(mol.GetNumAtoms()):
+            for j in range(i + 1, mol.GetNumAtoms()):
+                if distances[i, j] not in (1, 2):
+                    continue
+                direction = positions[j] - positions[i]
+                direction /= np.linalg.norm(direction)
+                block = (0.4 if distances[i, j] == 1 else 0.1) * np.outer(direction, direction)
+                for a, b, sign in [(i, i, 1), (j, j, 1), (i, j, -1), (j, i, -1)]:
+                    hessian[3 * a : 3 * a + 3, 3 * b : 3 * b + 3] += sign * block
+        return hessian
+
+    @staticmethod
+    def energy(xyz: str) -> float:
+        mol = StubBackend.molecule(xyz)
+        # the environment term makes reactions with the same bond changes differ
+        energy = -sum(
+            0.5 * atom.GetAtomicNum() + 0.003 * ((atom.GetAtomicNum() * 7 + atom.GetDegree() * 13) % 11)
+            for atom in mol.GetAtoms()
+        )
+        for bond in mol.GetBonds():
+            a, b = sorted((bond.GetBeginAtom().GetAtomicNum(), bond.GetEndAtom().GetAtomicNum()))
+            energy -= 0.1 + 0.01 * ((a * 31 + b) % 17)
+        return energy
+
+    @staticmethod
+    def solvation(xyz: str, solvent: Optional[Solvent]) -> float:
+        """stabilizes the bonds of N and O atoms, by an amount that differs between solvents"""
+        if solvent is None:
+            return 0.0
+        polar = sum(
+            atom.GetDegree()
+            for atom in StubBackend.molecule(xyz).GetAtoms()
+            if atom.GetAtomicNum() in (7, 8)
+        )
+        return -0.001 * (len(solvent.value) % 7 + 1) * polar
+
+    def result(self, xyz: str, solvent: Optional[Solvent] = None) -> CalculationResult:
+        energy = self.energy(xyz) + self.solvation(xyz, solvent)
+        atoms = int(xyz.split()[0])
+        return CalculationResult(
+            free_energy=energy - 0.001 * atoms,
+            total_energy=energy,
+            enthalpy=energy + 0.002 * atoms,
+            imaginary_frequencies=0,
+            converged=True,
+            geometry=xyz,
+            hessian=self.hessian(self.molecule(xyz)),
+        )
+
+    def calculate(self, instance, xyz, workspace=None, cores=None):
+        time.sleep(self.delay)
+        return self.result(xyz, instance.options.solvent)
+
+    async def calculate_async(self, instance, xyz, workspace=None, cores=None):
+        # sleeping does not need a thread
+        async with instance.runner.slot():
+            await asyncio.sleep(self.delay)
+            return self.result(xyz, instance.options.solvent)
+
+    def single_point(self, instance, xyz, level, workspace=None):
+        time.sleep(self.delay)
+        return self.energy(xyz) + self.solvation(xyz, instance.options.solvent)
+
+
+BACKENDS = {backend.name: backend for backend in [XtbBackend, TbliteBackend, StubBackend]}
+
+
+@functools.cache
+def get_backend(spec: str = "xtb") -> CalculatorBackend:
+    """
+    Backend for a spec like `xtb`, `tblite` or `stub:0.5`.
+
+    Arguments after the name are passed to the backend, e.g. the delay of the stub.
+    """
+    name, *args = spec.split(":")
+    if name not in BACKENDS:
+        raise ValueError(f"unknown calculator backend {name}, expected one of {', '.join(BACKENDS)}")
+    if args and name == StubBackend.name:
+        return StubBackend(float(args[0]))
+    return BACKENDS[name]()
+
+
+def parse_xyz(xyz: str) -> tuple[list[int], list[list[float]]]:
+    """atomic numbers and positions in Å of an xyz block"""
+    table = _rdc.GetPeriodicTable()
+    lines = xyz.splitlines()
+    atoms = int(lines[0])
+    numbers = []
+    positions = []
+    for line in lines[2 : 2 + atoms]:
+        symbol, x, y, z = line.split()[:4]
+        numbers.append(table.GetAtomicNumber(symbol))
+        positions.append([float(x), float(y), float(z)])
+    return numbers, positions
+
+
+def write_inp_file(workspace: Workspace, xyz: str):
+    with open(workspace.inp_path, "w") as input_file:
+        input_file.write(f"{xyz}\n$write\n  output file={workspace.out_path}")
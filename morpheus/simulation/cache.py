@@ -1,13 +1,276 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional
+
+import numpy as np
+
 from morpheus.molecule.smiles import CanonicalSmiles
+from morpheus.simulation.options import SimulationOptions
+from morpheus.simulation.result import CalculationResult
+
+DEFAULT_MAXSIZE = 4096
+
 
 class SimulationCache:
-  __cache: dict[str, float]
-  def __init__(self) -> None:
-    self.__cache = {}
-  
-  def read(self, key: CanonicalSmiles) -> float:
-    return self.__cache.get(key.__str__())
-  
-  def write(self, key: CanonicalSmiles, value: float) -> float:
-    self.__cache[key] = value
-    return value
\ No newline at end of file
+  """
+  Two tiered cache of calculated free energies.
+
+  Results are keyed by the canonical SMILES of a molecule and the fingerprint of the
+  `SimulationOptions` used to calculate them. A bounded in-memory LRU sits in front of
+  an optional SQLite database, which persists results between runs. The database is
+  opened in WAL mode, so several processes can read and write it at the same time.
+  Besides the free energy, the full `CalculationResult` of a calculation is stored, so
+  quantities that were already paid for never require rerunning xtb. The optimized
+  geometry and hessian are kept in a separate table, for recomputing thermochemistry.
+
+  `compute` deduplicates concurrent calculations of the same species: the first
+  caller calculates the value, every later caller waits for its result.
+  """
+
+  path: Optional[Path]
+  maxsize: int
+  __memory: OrderedDict[tuple[str, str], tuple]
+  __lock: threading.Lock
+  __local: threading.local
+  __in_flight: dict[tuple[str, str], Future]
+
+  __shared: dict[Optional[Path], "SimulationCache"] = {}
+  __shared_lock = threading.Lock()
+
+  def __init__(self, path: Optional[Path] = None, maxsize: int = DEFAULT_MAXSIZE) -> None:
+    self.path = Path(path) if path else None
+    self.maxsize = maxsize
+    self.__memory = OrderedDict()
+    self.__lock = threading.Lock()
+    self.__local = threading.local()
+    self.__in_flight = {}
+
+    if self.path:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      connection = self.__connection()
+      connection.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "fingerprint TEXT NOT NULL, "
+        "smiles TEXT NOT NULL, "
+        "delta_g REAL NOT NULL, "
+        "record TEXT, "
+        "PRIMARY KEY (fingerprint, smiles))"
+      )
+      connection.execute(
+        "CREATE TABLE IF NOT EXISTS hessians ("
+        "fingerprint TEXT NOT NULL, "
+        "smiles TEXT NOT NULL, "
+        "geometry TEXT NOT NULL, "
+        "hessian BLOB NOT NULL, "
+        "PRIMARY KEY (fingerprint, smiles))"
+      )
+      columns = [row[1] for row in connection.execute("PRAGMA table_info(results)")]
+      if "record" not in columns:
+        # caches written before results were stored in full
+        connection.execute("ALTER TABLE results ADD COLUMN record TEXT")
+      connection.commit()
+
+  @classmethod
+  def shared(cls, path: Optional[Path] = None) -> "SimulationCache":
+    """cache shared by every `Simulation` of this process using the same `path`"""
+    path = Path(path) if path else None
+    with cls.__shared_lock:
+      if path not in cls.__shared:
+        cls.__shared[path] = cls(path)
+      return cls.__shared[path]
+
+  def __connection(self) -> sqlite3.Connection:
+    # sqlite connections must neither be shared between threads nor survive a fork
+    connection = getattr(self.__local, "connection", None)
+    if connection is None or self.__local.pid != os.getpid():
+      connection = sqlite3.connect(self.path, timeout=60)
+      connection.execute("PRAGMA journal_mode=WAL")
+      connection.execute("PRAGMA synchronous=NORMAL")
+      self.__local.connection = connection
+      self.__local.pid = os.getpid()
+    return connection
+
+  def __remember(self, key: tuple[str, str], value: tuple):
+    with self.__lock:
+      self.__memory[key] = value
+      self.__memory.move_to_end(key)
+      while len(self.__memory) > self.maxsize:
+        self.__memory.popitem(last=False)
+
+  def __lookup(self, memory_key: tuple[str, str]) -> Optional[tuple]:
+    with self.__lock:
+      if memory_key in self.__memory:
+        self.__memory.move_to_end(memory_key)
+        return self.__memory[memory_key]
+
+    if not self.path:
+      return None
+
+    row = self.__connection().execute(
+      "SELECT delta_g, record FROM results WHERE fingerprint = ? AND smiles = ?", memory_key
+    ).fetchone()
+    if row is None:
+      return None
+    self.__remember(memory_key, row)
+    return row
+
+  def read(self, key: CanonicalSmiles, options: SimulationOptions) -> Optional[float]:
+    entry = self.__lookup((options.fingerprint(), key.__str__()))
+    return entry[0] if entry else None
+
+  def read_result(self, key: CanonicalSmiles, options: SimulationOptions) -> Optional[CalculationResult]:
+    """full result of a calculation, `None` if only the free energy is known"""
+    entry = self.__lookup((options.fingerprint(), key.__str__()))
+    if not entry or not entry[1]:
+      return None
+    return CalculationResult.from_dict(json.loads(entry[1]))
+
+  def entries(self, options: SimulationOptions) -> Iterator[tuple[str, float]]:
+    """(canonical SMILES, free energy) of every species calculated with `options`"""
+    fingerprint = options.fingerprint()
+    if not self.path:
+      with self.__lock:
+        entries = [(key[1], value[0]) for key, value in self.__memory.items() if key[0] == fingerprint]
+      yield from entries
+      return
+    yield from self.__connection().execute(
+      "SELECT smiles, delta_g FROM results WHERE fingerprint = ?", (fingerprint,)
+    )
+
+  def read_hessian(self, key: CanonicalSmiles, options: SimulationOptions) -> Optional[tuple[str, np.ndarray]]:
+    """optimized geometry (xyz) and cartesian hessian of `key`, if they were stored"""
+    memory_key = (options.fingerprint(), key.__str__())
+    with self.__lock:
+      entry = self.__memory.get(memory_key)
+      if entry is not None and len(entry) > 2:
+        return entry[2]
+
+    if not self.path:
+      return None
+    row = self.__connection().execute(
+      "SELECT geometry, hessian FROM hessians WHERE fingerprint = ? AND smiles = ?", memory_key
+    ).fetchone()
+    if row is None:
+      return None
+    hessian = np.frombuffer(row[1], dtype=np.float64)
+    size = int(round(np.sqrt(hessian.size)))
+    return row[0], hessian.reshape(size, size)
+
+  def write(
+    self,
+    key: CanonicalSmiles,
+    options: SimulationOptions,
+    value: Optional[float | CalculationResult],
+  ) -> Optional[float]:
+    """store a free energy or a full result, returns the free energy"""
+    record = None
+    hessian = None
+    if isinstance(value, CalculationResult):
+      record = json.dumps(value.as_dict())
+      if value.geometry and value.hessian is not None:
+        hessian = (value.geometry, np.asarray(value.hessian, dtype=np.float64))
+      value = value.free_energy
+
+    # failed calculations are not cached, they should be retried on the next run
+    if value is None:
+      return value
+
+    memory_key = (options.fingerprint(), key.__str__())
+    # only memory caches keep hessians in memory, they are rarely needed again
+    self.__remember(memory_key, (value, record, hessian) if hessian and not self.path else (value, record))
+
+    if self.path:
+      connection = self.__connection()
+      connection.execute(
+        "INSERT OR REPLACE INTO results (fingerprint, smiles, delta_g, record) VALUES (?, ?, ?, ?)",
+        (*memory_key, value, record),
+      )
+      if hessian:
+        connection.execute(
+          "INSERT OR REPLACE INTO hessians (fingerprint, smiles, geometry, hessian) VALUES (?, ?, ?, ?)",
+          (*memory_key, hessian[0], hessian[1].tobytes()),
+        )
+      connection.commit()
+    return value
+
+  def __claim(self, memory_key: tuple[str, str]) -> tuple[Future, bool]:
+    """in-flight future of `memory_key`, and whether the caller has to calculate it"""
+    with self.__lock:
+      future = self.__in_flight.get(memory_key)
+      if future is not None:
+        return future, False
+      future = Future()
+      self.__in_flight[memory_key] = future
+      return future, True
+
+  def __release(self, memory_key: tuple[str, str]):
+    with self.__lock:
+      del self.__in_flight[memory_key]
+
+  def compute(
+    self,
+    key: CanonicalSmiles,
+    options: SimulationOptions,
+    calculate: Callable[[], Optional[float | CalculationResult]],
+  ) -> Optional[float]:
+    """read `key` from the cache, or calculate and write it exactly once"""
+    value = self.read(key, options)
+    if value is not None:
+      return value
+
+    memory_key = (options.fingerprint(), key.__str__())
+    future, owner = self.__claim(memory_key)
+    if not owner:
+      return future.result()
+
+    try:
+      # the value might have been written between the read and claiming the key
+      value = self.read(key, options)
+      if value is None:
+        value = self.write(key, options, calculate())
+      future.set_result(value)
+      return value
+    except BaseException as e:
+      future.set_exception(e)
+      raise
+    finally:
+      self.__release(memory_key)
+
+  async def compute_async(
+    self,
+    key: CanonicalSmiles,
+    options: SimulationOptions,
+    calculate: Callable[[], Awaitable[Optional[float | CalculationResult]]],
+  ) -> Optional[float]:
+    """asynchronous `compute`, shares in-flight calculations with synchronous callers"""
+    value = self.read(key, options)
+    if value is not None:
+      return value
+
+    memory_key = (options.fingerprint(), key.__str__())
+    future, owner = self.__claim(memory_key)
+    if not owner:
+      return await asyncio.wrap_future(future)
+
+    try:
+      value = self.read(key, options)
+      if value is None:
+        value = self.write(key, options, await calculate())
+      future.set_result(value)
+      return value
+    except BaseException as e:
+      future.set_exception(e)
+      raise
+    finally:
+      self.__release(memory_key)
+
+  def __len__(self) -> int:
+    if not self.path:
+      return len(self.__memory)
+    return self.__connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
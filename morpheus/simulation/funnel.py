@@ -0,0 +1,131 @@
+from typing import Hashable, Optional
+
+from morpheus.simulation.options import GFNLevel, SimulationOptions
+
+
+class FunnelStage:
+    """
+    Cheap scoring level of a screening funnel.
+
+    Reactions are scored with the ΔG at `level`, or with the MMFF94 ΔE if `level` is
+    `None`. The `keep` best reactions, and only those with a score of at most
+    `threshold` (in Eh), move on to the next stage.
+    """
+
+    level: Optional[GFNLevel]
+    keep: Optional[int]
+    threshold: Optional[float]
+
+    def __init__(
+        self,
+        level: Optional[GFNLevel] = None,
+        keep: Optional[int] = None,
+        threshold: Optional[float] = None,
+    ) -> None:
+        self.level = level
+        self.keep = keep
+        self.threshold = threshold
+
+    @property
+    def name(self) -> str:
+        return "mmff" if self.level is None else f"gfn{self.level.value}"
+
+    def __repr__(self) -> str:
+        return f"FunnelStage({self.name}, keep={self.keep}, threshold={self.threshold})"
+
+    def options(self, base: SimulationOptions) -> Optional[SimulationOptions]:
+        """options of this stage, `None` for the force field; expensive settings of `base` are dropped"""
+        if self.level is None:
+            return None
+        return SimulationOptions(
+            gfn_level=self.level,
+            xtb_cores=base.xtb_cores,
+            conformer_search_options=None,
+            tmp_path=base.tmp_path,
+            solvent=base.solvent,
+            cache_path=base.cache_path,
+            backend=base.backend,
+        )
+
+    def select(self, scores: dict[Hashable, Optional[float]]) -> list[Hashable]:
+        """keys of the reactions surviving this stage, in their original order
+
+        Reactions without a score (e.g. missing force field parameters) can not be
+        ranked and always survive, the funnel only removes reactions known to be bad.
+        """
+        scored = sorted(
+            (score, i, key)
+            for i, (key, score) in enumerate(scores.items())
+            if score is not None and (self.threshold is None or score <= self.threshold)
+        )
+        if self.keep is not None:
+            scored = scored[: self.keep]
+        survivors = {key for _score, _i, key in scored}
+        return [
+            key for key, score in scores.items() if score is None or key in survivors
+        ]
+
+
+class StageReport:
+    """survivors and cost of a funnel stage, `calculations` counts the unique jobs that were run"""
+
+    name: str
+    reactions: int
+    survivors: list[Hashable]
+    calculations: int
+    wall_time: float
+    scores: dict[Hashable, Optional[float]]
+
+    def __init__(
+        self,
+        name: str,
+        scores: dict[Hashable, Optional[float]],
+        survivors: list[Hashable],
+        calculations: int,
+        wall_time: float,
+    ) -> None:
+        self.name = name
+        self.reactions = len(scores)
+        self.scores = scores
+        self.survivors = survivors
+        self.calculations = calculations
+        self.wall_time = wall_time
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.name}: {len(self.survivors)}/{self.reactions} reactions survived, "
+            f"{self.calculations} calculations in {self.wall_time:.1f}s"
+        )
+
+
+def parse_stage(spec: str) -> FunnelStage:
+    """
+    Parses a stage like `mmff:top=100`, `ff:max=0.01` or `0:top=20:max=0`.
+
+    The level is `mmff` or a `GFNLevel` value (`ff`, `0`, `1`, `2`), optionally
+    prefixed with `gfn`. `top` keeps the best reactions, `max` is a ΔG cutoff in Eh.
+    """
+    level_spec, *criteria = spec.strip().lower().split(":")
+    if level_spec == "mmff":
+        level = None
+    else:
+        level_spec = level_spec.removeprefix("gfn")
+        try:
+            level = GFNLevel(level_spec)
+        except ValueError:
+            raise ValueError(f"unknown funnel level {level_spec}")
+
+    stage = FunnelStage(level)
+    for criterion in criteria:
+        name, _, value = criterion.partition("=")
+        try:
+            match name:
+                case "top":
+                    stage.keep = int(value)
+                case "max":
+                    stage.threshold = float(value)
+                case _:
+                    raise ValueError(f"unknown funnel criterion {name}")
+        except ValueError as e:
+            raise ValueError(f"invalid funnel stage {spec}: {e}")
+    return stage
@@ -1,96 +1,211 @@
-import re
-import shutil
-import subprocess
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
+from morpheus.simulation.backend import CalculatorBackend, get_backend, write_inp_file
 from morpheus.simulation.cache import SimulationCache
-from morpheus.simulation.options import SimulationOptions
-import tempfile
+from morpheus.simulation.options import GFNLevel, SimulationOptions
+from morpheus.simulation.result import CalculationResult, parse_xtb_output
+from morpheus.simulation.runner import Runner
+from morpheus.simulation.workspace import Workspace, WorkspacePool
 
 class SimulationInstance:
     options: SimulationOptions
-    tmp_path: Path
-    inp_path: Path
-    out_path: Path
     result: Optional[float] = None
     cache: SimulationCache
+    runner: Runner
+    __workspace: Optional[Workspace] = None
 
-    def __init__(self, options: SimulationOptions, cache: SimulationCache) -> None:
+    def __init__(
+        self,
+        options: SimulationOptions,
+        cache: SimulationCache,
+        runner: Optional[Runner] = None,
+    ) -> None:
         self.options = options
         self.cache = cache
+        self.runner = runner or Runner.shared(options.parallel_jobs)
 
-        self.__generate_dir()
+    @property
+    def workspace(self) -> Workspace:
+        # only calculations that actually run xtb or crest need a scratch directory
+        if self.__workspace is None:
+            self.__workspace = WorkspacePool.shared(
+                self.options.tmp_path, self.options.parallel_jobs
+            ).acquire()
+        return self.__workspace
 
-    def __generate_dir(self):
-        self.tmp_path = Path(tempfile.mkdtemp(dir=self.options.tmp_path))
-        self.inp_path = Path(tempfile.mktemp(dir=self.tmp_path, suffix=".xyz"))
-        self.out_path = Path(tempfile.mktemp(dir=self.tmp_path, suffix=".out"))
+    @property
+    def tmp_path(self) -> Path:
+        return self.workspace.path
+
+    @property
+    def inp_path(self) -> Path:
+        return self.workspace.inp_path
+
+    @property
+    def out_path(self) -> Path:
+        return self.workspace.out_path
+
+    def close(self):
+        """return the scratch directory to the pool"""
+        if self.__workspace is not None:
+            WorkspacePool.shared(self.options.tmp_path).release(self.__workspace)
+            self.__workspace = None
 
     def __del__(self):
-        shutil.rmtree(self.tmp_path)       
+        self.close()
 
     def generate_inp_file(self, xyz: str):
-        with open(self.inp_path, "w") as input_file:
-            input_file.write(f"{xyz}\n$write\n  output file={self.out_path}")
+        write_inp_file(self.workspace, xyz)
+
+    def extract_result(self) -> Optional[CalculationResult]:
+        """parse the thermochemistry of the xtb output file, `None` if xtb did not write one"""
+        return parse_xtb_output(self.out_path)
 
     def extract_delta_g(self) -> float | None:
         """
-        Extracts the TOTAL FREE ENERGY from a .out file generated by xtb
-
-        :param out_file_path: The `out_file_path` parameter is expected to be a `Path` object that
-        represents the file path to the xtb output file
-        :type out_file_path: Path
-        :return: If
-        the total free energy value is successfully extracted from the file specified by `out_file_path`, it
-        will return that value as a float. If there is an error during the process, it will return `None`.
+        Extracts the TOTAL FREE ENERGY from the .out file generated by xtb
+
+        :return: the total free energy in Eh, `None` if xtb did not report one
         """
-        try:
-            with open(self.out_path, "r") as outfile:
-                output = outfile.read().splitlines()
-                return float(
-                    re.search(
-                        "(?<=TOTAL FREE ENERGY) +(-?\d+\.\d+)",
-                        [x for x in output if x.__contains__("TOTAL FREE ENERGY")][0],
-                    ).groups()[0]
-                )
-        except:
-            return None
+        result = self.extract_result()
+        return result.free_energy if result else None
 
-    def calculate_delta_g(self) -> float | None:
-        if not Path(f"{self.inp_path.parent}/param_gfn0-xtb.txt").exists():
-            subprocess.Popen(
-                [
-                    "ln",
-                    "/root/xtb/xtb-dist/share/xtb/param_gfn0-xtb.txt",
-                    f"{self.inp_path.parent}/param_gfn0-xtb.txt",
-                ],
-                stdout=subprocess.DEVNULL,
-                cwd=self.inp_path.parent,
-            ).wait()
+    def level_args(self, level: Optional[GFNLevel] = None) -> list:
+        level = level or self.options.gfn_level
+        # GFN-FF is a force field, not a --gfn parametrization
+        if level == GFNLevel.GFNFF:
+            return ["--gfnff"]
+        return ["--gfn", level.value]
+
+    def solvent_args(self) -> list:
+        return ["-alpb", self.options.solvent.value] if self.options.solvent else []
 
+    def xtb_command(self, inp_path: Optional[Path] = None, cores: Optional[int] = None) -> list:
         params = [
                 "xtb",
-                self.inp_path,
+                inp_path or self.inp_path,
                 "--chrg",
                 "0",
                 "--uhf",
                 "0",
                 "--ohess",
-                "--gfn",
-                self.options.gfn_level.value,
+                *self.level_args(),
                 "-P",
-                str(self.options.xtb_cores),
+                str(cores or self.options.xtb_cores),
         ]
-        
-        if self.options.solvent:
-            params += ["-alpb", self.options.solvent.value]
-
-        subprocess.Popen(
-            params,
-            cwd=self.inp_path.parent,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.STDOUT,
-        ).wait()
-        self.result = self.extract_delta_g()
+
+        return params + self.solvent_args()
+
+    def single_point_command(self, inp_path: Path, level: GFNLevel) -> list:
+        return [
+            "xtb", inp_path, "--chrg", "0", "--uhf", "0", "--sp",
+            *self.level_args(level), "-P", "1", *self.solvent_args(),
+        ]
+
+    @property
+    def backend(self) -> CalculatorBackend:
+        return get_backend(self.options.backend)
+
+    def single_points(self, xyzs: list[str], level: GFNLevel) -> list[Optional[float]]:
+        """total energies of the geometries `xyzs`, run in parallel on the cores of this job"""
+        if not xyzs:
+            return []
+
+        def single_point(xyz: str) -> Optional[float]:
+            with self.runner.nested():
+                return self.__detached(
+                    lambda workspace: self.backend.single_point(self, xyz, level, workspace)
+                )
+
+        # the single points share the slot, and the cores, of this job
+        with self.runner.job(), ThreadPoolExecutor(
+            max_workers=min(self.options.xtb_cores, len(xyzs))
+        ) as executor:
+            return list(executor.map(single_point, xyzs))
+
+    def calculate_ensemble(self, xyzs: list[str]) -> list[Optional[CalculationResult]]:
+        """optimized thermochemistry of every geometry in `xyzs`, in parallel on the cores of this job"""
+        if not xyzs:
+            return []
+        workers = min(self.options.xtb_cores, len(xyzs))
+        cores = max(self.options.xtb_cores // workers, 1)
+
+        def calculate(xyz: str) -> Optional[CalculationResult]:
+            with self.runner.nested():
+                return self.__detached(
+                    lambda workspace: self.__timed(self.backend.calculate, xyz, workspace, cores)
+                )
+
+        with self.runner.job(), ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(calculate, xyzs))
+
+    async def calculate_ensemble_async(self, xyzs: list[str]) -> list[Optional[CalculationResult]]:
+        # every job takes a slot of the runner, like any other calculation
+        async def calculate(xyz: str) -> Optional[CalculationResult]:
+            workspace = self.__acquire()
+            try:
+                return await self.__timed_async(xyz, workspace)
+            finally:
+                self.__release(workspace)
+
+        return await asyncio.gather(*[calculate(xyz) for xyz in xyzs])
+
+    def __acquire(self) -> Optional[Workspace]:
+        # a workspace of its own, next to the one of this instance
+        if not self.backend.needs_workspace:
+            return None
+        return WorkspacePool.shared(self.options.tmp_path).acquire()
+
+    def __release(self, workspace: Optional[Workspace]):
+        if workspace is not None:
+            WorkspacePool.shared(self.options.tmp_path).release(workspace)
+
+    def __detached(self, calculate: Callable[[Optional[Workspace]], object]):
+        workspace = self.__acquire()
+        try:
+            return calculate(workspace)
+        finally:
+            self.__release(workspace)
+
+    def __timed(self, calculate, xyz: str, workspace=None, cores=None) -> Optional[CalculationResult]:
+        start = time.perf_counter()
+        result = calculate(self, xyz, workspace, cores)
+        if result:
+            result.wall_time = time.perf_counter() - start
+        return result
+
+    async def __timed_async(self, xyz: str, workspace=None) -> Optional[CalculationResult]:
+        start = time.perf_counter()
+        result = await self.backend.calculate_async(self, xyz, workspace)
+        if result:
+            result.wall_time = time.perf_counter() - start
+        return result
+
+    def __input_xyz(self, xyz: Optional[str]) -> str:
+        # without a geometry, the one written by `generate_inp_file` is calculated
+        if xyz is not None:
+            return xyz
+        return self.inp_path.read_text().split("\n$write")[0]
+
+    def calculate(self, xyz: Optional[str] = None) -> Optional[CalculationResult]:
+        """thermochemistry of the optimized geometry `xyz`, calculated by the backend of the options"""
+        result = self.__timed(self.backend.calculate, self.__input_xyz(xyz))
+        self.result = result.free_energy if result else None
+        return result
+
+    async def calculate_async(self, xyz: Optional[str] = None) -> Optional[CalculationResult]:
+        result = await self.__timed_async(self.__input_xyz(xyz))
+        self.result = result.free_energy if result else None
+        return result
+
+    def calculate_delta_g(self) -> float | None:
+        self.calculate()
+        return self.result
+
+    async def calculate_delta_g_async(self) -> float | None:
+        await self.calculate_async()
         return self.result
@@ -1,4 +1,7 @@
 from enum import Enum
+import copy
+import hashlib
+import json
 import os
 from typing import Optional
 from pathlib import Path
@@ -21,16 +24,45 @@ class ConformerSearchMethod(Enum):
 
 
 class ConformerSearchOptions:
+    """
+    Conformer search settings.
+
+    With `rerank`, the RDKit conformers within `energy_window` (kcal/mol) of the UFF
+    minimum are deduplicated by heavy atom RMSD (Å), and the `rerank` lowest distinct
+    ones are ranked by an xtb single point at `rerank_level` before the `--ohess`.
+
+    With `ensemble` or `ensemble_window` (kcal/mol), the lowest CREST conformers are
+    all optimized and combined into a Boltzmann weighted free energy.
+    """
+
     method: ConformerSearchMethod
     accuracy: int | GFNLevel
+    rmsd_threshold: float
+    energy_window: Optional[float]
+    rerank: int
+    rerank_level: GFNLevel
+    ensemble: Optional[int]
+    ensemble_window: Optional[float]
 
     def __init__(
         self,
         method: ConformerSearchMethod = ConformerSearchMethod.RDKIT,
         rdkit_level: int = 200,
         crest_level: GFNLevel = GFNLevel.GFN0,
+        rmsd_threshold: float = 0.5,
+        energy_window: Optional[float] = 10.0,
+        rerank: int = 0,
+        rerank_level: GFNLevel = GFNLevel.GFNFF,
+        ensemble: Optional[int] = None,
+        ensemble_window: Optional[float] = None,
     ) -> None:
         self.method = method
+        self.rmsd_threshold = rmsd_threshold
+        self.energy_window = energy_window
+        self.rerank = rerank
+        self.rerank_level = rerank_level
+        self.ensemble = ensemble
+        self.ensemble_window = ensemble_window
         match self.method:
             case ConformerSearchMethod.RDKIT:
                 self.accuracy = rdkit_level
@@ -38,6 +70,12 @@ class ConformerSearchOptions:
             case ConformerSearchMethod.CREST:
                 self.accuracy = crest_level
 
+    @property
+    def is_ensemble(self) -> bool:
+        return self.method == ConformerSearchMethod.CREST and (
+            self.ensemble is not None or self.ensemble_window is not None
+        )
+
 
 class Solvent(Enum):
     ACETONE = "acetone"
@@ -97,6 +135,8 @@ class SimulationOptions:
     conformer_search: Optional[ConformerSearchOptions]
     tmp_path: Path
     solvent: Optional[Solvent]
+    cache_path: Optional[Path]
+    backend: str
 
     def __init__(
         self,
@@ -105,12 +145,70 @@ class SimulationOptions:
         conformer_search_options=None,
         tmp_path: Path = information.TMP_DIR,
         solvent: Solvent = None,
+        cache_path: Optional[Path] = information.CACHE_PATH,
+        backend: str = "xtb",
     ) -> None:
         self.gfn_level = gfn_level
         self.xtb_cores = xtb_cores or 1
         self.conformer_search = conformer_search_options
         self.tmp_path = tmp_path
         self.solvent = solvent
+        self.cache_path = cache_path
+        # calculator backend spec, see `morpheus.simulation.backend.get_backend`
+        self.backend = backend
+
+    @property
+    def parallel_jobs(self) -> int:
+        """number of xtb jobs that fit on this machine at the same time"""
+        return max((os.cpu_count() or 1) // self.xtb_cores, 1)
+
+    def with_solvent(self, solvent: Optional[Solvent]) -> "SimulationOptions":
+        """copy of these options in `solvent`, `None` for the gas phase"""
+        options = copy.copy(self)
+        options.solvent = solvent
+        return options
+
+    def fingerprint(self) -> str:
+        """hash of every option that changes the calculated free energy
+
+        Options that only affect how a calculation is run (cores, paths) are not
+        part of the fingerprint, so results can be shared between differently
+        configured runs.
+        """
+        conformer_search = None
+        if self.conformer_search:
+            accuracy = self.conformer_search.accuracy
+            conformer_search = {
+                "method": self.conformer_search.method.value,
+                "accuracy": accuracy.value if isinstance(accuracy, GFNLevel) else accuracy,
+            }
+            # only present when enabled, results of plain searches stay valid
+            if self.conformer_search.rerank:
+                conformer_search["rerank"] = {
+                    "count": self.conformer_search.rerank,
+                    "level": self.conformer_search.rerank_level.value,
+                    "rmsd_threshold": self.conformer_search.rmsd_threshold,
+                    "energy_window": self.conformer_search.energy_window,
+                }
+            # ensemble free energies are cached next to the single conformer value
+            if self.conformer_search.is_ensemble:
+                conformer_search["ensemble"] = {
+                    "count": self.conformer_search.ensemble,
+                    "window": self.conformer_search.ensemble_window,
+                }
+        data = {
+            "gfn_level": self.gfn_level.value,
+            "solvent": self.solvent.value if self.solvent else None,
+            "conformer_search": conformer_search,
+            "xtb_version": information.xtb_version(),
+        }
+        # arguments of a backend (e.g. the delay of the stub) do not change results
+        backend = self.backend.split(":")[0]
+        if backend != "xtb":
+            data["backend"] = backend
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True).encode("utf-8")
+        ).hexdigest()
 
     def __repr__(self) -> str:
         return f"""GFN level: {self.gfn_level.value}
@@ -0,0 +1,172 @@
+import math
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class CalculationResult:
+    """
+    Thermochemistry of a single xtb calculation.
+
+    Energies are in Eh, the entropy in cal/(mol K) as printed by xtb, and the wall
+    time in seconds.
+
+    `geometry` (xyz) and `hessian` (cartesian, Eh/bohr^2) of the optimized structure
+    are kept for recomputing the thermochemistry, they are not part of `as_dict`.
+    """
+
+    free_energy: Optional[float]
+    total_energy: Optional[float]
+    zero_point_energy: Optional[float]
+    enthalpy: Optional[float]
+    entropy: Optional[float]
+    g_rrho: Optional[float]
+    imaginary_frequencies: Optional[int]
+    wall_time: Optional[float]
+    converged: Optional[bool]
+    conformers: Optional[int]
+    symmetry_number: Optional[int]
+    geometry: Optional[str]
+    hessian: Optional[np.ndarray]
+
+    FIELDS = [
+        "free_energy",
+        "total_energy",
+        "zero_point_energy",
+        "enthalpy",
+        "entropy",
+        "g_rrho",
+        "imaginary_frequencies",
+        "wall_time",
+        "converged",
+        "conformers",
+        "symmetry_number",
+    ]
+
+    def __init__(self, **kwargs) -> None:
+        for field in self.FIELDS:
+            setattr(self, field, kwargs.get(field))
+        self.geometry = kwargs.get("geometry")
+        self.hessian = kwargs.get("hessian")
+
+    def __repr__(self) -> str:
+        return f"CalculationResult({', '.join(f'{f}={getattr(self, f)}' for f in self.FIELDS)})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CalculationResult):
+            return self.as_dict() == other.as_dict()
+        return False
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @staticmethod
+    def from_dict(data: dict) -> "CalculationResult":
+        return CalculationResult(**{k: v for k, v in data.items() if k in CalculationResult.FIELDS})
+
+
+# Boltzmann constant in Eh/K
+K_B = 3.166811563e-6
+
+
+def boltzmann_average(
+    results: list[Optional[CalculationResult]], temperature: float = 298.15
+) -> Optional[CalculationResult]:
+    """
+    Combines the results of the conformers of an ensemble.
+
+    The free energy is G = -kT ln Σ exp(-G_i / kT), every other quantity is the one of
+    the lowest conformer. Wall times are summed. Conformers without a free energy are
+    left out, `None` is returned if there are none.
+    """
+    results = [result for result in results if result and result.free_energy is not None]
+    if not results:
+        return None
+    kt = K_B * temperature
+    lowest = min(results, key=lambda result: result.free_energy)
+    # shifted by the minimum, so the exponentials can not underflow
+    partition = sum(math.exp(-(result.free_energy - lowest.free_energy) / kt) for result in results)
+
+    ensemble = CalculationResult.from_dict(lowest.as_dict())
+    ensemble.free_energy = lowest.free_energy - kt * math.log(partition)
+    ensemble.wall_time = sum(result.wall_time or 0.0 for result in results)
+    converged = [result.converged for result in results]
+    ensemble.converged = None if None in converged else all(converged)
+    ensemble.conformers = len(results)
+    return ensemble
+
+
+_FLOAT = r"(-?\d+\.\d+(?:[eEdD][-+]?\d+)?)"
+
+# patterns of the xtb output, each line is matched against every pattern once
+_PATTERNS = [
+    ("free_energy", re.compile(rf"TOTAL FREE ENERGY\s+{_FLOAT}")),
+    ("total_energy", re.compile(rf"TOTAL ENERGY\s+{_FLOAT}")),
+    ("enthalpy", re.compile(rf"TOTAL ENTHALPY\s+{_FLOAT}")),
+    ("zero_point_energy", re.compile(rf"zero point energy\s+{_FLOAT}")),
+    ("g_rrho", re.compile(rf"G\(RRHO\) contrib\.\s+{_FLOAT}")),
+    # TOT  enthalpy (cal/mol)  heat capacity (cal/K/mol)  entropy (cal/K/mol)  entropy (J/K/mol)
+    ("entropy", re.compile(rf"^\s*TOT\s+{_FLOAT}\s+{_FLOAT}\s+{_FLOAT}")),
+    ("imaginary_frequencies", re.compile(r"# imaginary freq\.\s+(\d+)")),
+    ("symmetry_number", re.compile(r"rotational number\s+(\d+)")),
+]
+
+
+def parse_xtb_output(path: Path) -> Optional[CalculationResult]:
+    """
+    Parses the output of an xtb `--ohess` calculation in a single pass.
+
+    Returns `None` if the output file does not exist, e.g. because xtb crashed. Values
+    missing from the output are left as `None`.
+    """
+    try:
+        outfile = open(path, "r")
+    except FileNotFoundError:
+        return None
+
+    result = CalculationResult()
+    with outfile:
+        for line in outfile:
+            if "GEOMETRY OPTIMIZATION CONVERGED" in line:
+                result.converged = True
+                continue
+            if "FAILED TO CONVERGE" in line:
+                result.converged = False
+                continue
+            for field, pattern in _PATTERNS:
+                match = pattern.search(line)
+                if not match:
+                    continue
+                if field in ("imaginary_frequencies", "symmetry_number"):
+                    setattr(result, field, int(match.group(1)))
+                elif field == "entropy":
+                    result.entropy = float(match.group(3))
+                else:
+                    # the last value is the one of the final, optimized geometry
+                    setattr(result, field, float(match.group(1).replace("D", "E").replace("d", "e")))
+                break
+    return result
+
+
+def read_xtb_hessian(path: Path) -> Optional[np.ndarray]:
+    """the cartesian hessian of an xtb `hessian` file, `None` if there is none"""
+    try:
+        lines = open(path, "r").read().splitlines()
+    except FileNotFoundError:
+        return None
+    values = np.array(
+        [float(value) for line in lines if not line.startswith("$") for value in line.split()]
+    )
+    size = int(round(math.sqrt(len(values))))
+    if size == 0 or size * size != len(values):
+        return None
+    return values.reshape(size, size)
+
+
+def read_xyz(path: Path) -> Optional[str]:
+    try:
+        return open(path, "r").read().strip()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+import subprocess
+import threading
+import weakref
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional, Sequence
+
+# seconds between attempts of an async job to take a slot held by a thread
+SLOT_POLL_INTERVAL = 0.05
+
+
+class Runner:
+    """
+    Runs external programs (xtb, crest) either blocking or from an asyncio event loop.
+
+    Runs are limited to `max_jobs` concurrent processes, blocking and asynchronous
+    ones alike, from any thread or event loop of the process. Asynchronous jobs queue
+    on a semaphore of their event loop, so a single Python process can queue hundreds
+    of jobs without oversubscribing the machine or needing a thread per job.
+
+    A calculation that fans out into several runs on its own cores (re-ranking single
+    points, ensemble conformers) holds a single slot with `job`, its threads run
+    inside it with `nested`.
+    """
+
+    max_jobs: int
+    __slots: threading.BoundedSemaphore
+    __semaphores: weakref.WeakKeyDictionary
+    __local: threading.local
+
+    __shared: dict[int, "Runner"] = {}
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_jobs: int = 1) -> None:
+        self.max_jobs = max(max_jobs, 1)
+        # the process wide limit, shared by every thread and event loop
+        self.__slots = threading.BoundedSemaphore(self.max_jobs)
+        # asyncio primitives are bound to the event loop they are used in
+        self.__semaphores = weakref.WeakKeyDictionary()
+        self.__local = threading.local()
+
+    @classmethod
+    def shared(cls, max_jobs: int) -> "Runner":
+        """runner shared by every simulation of this process with the same `max_jobs`"""
+        with cls.__shared_lock:
+            if max_jobs not in cls.__shared:
+                cls.__shared[max_jobs] = cls(max_jobs)
+            return cls.__shared[max_jobs]
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self.__semaphores:
+            self.__semaphores[loop] = asyncio.Semaphore(self.max_jobs)
+        return self.__semaphores[loop]
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """hold one of the `max_jobs` job slots of the process"""
+        async with self.semaphore:
+            # polling keeps the event loop free and leaks no slot on cancellation
+            while not self.__slots.acquire(blocking=False):
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                self.__slots.release()
+
+    @contextlib.contextmanager
+    def job(self) -> Iterator[None]:
+        """hold one slot for a calculation that fans out into several runs"""
+        with self.__slots:
+            yield
+
+    @contextlib.contextmanager
+    def nested(self) -> Iterator[None]:
+        """runs of this thread belong to a `job` that already holds a slot"""
+        self.__local.nested = True
+        try:
+            yield
+        finally:
+            self.__local.nested = False
+
+    def run(self, args: Sequence, cwd: Path, quiet: bool = True) -> int:
+        nested = getattr(self.__local, "nested", False)
+        with contextlib.nullcontext() if nested else self.__slots:
+            return subprocess.run(
+                [str(arg) for arg in args],
+                cwd=cwd,
+                stdout=subprocess.DEVNULL if quiet else None,
+                stderr=subprocess.STDOUT,
+            ).returncode
+
+    async def run_async(self, args: Sequence, cwd: Path, quiet: bool = True) -> Optional[int]:
+        async with self.slot():
+            process = await asyncio.create_subprocess_exec(
+                *[str(arg) for arg in args],
+                cwd=cwd,
+                stdout=subprocess.DEVNULL if quiet else None,
+                stderr=subprocess.STDOUT,
+            )
+            try:
+                return await process.wait()
+            except asyncio.CancelledError:
+                # a cancelled calculation must not leave xtb running
+                process.kill()
+                await process.wait()
+                raise
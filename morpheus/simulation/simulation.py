@@ -1,17 +1,222 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import AsyncIterator, Hashable, Iterable, Iterator, Optional
+
+import numpy as np
+
 from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.funnel import FunnelStage, StageReport
 from morpheus.simulation.options import DEFAULT_SIMULATION_OPTIONS, SimulationOptions
 from morpheus.simulation.instance import SimulationInstance
+from morpheus.simulation.result import CalculationResult
+from morpheus.simulation.runner import Runner
+from morpheus.simulation.thermo import TemperatureScan
 from morpheus.interfaces.delta_g import IDeltaG
 
 class Simulation:
     options: SimulationOptions
     cache: SimulationCache
+    runner: Runner
 
-    def __init__(self, options: SimulationOptions=DEFAULT_SIMULATION_OPTIONS):
+    def __init__(
+        self,
+        options: SimulationOptions = DEFAULT_SIMULATION_OPTIONS,
+        cache: Optional[SimulationCache] = None,
+        runner: Optional[Runner] = None,
+    ):
         self.options = options
-        self.cache = SimulationCache()
+        self.cache = cache or SimulationCache.shared(options.cache_path)
+        self.runner = runner or Runner.shared(options.parallel_jobs)
 
     def calculate_delta_g(self, obj: IDeltaG) -> float:
-        instance = SimulationInstance(self.options, self.cache)
-        instance.result = obj.calculate_delta_g(instance)
+        instance = SimulationInstance(self.options, self.cache, self.runner)
+        try:
+            instance.result = obj.calculate_delta_g(instance)
+        finally:
+            instance.close()
+        return instance.result
+
+    async def calculate_delta_g_async(self, obj: IDeltaG) -> float:
+        instance = SimulationInstance(self.options, self.cache, self.runner)
+        try:
+            instance.result = await obj.calculate_delta_g_async(instance)
+        finally:
+            instance.close()
         return instance.result
+
+    def calculate_result(self, molecule) -> Optional[CalculationResult]:
+        """full thermochemistry of `molecule`, read from the cache when it was calculated before"""
+        instance = SimulationInstance(self.options, self.cache, self.runner)
+        try:
+            return molecule.calculate_result(instance)
+        finally:
+            instance.close()
+
+    def prepare_geometries(self, molecule) -> list[str]:
+        """conformer search of `molecule` without the final calculation, see `calculate_delta_g_from`"""
+        instance = SimulationInstance(self.options, self.cache, self.runner)
+        try:
+            return molecule.starting_geometries(instance)
+        finally:
+            instance.close()
+
+    def calculate_delta_g_from(self, molecule, geometries: list[str]) -> Optional[float]:
+        """free energy of `molecule` optimized from `geometries` instead of its own conformer search"""
+        instance = SimulationInstance(self.options, self.cache, self.runner)
+        try:
+            instance.result = molecule.calculate_delta_g_from(instance, geometries)
+        finally:
+            instance.close()
+        return instance.result
+
+    def temperature_scan(self, obj: IDeltaG, temperatures: Iterable[float]) -> Optional[np.ndarray]:
+        """
+        ΔG of `obj` at every temperature in Eh, `None` if `obj` has no species or a
+        species has no stored hessian.
+
+        `obj` is calculated once (or read from the cache), the RRHO thermochemistry of
+        every temperature is then recomputed from the stored hessians without xtb.
+        """
+        self.calculate_delta_g(obj)
+        species = obj.species()
+        if species is None:
+            return None
+        consumed, produced = species
+        return TemperatureScan(self.cache, self.options, temperatures).reaction(consumed, produced)
+
+    async def gather(self, objs: Iterable[IDeltaG]) -> list[float]:
+        """calculate all `objs` concurrently, at most `options.parallel_jobs` xtb jobs run at once"""
+        return await asyncio.gather(*[self.calculate_delta_g_async(obj) for obj in objs])
+
+    async def calculate_delta_g_many_async(
+        self, objs: Iterable[IDeltaG]
+    ) -> AsyncIterator[tuple[int, Optional[float]]]:
+        """
+        Calculate all `objs` concurrently, yield `(index, ΔG)` as soon as each is known.
+
+        Objects with the same species are calculated once, species shared between
+        objects are calculated once through the cache. At most `options.parallel_jobs`
+        xtb jobs run at once.
+        """
+        batch: dict[Hashable, tuple[IDeltaG, list[int]]] = {}
+        for index, obj in enumerate(objs):
+            batch.setdefault(batch_key(obj), (obj, []))[1].append(index)
+
+        pending = {
+            asyncio.ensure_future(self.calculate_delta_g_async(obj)): indices
+            for obj, indices in batch.values()
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for index in pending.pop(task):
+                        yield index, task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def calculate_delta_g_many(
+        self, objs: Iterable[IDeltaG], ordered: bool = False
+    ) -> Iterator[tuple[int, Optional[float]]]:
+        """
+        Synchronous `calculate_delta_g_many_async`, for callers without an event loop.
+
+        The batch is calculated in a background thread, `(index, ΔG)` pairs are yielded
+        as they complete, or in the order of `objs` if `ordered`. Closing the iterator
+        early cancels the remaining calculations.
+        """
+        results = queue.Queue()
+        done = object()
+
+        async def calculate():
+            try:
+                async for item in self.calculate_delta_g_many_async(objs):
+                    results.put(item)
+                results.put(done)
+            except asyncio.CancelledError:
+                pass
+            except BaseException as e:
+                results.put(e)
+
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(calculate())
+
+        def run():
+            try:
+                loop.run_until_complete(task)
+            finally:
+                loop.run_until_complete(loop.shutdown_default_executor())
+                loop.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            buffered = {}
+            expected = 0
+            while (item := results.get()) is not done:
+                if isinstance(item, BaseException):
+                    raise item
+                if not ordered:
+                    yield item
+                    continue
+                buffered[item[0]] = item[1]
+                while expected in buffered:
+                    yield expected, buffered.pop(expected)
+                    expected += 1
+        finally:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # the batch is done and the loop closed
+                pass
+            thread.join()
+
+    async def funnel_async(self, objs: list[IDeltaG], stages: Iterable[FunnelStage]) -> list[StageReport]:
+        """
+        Screen `objs` through the cheap `stages`, then calculate the survivors with `options`.
+
+        Returns a report per stage; the last one is the final calculation, its `scores`
+        map the indices of the surviving `objs` to their ΔG.
+        """
+        stages = list(stages)
+        reports = []
+        survivors = list(range(len(objs)))
+        for stage in [*stages, None]:
+            start = time.perf_counter()
+            candidates = [objs[i] for i in survivors]
+            if stage is None:
+                scores = await self.gather(candidates)
+            elif stage.level is None:
+                scores = await asyncio.gather(
+                    *[asyncio.to_thread(obj.calculate_force_field_energy) for obj in candidates]
+                )
+            else:
+                simulation = Simulation(stage.options(self.options), self.cache, self.runner)
+                scores = await simulation.gather(candidates)
+
+            scores = dict(zip(survivors, scores))
+            if stage is None:
+                name = FunnelStage(self.options.gfn_level).name
+            else:
+                name = stage.name
+                survivors = stage.select(scores)
+            reports.append(
+                StageReport(name, scores, list(survivors), len(candidates), time.perf_counter() - start)
+            )
+        return reports
+
+    def funnel(self, objs: list[IDeltaG], stages: Iterable[FunnelStage]) -> list[StageReport]:
+        return asyncio.run(self.funnel_async(objs, stages))
+
+
+def batch_key(obj: IDeltaG) -> Hashable:
+    """objects with equal keys have the same ΔG, the species regardless of their order"""
+    species = obj.species()
+    if species is None:
+        return id(obj)
+    consumed, produced = species
+    return tuple(sorted(consumed)), tuple(sorted(produced))
@@ -0,0 +1,188 @@
+from typing import Iterable, Optional
+
+import numpy as np
+import rdkit.Chem as _rdc
+
+from morpheus.simulation.backend import parse_xyz
+
+# CODATA 2018, SI units
+PLANCK = 6.62607015e-34
+BOLTZMANN = 1.380649e-23
+SPEED_OF_LIGHT = 2.99792458e10  # cm/s
+AMU = 1.66053906660e-27
+HARTREE = 4.3597447222071e-18
+BOHR = 0.529177210903e-10
+ANGSTROM = 1e-10
+PRESSURE = 101325.0
+
+# modified RRHO of xtb: modes below ROTOR_CUTOFF (cm^-1) become free rotors, small
+# imaginary modes above IMAGINARY_CUTOFF are treated as real
+ROTOR_CUTOFF = 50.0
+IMAGINARY_CUTOFF = -20.0
+AVERAGE_MOMENT = 1e-44  # kg m^2
+
+
+def masses(numbers: list[int]) -> np.ndarray:
+    table = _rdc.GetPeriodicTable()
+    return np.array([table.GetAtomicWeight(number) for number in numbers])
+
+
+def frequencies(xyz: str, hessian: np.ndarray) -> np.ndarray:
+    """
+    Harmonic frequencies in cm^-1 of a cartesian hessian in Eh/bohr^2, as written by xtb.
+
+    Translations and rotations are projected out, imaginary modes are negative.
+    """
+    numbers, positions = parse_xyz(xyz)
+    mass = masses(numbers)
+    positions = np.array(positions) - np.average(positions, axis=0, weights=mass)
+    sqrt_mass = np.repeat(np.sqrt(mass), 3)
+    weighted = hessian / np.outer(sqrt_mass, sqrt_mass)
+
+    # translations and rotations in mass weighted coordinates
+    modes = []
+    for axis in np.eye(3):
+        modes.append((np.tile(axis, len(numbers)) * sqrt_mass))
+        modes.append((np.cross(positions, axis).reshape(-1) * sqrt_mass))
+    u, singular, _ = np.linalg.svd(np.array(modes).T, full_matrices=False)
+    external = u[:, singular > 1e-6 * singular.max()]
+    projector = np.eye(len(sqrt_mass)) - external @ external.T
+
+    eigenvalues = np.linalg.eigvalsh(projector @ weighted @ projector)
+    # the projected modes are the eigenvalues closest to zero
+    internal = np.sort(eigenvalues[np.argsort(np.abs(eigenvalues))[external.shape[1]:]])
+    omega = np.sqrt(np.abs(internal) * HARTREE / (BOHR**2 * AMU))
+    return np.sign(internal) * omega / (2 * np.pi * SPEED_OF_LIGHT)
+
+
+def rrho(
+    xyz: str,
+    wavenumbers: np.ndarray,
+    temperatures: Iterable[float],
+    symmetry_number: int = 1,
+) -> np.ndarray:
+    """
+    G(RRHO) contribution in Eh at every temperature, including the zero point energy.
+
+    Follows the modified RRHO of xtb: vibrational entropies of low modes are
+    interpolated with free rotor entropies.
+    """
+    temperatures = np.asarray(list(temperatures), dtype=float)[:, None]
+    numbers, positions = parse_xyz(xyz)
+    mass = masses(numbers)
+    kt = BOLTZMANN * temperatures
+
+    # translation, pV included
+    total_mass = mass.sum() * AMU
+    s_trans = BOLTZMANN * (
+        np.log((2 * np.pi * total_mass * kt / PLANCK**2) ** 1.5 * kt / PRESSURE) + 2.5
+    )
+    h_trans = 2.5 * kt
+
+    # rigid rotor
+    h_rot = np.zeros_like(temperatures)
+    s_rot = np.zeros_like(temperatures)
+    if len(numbers) > 1:
+        r = (np.array(positions) - np.average(positions, axis=0, weights=mass)) * ANGSTROM
+        inertia = np.sum(mass * AMU * np.sum(r**2, axis=1)) * np.eye(3) - np.einsum(
+            "i,ij,ik->jk", mass * AMU, r, r
+        )
+        moments = np.linalg.eigvalsh(inertia)
+        if moments[0] < 1e-3 * moments[2]:
+            h_rot = kt
+            s_rot = BOLTZMANN * (
+                np.log(8 * np.pi**2 * moments[2] * kt / (symmetry_number * PLANCK**2)) + 1
+            )
+        else:
+            h_rot = 1.5 * kt
+            s_rot = BOLTZMANN * (
+                np.log(
+                    np.sqrt(np.pi * np.prod(moments)) / symmetry_number
+                    * (8 * np.pi**2 * kt / PLANCK**2) ** 1.5
+                )
+                + 1.5
+            )
+
+    # vibrations, interpolated with free rotors below the cutoff
+    nu = np.asarray(wavenumbers, dtype=float)
+    nu = np.where((nu < 0) & (nu > IMAGINARY_CUTOFF), -nu, nu)
+    nu = nu[nu > 0][None, :]
+    energy = PLANCK * SPEED_OF_LIGHT * nu
+    x = energy / kt
+    zpe = 0.5 * energy.sum()
+    h_vib = np.sum(energy / np.expm1(x), axis=1, keepdims=True)
+    s_harmonic = BOLTZMANN * (x / np.expm1(x) - np.log(-np.expm1(-x)))
+    moment = PLANCK / (8 * np.pi**2 * SPEED_OF_LIGHT * nu)
+    reduced = moment * AVERAGE_MOMENT / (moment + AVERAGE_MOMENT)
+    s_rotor = BOLTZMANN * (0.5 + np.log(np.sqrt(8 * np.pi**3 * reduced * kt / PLANCK**2)))
+    weight = 1 / (1 + (ROTOR_CUTOFF / nu) ** 4)
+    s_vib = np.sum(weight * s_harmonic + (1 - weight) * s_rotor, axis=1, keepdims=True)
+
+    g = zpe + h_vib + h_rot + h_trans - temperatures * (s_vib + s_rot + s_trans)
+    return (g / HARTREE)[:, 0]
+
+
+def free_energies(
+    total_energy: float,
+    xyz: str,
+    hessian: np.ndarray,
+    temperatures: Iterable[float],
+    symmetry_number: Optional[int] = None,
+) -> np.ndarray:
+    """free energies in Eh at every temperature, from the stored geometry and hessian"""
+    return total_energy + rrho(xyz, frequencies(xyz, hessian), temperatures, symmetry_number or 1)
+
+
+def parse_temperatures(spec: str) -> list[float]:
+    """temperatures of `start:stop:step` (stop included) or a comma separated list, in K"""
+    if ":" in spec:
+        start, stop, step = (float(value) for value in spec.split(":"))
+        if step <= 0 or stop < start:
+            raise ValueError(f"invalid temperature range {spec}")
+        return list(np.round(np.arange(start, stop + step / 2, step), 6))
+    return [float(value) for value in spec.split(",") if value.strip()]
+
+
+class TemperatureScan:
+    """
+    Free energies over temperatures, from the geometries and hessians in a cache.
+
+    Species are keyed by canonical SMILES like in the cache; the free energies of every
+    species are only computed once. Species without a stored hessian (e.g. calculated
+    before hessians were kept, or ensembles) have no scan.
+    """
+
+    cache: object
+    options: object
+    temperatures: list[float]
+    __species: dict[str, Optional[np.ndarray]]
+
+    def __init__(self, cache, options, temperatures: Iterable[float]) -> None:
+        self.cache = cache
+        self.options = options
+        self.temperatures = list(temperatures)
+        self.__species = {}
+
+    def species(self, key: str) -> Optional[np.ndarray]:
+        key = key.__str__()
+        if key not in self.__species:
+            result = self.cache.read_result(key, self.options)
+            stored = self.cache.read_hessian(key, self.options)
+            if result is None or result.total_energy is None or stored is None:
+                self.__species[key] = None
+            else:
+                geometry, hessian = stored
+                self.__species[key] = free_energies(
+                    result.total_energy, geometry, hessian, self.temperatures, result.symmetry_number
+                )
+        return self.__species[key]
+
+    def reaction(self, reactants: Iterable[str], products: Iterable[str]) -> Optional[np.ndarray]:
+        """ΔG of the reaction at every temperature, `None` if any species has no scan"""
+        reactants = [self.species(key) for key in reactants]
+        products = [self.species(key) for key in products]
+        if any(energies is None for energies in reactants + products):
+            return None
+        return sum(products, np.zeros(len(self.temperatures))) - sum(
+            reactants, np.zeros(len(self.temperatures))
+        )
@@ -0,0 +1,148 @@
+import itertools
+import os
+import shutil
+import socket
+import threading
+from multiprocessing.util import Finalize
+from pathlib import Path
+
+from morpheus.utils import information
+
+PREFIX = "ws"
+
+
+class Workspace:
+    """scratch directory of a single calculation, with the xtb parameter files linked in"""
+
+    path: Path
+    inp_path: Path
+    out_path: Path
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.inp_path = path / "input.xyz"
+        self.out_path = path / "output.out"
+
+    def link_parameters(self):
+        parameter_dir = information.xtb_parameter_dir()
+        if not parameter_dir:
+            return
+        for name in information.XTB_PARAMETER_FILES:
+            target = self.path / name
+            if target.exists():
+                continue
+            try:
+                os.link(parameter_dir / name, target)
+            except OSError:
+                # hard links do not work across file systems, e.g. onto /dev/shm
+                os.symlink(parameter_dir / name, target)
+
+    def clean(self):
+        """remove everything but the parameter files"""
+        for entry in os.scandir(self.path):
+            if entry.name in information.XTB_PARAMETER_FILES:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+class WorkspacePool:
+    """
+    Pool of reusable scratch directories below `root`.
+
+    Directories are named after the host and the process owning them. Directories of
+    processes that no longer exist on this host are left over from crashed runs and are
+    removed when a pool is created. Set `root` to a directory on /dev/shm to keep the
+    scratch files of small molecules in memory.
+    """
+
+    root: Path
+    __free: list[Workspace]
+    __owned: list[Workspace]
+    __lock: threading.Lock
+    __counter: itertools.count
+
+    __shared: dict[tuple[Path, int], "WorkspacePool"] = {}
+    __shared_lock = threading.Lock()
+
+    def __init__(self, root: Path, size: int = 0) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.__free = []
+        self.__owned = []
+        self.__lock = threading.Lock()
+        self.__counter = itertools.count()
+
+        collect_garbage(self.root)
+        for _ in range(size):
+            self.__free.append(self.__create())
+
+        Finalize(self, WorkspacePool.__remove_all, args=(self.__owned,), exitpriority=10)
+
+    @classmethod
+    def shared(cls, root: Path, size: int = 0) -> "WorkspacePool":
+        """pool shared by every simulation of this process using the same `root`"""
+        # forked processes must not reuse the directories of their parent
+        key = (Path(root), os.getpid())
+        with cls.__shared_lock:
+            if key not in cls.__shared:
+                cls.__shared[key] = cls(root, size)
+            return cls.__shared[key]
+
+    @staticmethod
+    def __owner() -> str:
+        return f"{PREFIX}-{socket.gethostname()}-{os.getpid()}"
+
+    def __create(self) -> Workspace:
+        path = self.root / f"{self.__owner()}-{next(self.__counter)}"
+        path.mkdir()
+        workspace = Workspace(path)
+        workspace.link_parameters()
+        self.__owned.append(workspace)
+        return workspace
+
+    def acquire(self) -> Workspace:
+        with self.__lock:
+            if self.__free:
+                return self.__free.pop()
+            return self.__create()
+
+    def release(self, workspace: Workspace):
+        workspace.clean()
+        with self.__lock:
+            self.__free.append(workspace)
+
+    @staticmethod
+    def __remove_all(workspaces: list[Workspace]):
+        for workspace in workspaces:
+            shutil.rmtree(workspace.path, ignore_errors=True)
+
+
+def collect_garbage(root: Path):
+    """remove workspaces below `root` of processes on this host which are no longer running"""
+    root = Path(root)
+    if not root.exists():
+        return
+    host = socket.gethostname()
+    for entry in os.scandir(root):
+        parts = entry.name.rsplit("-", 2)
+        if not entry.is_dir() or len(parts) != 3 or parts[0] != f"{PREFIX}-{host}":
+            continue
+        try:
+            pid = int(parts[1])
+        except ValueError:
+            continue
+        if not _is_running(pid):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
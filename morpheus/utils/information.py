@@ -1,4 +1,9 @@
+import functools
+import os
 import random
+import re
+import shutil
+import subprocess
 from colored import Fore
 import rdkit
 from pathlib import Path
@@ -23,6 +28,42 @@ TMP_DIR = Path(f"{tempfile.gettempdir()}/{NAMESPACE}/")
 if not TMP_DIR.exists():
     TMP_DIR.mkdir(exist_ok=True, parents=True)
 
+# the result cache outlives `morpheus clean` and tmp cleanups, it is created on first use
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / NAMESPACE
+CACHE_PATH = CACHE_DIR / "cache.sqlite"
+
+# parameter files xtb expects in its working directory
+XTB_PARAMETER_FILES = ["param_gfn0-xtb.txt"]
+
+
+@functools.cache
+def xtb_parameter_dir() -> Path | None:
+  """directory holding the xtb parameter files, `None` if it can not be found"""
+  candidates = [Path(os.environ[v]) / "share" / "xtb" for v in ["XTBHOME"] if v in os.environ]
+  candidates += [Path(p) for p in os.environ.get("XTBPATH", "").split(os.pathsep) if p]
+  if shutil.which("xtb"):
+    candidates.append(Path(shutil.which("xtb")).resolve().parent.parent / "share" / "xtb")
+  candidates.append(Path("/root/xtb/xtb-dist/share/xtb"))
+  for candidate in candidates:
+    if (candidate / XTB_PARAMETER_FILES[0]).exists():
+      return candidate
+  return None
+
+
+@functools.cache
+def xtb_version() -> str:
+  """version of the xtb binary on the PATH, `unknown` if it can not be determined"""
+  if not shutil.which("xtb"):
+    return "unknown"
+  try:
+    output = subprocess.run(
+      ["xtb", "--version"], capture_output=True, text=True, timeout=30
+    ).stdout
+  except (OSError, subprocess.SubprocessError):
+    return "unknown"
+  match = re.search(r"version (\d+\.\d+(?:\.\d+)?)", output)
+  return match.group(1) if match else "unknown"
+
 
 def print_logo():
   m = ""
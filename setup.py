@@ -7,6 +7,7 @@ setup(
     description="Morpheus library for delta G prediction",
     author="Elias Rusch",
     install_requires=["rdkit", "termcolor", "colored"],
+    extras_require={"tblite": ["tblite"]},
     setup_requires=["pytest-runner"],
     tests_require=["pytest"],
     test_suite="tests",
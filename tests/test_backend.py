@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from morpheus.molecule import Molecule, Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.scheduler import ReactionPipeline
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.backend import StubBackend, TbliteBackend, XtbBackend, get_backend, parse_xyz
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import GFNLevel
+
+WATER = """3
+
+O 0.0 0.0 0.1173
+H 0.0 0.7572 -0.4692
+H 0.0 -0.7572 -0.4692"""
+
+def test_get_backend():
+  assert isinstance(get_backend("xtb"), XtbBackend)
+  stub = get_backend("stub:0.25")
+  assert isinstance(stub, StubBackend) and stub.delay == 0.25
+  with pytest.raises(ValueError):
+    get_backend("orca")
+
+def test_backend_levels():
+  assert XtbBackend.supports(GFNLevel.GFN0) and StubBackend.supports(GFNLevel.GFNFF)
+  # tblite is only parametrized for GFN1 and GFN2
+  assert TbliteBackend.supports(GFNLevel.GFN2) and not TbliteBackend.supports(GFNLevel.GFN0)
+
+def test_parse_xyz():
+  numbers, positions = parse_xyz(WATER)
+  assert numbers == [8, 1, 1]
+  assert positions[1] == [0.0, 0.7572, -0.4692]
+
+def test_stub_backend_deterministic():
+  simulation = Simulation(SimulationOptions(backend="stub", cache_path=None), SimulationCache())
+  first = simulation.calculate_result(Molecule(Smiles("CCO")))
+  # a different embedding of the same molecule, not read from the cache
+  second = Simulation(simulation.options, SimulationCache()).calculate_result(Molecule(Smiles("OCC")))
+  assert first.free_energy == second.free_energy
+  assert first.wall_time is not None and first.converged
+  assert first.free_energy != simulation.calculate_delta_g(Molecule(Smiles("CC=O")))
+
+def test_stub_backend_fingerprint():
+  xtb = SimulationOptions()
+  assert SimulationOptions(backend="stub").fingerprint() != xtb.fingerprint()
+  assert SimulationOptions(backend="stub").fingerprint() == SimulationOptions(backend="stub:1").fingerprint()
+
+def test_stub_backend_pipeline():
+  options = SimulationOptions(backend="stub", cache_path=None)
+  template = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+  reactants = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+  with ReactionPipeline(template, reactants, options, 2) as pipeline:
+    pipeline.enumerate()
+    results = list(pipeline.calculate())
+  assert [r.error for r in results] == [None, None]
+  assert all(isinstance(r.delta_g, float) for r in results)
+
+def test_stub_backend_async():
+  simulation = Simulation(SimulationOptions(backend="stub:0.01", cache_path=None), SimulationCache())
+  energies = asyncio.run(simulation.gather([Molecule(Smiles(s)) for s in ["C", "CC", "CCC"]]))
+  assert energies[0] > energies[1] > energies[2]
+
+def test_calculate_delta_g_many():
+  simulation = Simulation(SimulationOptions(backend="stub:0.01", cache_path=None), SimulationCache())
+  template = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+  products = template.run_reaction([Molecule(Smiles("C=O")), Molecule(Smiles("O"))])
+  objs = [Molecule(Smiles("CCO")), products[0], Molecule(Smiles("OCC")), Molecule(Smiles("C"))]
+
+  results = list(simulation.calculate_delta_g_many(objs))
+  assert sorted(index for index, _delta_g in results) == [0, 1, 2, 3]
+  delta_gs = dict(results)
+  # the same species in a different order is calculated once
+  assert delta_gs[0] == delta_gs[2]
+  assert delta_gs[1] == simulation.calculate_delta_g(products[0])
+
+  ordered = list(simulation.calculate_delta_g_many(objs, ordered=True))
+  assert ordered == sorted(results)
+
+  # closing the iterator early cancels the rest of the batch
+  batch = simulation.calculate_delta_g_many([Molecule(Smiles("C" * n)) for n in range(1, 8)])
+  assert next(batch)[1] is not None
+  batch.close()
@@ -0,0 +1,96 @@
+import pytest
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import GFNLevel, SimulationOptions, Solvent
+
+def test_cache_memory():
+  cache = SimulationCache(maxsize=2)
+  options = SimulationOptions()
+  water = CanonicalSmiles(Smiles("O"))
+  assert cache.read(water, options) == None
+  assert cache.write(water, options, -5.07) == -5.07
+  assert cache.read(water, options) == -5.07
+  # failed calculations are not cached
+  assert cache.write(CanonicalSmiles(Smiles("C")), options, None) == None
+  assert cache.read(CanonicalSmiles(Smiles("C")), options) == None
+
+def test_cache_lru():
+  cache = SimulationCache(maxsize=2)
+  options = SimulationOptions()
+  for i, smiles in enumerate(["C", "CC", "CCC"]):
+    cache.write(CanonicalSmiles(Smiles(smiles)), options, float(i))
+  assert cache.read(CanonicalSmiles(Smiles("C")), options) == None
+  assert cache.read(CanonicalSmiles(Smiles("CCC")), options) == 2.0
+
+def test_cache_options_fingerprint():
+  cache = SimulationCache()
+  gfn2 = SimulationOptions(gfn_level=GFNLevel.GFN2)
+  water = CanonicalSmiles(Smiles("O"))
+  cache.write(water, gfn2, -5.07)
+  assert cache.read(water, SimulationOptions(gfn_level=GFNLevel.GFN2, xtb_cores=3)) == -5.07
+  assert cache.read(water, SimulationOptions(gfn_level=GFNLevel.GFN0)) == None
+  assert cache.read(water, SimulationOptions(gfn_level=GFNLevel.GFN2, solvent=Solvent.WATER)) == None
+
+def test_cache_persistent(tmp_path):
+  options = SimulationOptions()
+  path = tmp_path / "cache.sqlite"
+  # the canonical key is used, independent of how the SMILES was written
+  SimulationCache(path).write(CanonicalSmiles(Smiles("OCC")), options, -11.4)
+  cache = SimulationCache(path)
+  assert cache.read(CanonicalSmiles(Smiles("CCO")), options) == -11.4
+  assert len(cache) == 1
+
+def test_cache_shared(tmp_path):
+  path = tmp_path / "cache.sqlite"
+  assert SimulationCache.shared(path) is SimulationCache.shared(path)
+  assert SimulationCache.shared(path) is not SimulationCache.shared(None)
+
+def test_cache_single_flight():
+  import threading
+  import time
+
+  cache = SimulationCache()
+  options = SimulationOptions()
+  calls = []
+
+  def calculate():
+    calls.append(1)
+    time.sleep(0.1)
+    return -5.07
+
+  results = []
+  threads = [
+    threading.Thread(
+      target=lambda: results.append(cache.compute(CanonicalSmiles(Smiles("O")), options, calculate))
+    )
+    for _ in range(8)
+  ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert len(calls) == 1
+  assert results == [-5.07] * 8
+
+def test_cache_single_flight_error():
+  cache = SimulationCache()
+  options = SimulationOptions()
+
+  def fail():
+    raise RuntimeError("xtb failed")
+
+  with pytest.raises(RuntimeError):
+    cache.compute(CanonicalSmiles(Smiles("O")), options, fail)
+  # a failed calculation does not block later attempts
+  assert cache.compute(CanonicalSmiles(Smiles("O")), options, lambda: -5.07) == -5.07
+
+def test_cache_conformer_rerank_fingerprint():
+  from morpheus.simulation.options import ConformerSearchOptions
+
+  plain = SimulationOptions(conformer_search_options=ConformerSearchOptions())
+  # pruning settings alone do not change the selected conformer
+  pruned = SimulationOptions(conformer_search_options=ConformerSearchOptions(rmsd_threshold=1.0))
+  reranked = SimulationOptions(conformer_search_options=ConformerSearchOptions(rerank=5))
+  assert plain.fingerprint() == pruned.fingerprint()
+  assert plain.fingerprint() != reranked.fingerprint()
@@ -0,0 +1,47 @@
+import pytest
+
+from morpheus.cli.checkpoint import Checkpoint, run_fingerprint
+from morpheus.molecule import Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.simulation import SimulationOptions
+from morpheus.simulation.options import GFNLevel
+
+HYDRATION = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+REACTANTS = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+
+def test_checkpoint_resume(tmp_path):
+  fingerprint = run_fingerprint(HYDRATION, REACTANTS, SimulationOptions())
+  checkpoint = Checkpoint(tmp_path, fingerprint)
+  checkpoint.record_species("O", -5.07)
+  checkpoint.record_species("C=O", None)
+  checkpoint.record_reaction(0)
+  checkpoint.close()
+  # simulate a run killed while writing
+  with open(tmp_path / "journal.jsonl", "a") as journal:
+    journal.write('{"reaction": 1')
+
+  resumed = Checkpoint(tmp_path, fingerprint, resume=True)
+  assert resumed.completed == {0}
+  assert resumed.energies == {"O": -5.07}
+  resumed.record_reaction(2)
+  resumed.close()
+  # the incomplete line is dropped, not continued by the next entry
+  resumed = Checkpoint(tmp_path, fingerprint, resume=True)
+  assert resumed.completed == {0, 2}
+  resumed.close()
+
+def test_checkpoint_refuses_changed_run(tmp_path):
+  Checkpoint(tmp_path, run_fingerprint(HYDRATION, REACTANTS, SimulationOptions())).close()
+  changed = [
+    run_fingerprint(HYDRATION, REACTANTS, SimulationOptions(gfn_level=GFNLevel.GFN2)),
+    run_fingerprint(HYDRATION, [[Smiles("C=O")], [Smiles("O")]], SimulationOptions()),
+    run_fingerprint(ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1]-[#8:2]"), REACTANTS, SimulationOptions()),
+    run_fingerprint(HYDRATION, REACTANTS, SimulationOptions(), settings={"outcomes": "min"}),
+  ]
+  for fingerprint in changed:
+    with pytest.raises(ValueError):
+      Checkpoint(tmp_path, fingerprint, resume=True)
+
+def test_checkpoint_missing(tmp_path):
+  with pytest.raises(ValueError):
+    Checkpoint(tmp_path / "missing", "", resume=True)
@@ -0,0 +1,83 @@
+import threading
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.scheduler.distributed import (
+  DistributedPipeline,
+  JobBoard,
+  parse_address,
+  run_worker,
+  serve,
+)
+from morpheus.simulation import SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+
+ENERGIES = {"C=O": -1.0, "CC=O": -2.0, "O": -0.5, "OCO": -1.6, "CC(O)O": -2.4}
+
+def test_board_reclaims_dead_worker():
+  board = JobBoard(SimulationOptions(), timeout=0.0)
+  board.add(["A", "B"])
+  assert board.request("dead") == "A"
+  # "dead" stopped sending heartbeats, its job is handed out again
+  assert board.request("alive") == "A"
+  board.submit("alive", "A", -1.0)
+  board.submit("dead", "A", -2.0)
+  assert board.request("alive") == "B"
+  board.submit("alive", "B", -3.0)
+  assert list(board.results(2)) == [("A", -1.0, None), ("B", -3.0, None)]
+
+def test_board_retries_failures():
+  board = JobBoard(SimulationOptions(), max_attempts=2)
+  board.add(["A"])
+  board.fail("w", board.request("w"), "xtb failed")
+  assert board.request("w") == "A"
+  board.fail("w", "A", "xtb failed")
+  assert board.request("w") == None
+  assert list(board.results(1)) == [("A", None, "xtb failed")]
+
+def test_parse_address():
+  assert parse_address("node1:6000") == ("node1", 6000)
+  assert parse_address(":6000") == ("0.0.0.0", 6000)
+  assert parse_address("node1") == ("node1", 50000)
+
+def test_coordinator_with_local_workers(tmp_path):
+  options = SimulationOptions(cache_path=tmp_path / "results.sqlite")
+  # the workers share a cache with the calculated energies, so xtb is not needed
+  worker_options = SimulationOptions(cache_path=tmp_path / "worker.sqlite")
+  cache = SimulationCache(worker_options.cache_path)
+  for smiles, energy in ENERGIES.items():
+    cache.write(CanonicalSmiles(Smiles(smiles)), options, energy)
+
+  board = JobBoard(options)
+  address = serve(board, ("127.0.0.1", 0), b"secret")
+  paths = set()
+
+  def calculate(simulation, key):
+    paths.add((simulation.options.tmp_path, simulation.options.cache_path))
+    return SimulationCache.shared(worker_options.cache_path).read(CanonicalSmiles(Smiles(key)), options)
+
+  done = []
+  workers = [
+    threading.Thread(target=lambda: done.append(run_worker(
+      address, b"secret", calculate, poll_interval=0.05, tmp_path=tmp_path / "worker", cache_path=None
+    )))
+    for _ in range(3)
+  ]
+  for worker in workers:
+    worker.start()
+
+  template = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+  reactants = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+  with DistributedPipeline(board, template, reactants, options, 1) as pipeline:
+    pipeline.enumerate()
+    results = list(pipeline.calculate())
+  board.finish()
+  for worker in workers:
+    worker.join()
+
+  assert [round(r.delta_g, 6) for r in results] == [-0.1, 0.1]
+  assert sum(done) == 5
+  # workers use their own paths, not the coordinator's
+  assert paths == {(tmp_path / "worker", None)}
+  # the coordinator stores every result
+  assert SimulationCache(options.cache_path).read(CanonicalSmiles(Smiles("OCO")), options) == -1.6
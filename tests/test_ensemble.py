@@ -0,0 +1,53 @@
+import math
+
+from morpheus.molecule.molecule import read_xyz_ensemble
+from morpheus.simulation.options import ConformerSearchMethod, ConformerSearchOptions, SimulationOptions
+from morpheus.simulation.result import K_B, CalculationResult, boltzmann_average
+
+CONFORMERS = """3
+       -5.07054444
+O          0.00000000    0.00000000    0.11730000
+H          0.00000000    0.75720000   -0.46920000
+H          0.00000000   -0.75720000   -0.46920000
+3
+       -5.06900000
+O          0.00000000    0.00000000    0.11000000
+H          0.00000000    0.76000000   -0.47000000
+H          0.00000000   -0.76000000   -0.47000000
+"""
+
+def test_read_xyz_ensemble(tmp_path):
+  path = tmp_path / "crest_conformers.xyz"
+  path.write_text(CONFORMERS)
+  conformers = read_xyz_ensemble(path)
+  assert [energy for energy, _ in conformers] == [-5.07054444, -5.069]
+  assert conformers[1][1].splitlines()[2].startswith("O")
+  assert read_xyz_ensemble(tmp_path / "missing.xyz") == []
+
+def test_boltzmann_average():
+  kt = K_B * 298.15
+  results = [
+    CalculationResult(free_energy=-1.0, enthalpy=-0.9, wall_time=2.0, converged=True),
+    CalculationResult(free_energy=-1.0, enthalpy=-0.8, wall_time=3.0, converged=True),
+    None,
+  ]
+  ensemble = boltzmann_average(results)
+  # two degenerate conformers lower G by kT ln 2
+  assert math.isclose(ensemble.free_energy, -1.0 - kt * math.log(2))
+  assert ensemble.enthalpy == -0.9
+  assert ensemble.wall_time == 5.0 and ensemble.conformers == 2 and ensemble.converged
+  # far higher conformers do not contribute
+  high = CalculationResult(free_energy=0.0)
+  assert math.isclose(boltzmann_average([results[0], high]).free_energy, -1.0)
+  assert boltzmann_average([None]) == None
+
+def test_ensemble_fingerprint():
+  crest = ConformerSearchOptions(ConformerSearchMethod.CREST)
+  ensemble = ConformerSearchOptions(ConformerSearchMethod.CREST, ensemble=5)
+  assert not crest.is_ensemble and ensemble.is_ensemble
+  assert not ConformerSearchOptions(ensemble=5).is_ensemble
+  fingerprints = {
+    SimulationOptions(conformer_search_options=options).fingerprint()
+    for options in [crest, ensemble, ConformerSearchOptions(ConformerSearchMethod.CREST, ensemble_window=2.0)]
+  }
+  assert len(fingerprints) == 3
@@ -0,0 +1,104 @@
+import pytest
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.scheduler import ReactionPipeline
+from morpheus.simulation import SimulationInstance, SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.funnel import FunnelStage, parse_stage
+from morpheus.simulation.options import GFNLevel
+
+HYDRATION = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+
+def test_parse_stage():
+  stage = parse_stage("mmff:top=100")
+  assert stage.level == None and stage.keep == 100 and stage.threshold == None
+  stage = parse_stage("gfn0:top=20:max=-0.01")
+  assert stage.level == GFNLevel.GFN0 and stage.keep == 20 and stage.threshold == -0.01
+  assert parse_stage("ff").level == GFNLevel.GFNFF
+  with pytest.raises(ValueError):
+    parse_stage("gfn3")
+  with pytest.raises(ValueError):
+    parse_stage("0:best=3")
+
+def test_stage_select():
+  scores = {0: 0.3, 1: None, 2: -0.2, 3: 0.1, 4: -0.4}
+  assert FunnelStage(keep=2).select(scores) == [1, 2, 4]
+  assert FunnelStage(threshold=0.1).select(scores) == [1, 2, 3, 4]
+  assert FunnelStage(keep=1, threshold=0.0).select(scores) == [1, 4]
+
+def test_stage_options():
+  base = SimulationOptions(gfn_level=GFNLevel.GFN2, xtb_cores=3, solvent=None)
+  options = FunnelStage(GFNLevel.GFNFF).options(base)
+  assert options.gfn_level == GFNLevel.GFNFF and options.xtb_cores == 3
+  assert options.conformer_search == None
+  assert FunnelStage().options(base) == None
+  assert "--gfnff" in SimulationInstance(options, SimulationCache()).xtb_command()
+  # a stage calculates with the backend of the run
+  stub = FunnelStage(GFNLevel.GFN0).options(SimulationOptions(backend="stub:0.1"))
+  assert stub.backend == "stub:0.1" and stub.fingerprint() != FunnelStage(GFNLevel.GFN0).options(base).fingerprint()
+
+def test_pipeline_screen(tmp_path):
+  options = SimulationOptions(gfn_level=GFNLevel.GFN2, cache_path=tmp_path / "cache.sqlite")
+  stage = FunnelStage(GFNLevel.GFN0, keep=1)
+  cache = SimulationCache(options.cache_path)
+  # at the cheap level the second reaction looks better, so the first one is dropped
+  cheap = {"C=O": -1.0, "CC=O": -2.0, "O": -0.5, "OCO": -1.4, "CC(O)O": -2.6}
+  final = {"O": -0.5, "CC=O": -2.0, "CC(O)O": -2.4}
+  for energies, level_options in [(cheap, stage.options(options)), (final, options)]:
+    for smiles, energy in energies.items():
+      cache.write(CanonicalSmiles(Smiles(smiles)), level_options, energy)
+
+  reactants = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+  with ReactionPipeline(HYDRATION, reactants, options, 2) as pipeline:
+    pipeline.enumerate()
+    [report] = list(pipeline.screen([stage]))
+    assert report.reactions == 2 and report.survivors == [1] and report.calculations == 5
+    assert pipeline.graph.unique_jobs == 3
+    results = list(pipeline.calculate())
+
+  assert [r.index for r in results] == [1]
+  assert round(results[0].delta_g, 6) == 0.1
+
+def test_pipeline_screen_force_field():
+  options = SimulationOptions(cache_path=None)
+  reactants = [[Smiles("C=O"), Smiles("CC=O"), Smiles("CCC=O")], [Smiles("O")]]
+  with ReactionPipeline(HYDRATION, reactants, options) as pipeline:
+    pipeline.enumerate()
+    [report] = list(pipeline.screen([FunnelStage(keep=2)]))
+  assert report.name == "mmff"
+  assert all(score is not None for score in report.scores.values())
+  assert len(report.survivors) == 2
+  assert sorted(pipeline.graph.reactions) == report.survivors
+
+def test_simulation_funnel():
+  from morpheus.molecule import Molecule
+  from morpheus.simulation import Simulation
+
+  options = SimulationOptions(cache_path=None)
+  simulation = Simulation(options, SimulationCache())
+  molecules = [Molecule(Smiles(smiles)) for smiles in ["C=O", "O", "CC=O"]]
+  for i, molecule in enumerate(molecules):
+    simulation.cache.write(molecule.canonical, options, -float(i))
+
+  mmff, final = simulation.funnel(molecules, [FunnelStage(keep=2)])
+  assert mmff.reactions == 3 and len(mmff.survivors) == 2
+  assert list(final.scores) == mmff.survivors
+  assert all(final.scores[i] == -float(i) for i in final.survivors)
+
+def test_simulation_funnel_unscored():
+  from morpheus.interfaces.delta_g import IDeltaG
+  from morpheus.simulation import Simulation
+
+  class Constant(IDeltaG):
+    def __init__(self, delta_g):
+      self.delta_g = delta_g
+
+    def calculate_delta_g(self, instance):
+      return self.delta_g
+
+  # objects without a force field energy can not be ranked and survive the stage
+  simulation = Simulation(SimulationOptions(cache_path=None), SimulationCache())
+  mmff, final = simulation.funnel([Constant(-1.0), Constant(-2.0)], [FunnelStage(keep=1)])
+  assert mmff.survivors == [0, 1] and all(score is None for score in mmff.scores.values())
+  assert final.scores == {0: -1.0, 1: -2.0}
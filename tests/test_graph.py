@@ -0,0 +1,50 @@
+from morpheus.scheduler import ReactionResult, TaskGraph
+from morpheus.scheduler.jobs import ReactionOutcome
+
+def reaction(index, reactants, products):
+  result = ReactionResult(index, reactants, products if products else None)
+  result.reactant_species = reactants
+  result.product_species = products
+  return result
+
+def test_graph_ordered_assembly():
+  graph = TaskGraph()
+  graph.add_reaction(reaction(0, ["A", "B"], ["AB"]))
+  graph.add_reaction(reaction(1, ["C"], []))
+  graph.add_reaction(reaction(2, ["A", "C"], ["AC"]))
+  assert graph.naive_jobs == 7
+  assert graph.unique_jobs == 5
+
+  graph.complete("A", -1.0)
+  graph.complete("C", -3.0)
+  graph.complete("AC", -4.5)
+  # reaction 0 is still missing species, reactions 1 and 2 have to wait for it
+  assert list(graph.pop_ready()) == []
+
+  graph.complete("B", -2.0)
+  graph.complete("AB", -3.5)
+  ready = list(graph.pop_ready())
+  assert [r.index for r in ready] == [0, 1, 2]
+  assert [r.delta_g for r in ready] == [-0.5, None, -0.5]
+
+def test_graph_failed_species():
+  graph = TaskGraph()
+  graph.add_reaction(reaction(0, ["A"], ["B"]))
+  graph.complete("A", None, "xtb failed")
+  graph.complete("B", -1.0)
+  ready = list(graph.pop_ready())
+  assert ready[0].delta_g == None
+  assert ready[0].error == "xtb failed"
+
+def test_graph_every_outcome_failed():
+  graph = TaskGraph()
+  result = reaction(0, ["A"], ["B"])
+  result.outcomes = [ReactionOutcome(["B"], ["B"]), ReactionOutcome(["C"], ["C"])]
+  graph.add_reaction(result)
+  graph.complete("A", -1.0)
+  graph.complete("B", None, "xtb failed")
+  # no single product is fatal, the reaction only fails once the last outcome does
+  assert list(graph.pop_ready()) == []
+  graph.complete("C", None, "xtb failed")
+  [ready] = list(graph.pop_ready())
+  assert ready.delta_g == None and ready.error == "no free energy for B, C"
@@ -0,0 +1,37 @@
+import itertools
+
+import pytest
+
+from morpheus.cli.helper import Combinations, get_combinations
+
+def test_combinations_order():
+  combinations = get_combinations([3, 1, 4])
+  expected = list(itertools.product(range(3), range(1), range(4)))
+  assert len(combinations) == len(expected)
+  assert list(combinations) == expected
+  assert [combinations[i] for i in range(len(combinations))] == expected
+  assert combinations[-1] == (2, 0, 3)
+  with pytest.raises(IndexError):
+    combinations[12]
+
+def test_combinations_large():
+  # never materialized
+  combinations = Combinations([18000, 18000, 100])
+  assert len(combinations) == 18000 * 18000 * 100
+  assert combinations[len(combinations) - 1] == (17999, 17999, 99)
+  assert combinations[18000 * 100 + 5] == (1, 0, 5)
+
+def test_combinations_shards():
+  combinations = Combinations([2, 5])
+  shards = list(combinations.shards(4))
+  assert shards == [range(0, 4), range(4, 8), range(8, 10)]
+  assert [index for shard in shards for index, _ in combinations.shard(shard.start, shard.stop)] == list(range(10))
+  assert list(combinations.shard(1, 10, 4)) == [(1, (0, 1)), (5, (1, 0)), (9, (1, 4))]
+
+def test_combinations_empty():
+  assert len(Combinations([])) == 0
+  assert list(Combinations([3, 0])) == []
+
+def test_combinations_index():
+  combinations = Combinations([3, 1, 4])
+  assert [combinations.index(combinations[i]) for i in range(len(combinations))] == list(range(12))
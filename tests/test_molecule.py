@@ -13,4 +13,58 @@ def test_molecule():
   assert benzene.smiles == Smiles("C1=CC=CC=C1")
   assert benzene.delta_g == None
   assert benzene.__str__() == "C1=CC=CC=C1"
-  assert Molecule().from_molecule(benzene.prepared_molecule).smiles == Smiles("C1=CC=CC=C1")
\ No newline at end of file
+  assert Molecule().from_molecule(benzene.prepared_molecule).smiles == Smiles("C1=CC=CC=C1")
+
+def test_rdkit_conformer_search(tmp_path):
+  from morpheus.simulation import SimulationInstance, SimulationOptions
+  from morpheus.simulation.cache import SimulationCache
+  from morpheus.simulation.options import ConformerSearchOptions
+
+  options = SimulationOptions(
+    xtb_cores=2,
+    conformer_search_options=ConformerSearchOptions(rdkit_level=10),
+    tmp_path=tmp_path,
+  )
+  instance = SimulationInstance(options, SimulationCache())
+  molecule = Molecule(Smiles("CCCCO"))
+  geometries = molecule.starting_geometries(instance)
+  # a single, optimized conformer is kept for xtb
+  assert len(geometries) == 1 and geometries[0].split()[0] == "15"
+  instance.close()
+
+def test_prune_conformers():
+  from rdkit.Chem import AllChem
+  from morpheus.molecule.molecule import prune_conformers
+
+  mol = Molecule(Smiles("CCCCCCO")).prepared_molecule
+  conformer_ids = list(AllChem.EmbedMultipleConfs(mol, 30, randomSeed=42))
+  energies = [energy for _, energy in AllChem.UFFOptimizeMoleculeConfs(mol)]
+  distinct = prune_conformers(mol, conformer_ids, energies, 0.5)
+  # the lowest conformer always survives, duplicates do not
+  assert distinct[0] == conformer_ids[energies.index(min(energies))]
+  assert len(distinct) < len(conformer_ids)
+  assert len(prune_conformers(mol, conformer_ids, energies, 0.5, energy_window=1.0)) <= len(distinct)
+  assert prune_conformers(mol, conformer_ids, energies, 0.5, limit=3) == distinct[:3]
+
+def test_registry():
+  from morpheus.molecule import CanonicalSmiles, MoleculeRegistry
+
+  registry = MoleculeRegistry()
+  ethanol = registry.get("OCC")
+  # every spelling shares the record of the canonical SMILES
+  assert registry.get("CCO") is ethanol and registry.get("C(O)C") is ethanol
+  assert ethanol.canonical == "CCO" and ethanol.hash == hash("CCO")
+  prepared = ethanol.prepared()
+  assert prepared.GetNumAtoms() == 9 and prepared is not ethanol.prepared()
+  with pytest.raises(ValueError):
+    registry.get("C1CC")
+
+  assert CanonicalSmiles(Smiles("OCC")) == "CCO"
+  smiles = Smiles("OCC")
+  assert Smiles(smiles) is smiles
+  assert Molecule(Smiles("OCC")) == Molecule(Smiles("CCO"))
+  assert len({Molecule(Smiles("OCC")), Molecule(Smiles("CCO")), Molecule(Smiles("CC"))}) == 2
+
+  registry = MoleculeRegistry(maxsize=1)
+  registry.get("C"), registry.get("CC")
+  assert "C" not in registry and "CC" in registry
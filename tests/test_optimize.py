@@ -0,0 +1,65 @@
+import numpy as np
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.optimize import BatchOptimizer, BayesianRidge, CandidateFeatures, GaussianProcess, SpeciesSurrogate
+from morpheus.reaction import ReactionTemplate
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import Solvent
+
+HYDRATION = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+
+def test_gaussian_process():
+  features = CandidateFeatures([["CCO", "CCCO", "CCCCO", "c1ccccc1O", "Oc1ccccc1C"]])
+  x = features(np.arange(5)[:, None])
+  y = np.array([1.0, 1.2, 1.4, -1.0, -1.1])
+  gp = GaussianProcess(features.kernel).fit(x[[0, 1, 3, 4]], y[[0, 1, 3, 4]])
+  mean, std = gp.predict(x)
+  assert np.allclose(mean[[0, 1, 3, 4]], y[[0, 1, 3, 4]], atol=0.1)
+  # the unseen alcohol is predicted like its neighbours, with more uncertainty
+  assert mean[2] > 0.5 and std[2] > std[0]
+
+  gp = GaussianProcess("rbf").fit(np.array([[0.0], [1.0], [2.0]]), np.array([0.0, 1.0, 2.0]))
+  assert abs(gp.predict(np.array([[1.5]]))[0][0] - 1.5) < 0.2
+
+def test_batch_optimizer():
+  simulation = Simulation(SimulationOptions(backend="stub", cache_path=None), SimulationCache())
+  reactants = [
+    [Smiles(smiles) for smiles in ["C=O", "CC=O", "CCC=O", "CC(C)=O", "CC"]],
+    [Smiles(smiles) for smiles in ["O", "CO"]],
+  ]
+  optimizer = BatchOptimizer(HYDRATION, reactants, simulation, batch_size=3, seed=0)
+  steps = list(optimizer.run(5))
+
+  # ethane can not react, the 8 other reactions are calculated once each
+  assert len(optimizer.candidate_combinations) == 8
+  indices = [reaction.index for step in steps for reaction in step.reactions]
+  assert sorted(indices) == sorted(set(indices)) and len(indices) == 8
+  assert [len(step.reactions) for step in steps] == [3, 3, 2]
+  best = min(optimizer.calculated, key=lambda reaction: reaction.delta_g)
+  assert steps[-1].best is optimizer.best() and optimizer.best().delta_g == best.delta_g
+
+def test_bayesian_ridge():
+  rng = np.random.default_rng(0)
+  x = rng.normal(size=(200, 3))
+  y = x @ np.array([1.0, -2.0, 0.5]) + rng.normal(scale=0.01, size=200)
+  model = BayesianRidge(3)
+  for row, value in zip(x, y):
+    model.update(row, value)
+  mean, std = model.predict(np.array([[1.0, 1.0, 1.0], [100.0, 0.0, 0.0]]))
+  assert abs(mean[0] + 0.5) < 0.01 and model.noise < 1e-3
+  # far from the observations, the prediction is less certain
+  assert std[1] > std[0]
+
+def test_species_surrogate(tmp_path):
+  options = SimulationOptions(backend="stub", cache_path=tmp_path / "cache.sqlite")
+  cache = SimulationCache(options.cache_path)
+  # free energies additive over heavy atoms
+  for n in range(1, 13):
+    cache.write(CanonicalSmiles(Smiles("C" * n + "O")), options, -1.0 * n - 2.0)
+  cache.write(CanonicalSmiles(Smiles("CC")), SimulationOptions(backend="stub", solvent=Solvent.WATER), -2.0)
+
+  surrogate = SpeciesSurrogate.from_cache(cache, options)
+  assert surrogate.observations == 12 and surrogate.update_many(cache.entries(options)) == 0
+  mean, std = surrogate.predict(["CCCCCCCCCCCCCO", "c1ccccc1"])
+  assert abs(mean[0] + 15.0) < 0.1 and std[1] > std[0]
@@ -0,0 +1,20 @@
+from morpheus.cli.parser.parser import get_options, get_parser, unsupported_level
+from morpheus.simulation.options import GFNLevel
+
+HYDRATION = r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]"
+
+def parse(*argv):
+  args = get_parser().parse_args(["-S", HYDRATION, "-s", "C=O", "O", "--no-cache", *argv])
+  args.subcmd = None
+  return get_options(args)
+
+def test_unsupported_level():
+  assert unsupported_level("xtb", [GFNLevel.GFN0, GFNLevel.GFNFF]) == None
+  assert unsupported_level("tblite", [GFNLevel.GFN2]) == None
+  # the re-ranking level defaults to gfnff, which tblite does not have
+  assert unsupported_level("tblite", [GFNLevel.GFN2, GFNLevel.GFNFF]) == GFNLevel.GFNFF
+
+def test_rerank_level_is_checked():
+  options = parse("--backend", "stub", "-cs", "-csm", "rdkit", "--conformer-rerank", "3")
+  assert options.conformer_search.rerank == 3
+  assert unsupported_level("tblite", [options.xtb_gfn, options.conformer_search.rerank_level]) == GFNLevel.GFNFF
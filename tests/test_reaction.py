@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from morpheus.molecule import Smiles
+from morpheus.reaction import Reaction, ReactionTemplate
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+
+def test_calculate_delta_gs():
+  simulation = Simulation(SimulationOptions(backend="stub", cache_path=None), SimulationCache())
+  reaction = Reaction(ReactionTemplate(r"[#6:1]=[#6:2]>>[#6:1](-[#8])-[#6:2]"))
+  reaction.add_reactants([Smiles("C=CC=C")])
+  delta_gs = reaction.calculate_delta_gs(simulation)
+
+  # both double bonds of butadiene give the same two products
+  assert len(reaction.products) == 4
+  assert sorted(outcome.outcome for outcome in reaction.outcomes) == [("C=CC(C)O",), ("C=CCCO",)]
+  assert len(delta_gs) == 2 and None not in delta_gs
+  assert reaction.best_outcome() in reaction.outcomes
+  assert reaction.outcomes[0].delta_g == delta_gs[0]
+
+def test_calculate_delta_gs_async():
+  simulation = Simulation(SimulationOptions(backend="stub", cache_path=None), SimulationCache())
+  template = ReactionTemplate(r"[#6:1]=[#6:2]>>[#6:1](-[#8])-[#6:2]")
+  reactions = [Reaction(template), Reaction(template)]
+  for reaction, smiles in zip(reactions, ["C=CC=C", "C=CC"]):
+    reaction.add_reactants([Smiles(smiles)])
+
+  # reactions can be calculated concurrently inside a running event loop
+  async def calculate():
+    return await asyncio.gather(*[reaction.calculate_delta_gs_async(simulation) for reaction in reactions])
+
+  delta_gs = asyncio.run(calculate())
+  assert [len(d) for d in delta_gs] == [2, 2] and delta_gs[0] == reactions[0].delta_gs
+
+def test_enumerate(tmp_path):
+  from morpheus.reaction.library import LibraryWriter, read_smiles
+
+  alkenes = tmp_path / "alkenes.smiles"
+  alkenes.write_text("C=CC\nC=CC=C\nnot a smiles\nC=CC\n")
+  template = ReactionTemplate(r"[#6:1]=[#6:2].[#8:3]>>[#6:1](-[#8:3])-[#6:2]")
+
+  first = list(template.enumerate([alkenes, ["O"]]))
+  assert first == ["CCCO", "C=CCCO"]
+  assert list(template.enumerate([str(alkenes), ["O"]])) == first
+  every = list(template.enumerate([alkenes, ["O"]], processes=2, all_outcomes=True))
+  with pytest.raises(ValueError):
+    template.enumerate([alkenes, ["O"]], product=1)
+  assert every == ["CCCO", "CC(C)O", "C=CCCO", "C=CC(C)O"]
+
+  with LibraryWriter(tmp_path / "library.smi.gz", shard_size=3) as writer:
+    for smiles in every:
+      writer.write(smiles)
+  assert [path.name for path in writer.paths] == ["library.00000.smi.gz", "library.00001.smi.gz"]
+  assert [smiles for path in writer.paths for smiles in read_smiles(path)] == every
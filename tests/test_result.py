@@ -0,0 +1,69 @@
+import sqlite3
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import SimulationOptions
+from morpheus.simulation.result import CalculationResult, parse_xtb_output
+
+OUTPUT = """
+   *** GEOMETRY OPTIMIZATION CONVERGED AFTER 5 ITERATIONS ***
+ # frequencies                                                    3
+ # imaginary freq.                                                0
+   temp. (K)  partition function   enthalpy   heat capacity  entropy
+    298.15  VIB          1.01                   17.480      0.051      0.015
+             ROT          43.2                   888.752      2.981     10.473
+             INT          43.6                   906.232      3.032     10.488
+             TR           0.304E+26             1481.254      4.968     34.608
+             TOT                                 2387.4859     8.0000    45.0962   188.6825
+ :: zero point energy           0.021347624183 Eh   ::
+ :: G(RRHO) contrib.            0.003877309893 Eh   ::
+          | TOTAL ENERGY               -5.070544440612 Eh   |
+          | TOTAL ENTHALPY             -5.045392136470 Eh   |
+          | TOTAL FREE ENERGY          -5.066667130719 Eh   |
+"""
+
+def test_parse_xtb_output(tmp_path):
+  path = tmp_path / "output.out"
+  path.write_text(OUTPUT)
+  result = parse_xtb_output(path)
+  assert result.free_energy == -5.066667130719
+  assert result.total_energy == -5.070544440612
+  assert result.enthalpy == -5.045392136470
+  assert result.zero_point_energy == 0.021347624183
+  assert result.g_rrho == 0.003877309893
+  assert result.entropy == 45.0962
+  assert result.imaginary_frequencies == 0
+  assert result.converged == True
+  assert result.wall_time == None
+
+def test_parse_missing_output(tmp_path):
+  assert parse_xtb_output(tmp_path / "output.out") == None
+
+def test_cache_result(tmp_path):
+  options = SimulationOptions()
+  path = tmp_path / "cache.sqlite"
+  water = CanonicalSmiles(Smiles("O"))
+  result = CalculationResult(free_energy=-5.07, entropy=45.1, wall_time=0.5, converged=True)
+  assert SimulationCache(path).compute(water, options, lambda: result) == -5.07
+  cache = SimulationCache(path)
+  assert cache.read(water, options) == -5.07
+  assert cache.read_result(water, options) == result
+  # plain values have no stored result
+  cache.write(CanonicalSmiles(Smiles("C")), options, -4.2)
+  assert cache.read_result(CanonicalSmiles(Smiles("C")), options) == None
+
+def test_cache_migration(tmp_path):
+  path = tmp_path / "cache.sqlite"
+  connection = sqlite3.connect(path)
+  connection.execute(
+    "CREATE TABLE results (fingerprint TEXT NOT NULL, smiles TEXT NOT NULL, "
+    "delta_g REAL NOT NULL, PRIMARY KEY (fingerprint, smiles))"
+  )
+  options = SimulationOptions()
+  connection.execute("INSERT INTO results VALUES (?, ?, ?)", (options.fingerprint(), "O", -5.07))
+  connection.commit()
+  connection.close()
+  cache = SimulationCache(path)
+  water = CanonicalSmiles(Smiles("O"))
+  assert cache.read(water, options) == -5.07
+  assert cache.read_result(water, options) == None
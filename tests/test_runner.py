@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from morpheus.molecule import CanonicalSmiles, Molecule, Smiles
+from morpheus.simulation import Simulation, SimulationInstance, SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import GFNLevel
+from morpheus.simulation.runner import Runner
+
+def test_runner_limits_concurrency(tmp_path):
+  runner = Runner(max_jobs=2)
+
+  async def run():
+    return await asyncio.gather(*[runner.run_async(["sleep", "0.2"], cwd=tmp_path) for _ in range(4)])
+
+  start = time.perf_counter()
+  assert asyncio.run(run()) == [0, 0, 0, 0]
+  assert time.perf_counter() - start >= 0.4
+
+def test_runner_cancel_kills_process(tmp_path):
+  runner = Runner()
+
+  async def run():
+    task = asyncio.create_task(runner.run_async(["sh", "-c", "echo $$ > pid; exec sleep 30"], cwd=tmp_path))
+    while not (tmp_path / "pid").exists() or not (tmp_path / "pid").read_text().strip():
+      await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await task
+
+  start = time.perf_counter()
+  asyncio.run(run())
+  assert time.perf_counter() - start < 5
+  with pytest.raises(ProcessLookupError):
+    os.kill(int((tmp_path / "pid").read_text()), 0)
+
+def test_runner_blocking(tmp_path):
+  assert Runner().run(["true"], cwd=tmp_path) == 0
+  assert Runner().run(["false"], cwd=tmp_path) == 1
+
+def test_simulation_gather_cached():
+  options = SimulationOptions(cache_path=None)
+  cache = SimulationCache()
+  for smiles, energy in [("O", -5.07), ("O=C=O", -10.3)]:
+    cache.write(CanonicalSmiles(Smiles(smiles)), options, energy)
+  simulation = Simulation(options, cache)
+  molecules = [Molecule(Smiles("O")), Molecule(Smiles("C(=O)=O")), Molecule(Smiles("O"))]
+  assert asyncio.run(simulation.gather(molecules)) == [-5.07, -10.3, -5.07]
+
+def test_runner_limits_threads_and_loops(tmp_path):
+  runner = Runner(max_jobs=2)
+
+  def run_loop():
+    async def run():
+      await asyncio.gather(*[runner.run_async(["sleep", "0.2"], cwd=tmp_path) for _ in range(2)])
+    asyncio.run(run())
+
+  # two event loops and two blocking runs share the two slots
+  threads = [threading.Thread(target=run_loop) for _ in range(2)]
+  threads += [threading.Thread(target=runner.run, args=(["sleep", "0.2"], tmp_path)) for _ in range(2)]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert time.perf_counter() - start >= 0.6
+
+def test_runner_job_nested(tmp_path):
+  runner = Runner(max_jobs=1)
+
+  def nested():
+    with runner.nested():
+      runner.run(["sleep", "0.3"], cwd=tmp_path)
+
+  # runs nested in a job share its slot, they do not queue for another one
+  start = time.perf_counter()
+  with runner.job():
+    threads = [threading.Thread(target=nested) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  assert time.perf_counter() - start < 0.9
+
+def test_fan_out_runs_overlap(tmp_path, monkeypatch):
+  # a fake xtb that only takes its time
+  binary = tmp_path / "bin" / "xtb"
+  binary.parent.mkdir()
+  binary.write_text("#!/bin/sh\nsleep 0.3\n")
+  binary.chmod(0o755)
+  monkeypatch.setenv("PATH", f"{binary.parent}{os.pathsep}{os.environ['PATH']}")
+
+  options = SimulationOptions(xtb_cores=4, cache_path=None, tmp_path=tmp_path / "ws")
+  instance = SimulationInstance(options, SimulationCache(), Runner(max_jobs=1))
+  xyzs = ["1\n\nO 0.0 0.0 0.0\n"] * 4
+  # the fanned out runs of a job share its single slot instead of queueing for it
+  for fan_out in [lambda: instance.single_points(xyzs, GFNLevel.GFN2), lambda: instance.calculate_ensemble(xyzs)]:
+    start = time.perf_counter()
+    fan_out()
+    assert time.perf_counter() - start < 0.9
@@ -0,0 +1,160 @@
+import os
+
+from morpheus.molecule import CanonicalSmiles, Smiles
+from morpheus.optimize import SpeciesSurrogate
+from morpheus.reaction import ReactionTemplate
+from morpheus.scheduler import ReactionPipeline, Scheduler, jobs
+from morpheus.scheduler.pipeline import PREDICTION_ROUND
+from morpheus.simulation import SimulationOptions
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.options import Solvent
+
+def square_with_pid(x):
+  return x * x, os.getpid()
+
+def test_scheduler_ordered():
+  with Scheduler(3) as scheduler:
+    results = list(scheduler.map(square_with_pid, range(20)))
+  assert [r for r, _ in results] == [x * x for x in range(20)]
+  assert os.getpid() not in [pid for _, pid in results]
+
+def test_scheduler_unordered():
+  with Scheduler(2) as scheduler:
+    results = list(scheduler.map_unordered(square_with_pid, range(20)))
+  assert sorted(r for r, _ in results) == [x * x for x in range(20)]
+
+def test_scheduler_inline():
+  with Scheduler(1) as scheduler:
+    results = list(scheduler.map(square_with_pid, range(3)))
+  assert results == [(0, os.getpid()), (1, os.getpid()), (4, os.getpid())]
+
+HYDRATION = ReactionTemplate(r"[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+
+def test_pipeline_without_products():
+  options = SimulationOptions(cache_path=None)
+  with ReactionPipeline(HYDRATION, [[Smiles("CC")], [Smiles("O")]], options, 2, prefilter=False) as pipeline:
+    graph = pipeline.enumerate()
+    assert graph.unique_jobs == 0
+    results = list(pipeline.calculate())
+  assert [r.reactants for r in results] == [["CC", "O"]]
+  assert results[0].products == None and results[0].delta_g == None
+
+def test_pipeline_prefilter():
+  options = SimulationOptions(backend="stub", cache_path=None)
+  reactants = [[Smiles("CC"), Smiles("C=O"), Smiles("CCC"), Smiles("CC=O")], [Smiles("C"), Smiles("O")]]
+  with ReactionPipeline(HYDRATION, reactants, options, 2) as pipeline:
+    assert pipeline.candidates == [[1, 3], [1]]
+    pipeline.enumerate()
+    results = list(pipeline.calculate())
+  # indices of the full combinations are kept
+  assert [r.index for r in results] == [3, 7]
+  assert [r.reactants for r in results] == [["C=O", "O"], ["CC=O", "O"]]
+
+  with ReactionPipeline(HYDRATION, reactants, options, prefilter=False) as pipeline:
+    pipeline.enumerate()
+    unfiltered = [r for r in pipeline.calculate() if r.products]
+  assert [(r.index, r.delta_g) for r in unfiltered] == [(r.index, r.delta_g) for r in results]
+
+def test_pipeline_skip(monkeypatch):
+  options = SimulationOptions(backend="stub", cache_path=None)
+  reactants = [[Smiles("CC"), Smiles("C=O"), Smiles("CCC"), Smiles("CC=O")], [Smiles("C"), Smiles("O")]]
+  reacted = []
+  react = jobs.react
+  monkeypatch.setattr(jobs, "react", lambda template, index, *args: reacted.append(index) or react(template, index, *args))
+  with ReactionPipeline(HYDRATION, reactants, options) as pipeline:
+    graph = pipeline.enumerate(shards=[range(0, 1), range(1, 2)], skip={3, 4})
+  # finished reactions are never run again
+  assert reacted == [7]
+  assert list(graph.reactions) == [7]
+
+def test_pipeline_deduplicates_species(tmp_path):
+  options = SimulationOptions(cache_path=tmp_path / "cache.sqlite")
+  # seed the cache, so no xtb calculation is necessary
+  cache = SimulationCache(options.cache_path)
+  energies = {"C=O": -1.0, "CC=O": -2.0, "O": -0.5, "OCO": -1.6, "CC(O)O": -2.4}
+  for smiles, energy in energies.items():
+    cache.write(CanonicalSmiles(Smiles(smiles)), options, energy)
+
+  reactants = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+  with ReactionPipeline(HYDRATION, reactants, options, 2) as pipeline:
+    graph = pipeline.enumerate()
+    assert graph.naive_jobs == 6
+    assert graph.unique_jobs == 5
+    results = list(pipeline.calculate())
+
+  assert [r.index for r in results] == [0, 1]
+  assert [round(r.delta_g, 6) for r in results] == [-0.1, 0.1]
+
+def test_pipeline_solvent_sweep():
+  options = SimulationOptions(backend="stub", cache_path=None)
+  reactants = [[Smiles("C=O"), Smiles("CC=O")], [Smiles("O")]]
+  solvents = [Solvent.WATER, None]
+  for processes in [1, 2]:
+    with ReactionPipeline(HYDRATION, reactants, options, processes, solvents=solvents) as pipeline:
+      pipeline.enumerate()
+      results = list(pipeline.calculate())
+    assert [r.index for r in results] == [0, 1]
+    for reaction in results:
+      assert list(reaction.delta_gs) == ["water", "gas"]
+      assert reaction.delta_g == reaction.delta_gs["water"]
+      assert reaction.delta_gs["water"] != reaction.delta_gs["gas"]
+
+  # every solvent is cached under its own fingerprint, like a single solvent run
+  with ReactionPipeline(HYDRATION, reactants, options.with_solvent(Solvent.WATER)) as pipeline:
+    pipeline.enumerate()
+    assert [r.delta_g for r in pipeline.calculate()] == [r.delta_gs["water"] for r in results]
+
+def test_pipeline_outcomes(tmp_path):
+  options = SimulationOptions(cache_path=tmp_path / "cache.sqlite")
+  cache = SimulationCache(options.cache_path)
+  # Markovnikov and anti-Markovnikov hydration of propene, the diene has symmetric matches
+  energies = {"C=CC": -1.0, "CCCO": -2.0, "CC(C)O": -2.5, "C=CC=C": -1.5, "C=CCCO": -3.0, "C=CC(C)O": -2.9}
+  for smiles, energy in energies.items():
+    cache.write(CanonicalSmiles(Smiles(smiles)), options, energy)
+  template = ReactionTemplate(r"[#6:1]=[#6:2]>>[#6:1](-[#8])-[#6:2]")
+  reactants = [[Smiles("C=CC"), Smiles("C=CC=C")]]
+
+  results = {}
+  for outcomes in ["first", "min", "all"]:
+    with ReactionPipeline(template, reactants, options, outcomes=outcomes) as pipeline:
+      pipeline.enumerate()
+      results[outcomes] = list(pipeline.calculate())
+
+  assert [len(r.outcomes) for r in results["first"]] == [1, 1]
+  assert [len(r.outcomes) for r in results["all"]] == [2, 2]
+  assert [r.products for r in results["min"]] == [["CC(C)O"], ["C=CCCO"]]
+  assert [round(r.delta_g, 6) for r in results["min"]] == [-1.5, -1.5]
+  assert sorted(round(o.delta_g, 6) for o in results["all"][0].outcomes) == [-1.5, -1.0]
+
+def test_pipeline_prediction():
+  options = SimulationOptions(backend="stub", cache_path=None)
+  reactants = [
+    [Smiles("C" * n + "=O") for n in range(1, 11)],
+    [Smiles(smiles) for smiles in ["O", "CO", "CCO", "CCCO"]],
+  ]
+  with ReactionPipeline(HYDRATION, reactants, options) as pipeline:
+    pipeline.enumerate()
+    calculated = {r.index: r.delta_g for r in pipeline.calculate()}
+
+  surrogate = SpeciesSurrogate()
+  species = []
+  with ReactionPipeline(HYDRATION, reactants, options, surrogate=surrogate, tolerance=100.0) as pipeline:
+    pipeline.enumerate()
+    results = list(pipeline.calculate(lambda key, delta_g: species.append(key)))
+  # a first round is calculated to train the surrogate, the rest is predicted
+  assert len(species) == PREDICTION_ROUND and surrogate.observations == len(species)
+  assert len(pipeline.predicted) == pipeline.graph.unique_jobs - len(species)
+  assert [r.index for r in results] == sorted(calculated)
+  predicted = [r for r in results if r.predicted]
+  assert 0 < len(predicted) < len(results)
+  for r in results:
+    assert r.delta_g is not None
+    if not r.predicted:
+      assert r.delta_g == calculated[r.index]
+
+  # without tolerance every species is calculated
+  with ReactionPipeline(HYDRATION, reactants, options, surrogate=SpeciesSurrogate()) as pipeline:
+    pipeline.enumerate()
+    results = list(pipeline.calculate())
+  assert not pipeline.predicted and not any(r.predicted for r in results)
+  assert {r.index: r.delta_g for r in results} == calculated
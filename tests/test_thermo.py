@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from morpheus.molecule import Molecule, Smiles
+from morpheus.reaction import ReactionTemplate
+from morpheus.simulation import Simulation, SimulationOptions
+from morpheus.simulation.backend import StubBackend
+from morpheus.simulation.cache import SimulationCache
+from morpheus.simulation.result import CalculationResult
+from morpheus.simulation.thermo import (
+  BOLTZMANN,
+  HARTREE,
+  frequencies,
+  parse_temperatures,
+  rrho,
+)
+
+ARGON = """1
+
+Ar 0.0 0.0 0.0"""
+
+HYDROGEN = """2
+
+H 0.0 0.0 0.0
+H 0.0 0.0 0.74"""
+
+def test_parse_temperatures():
+  assert parse_temperatures("250:400:50") == [250, 300, 350, 400]
+  assert parse_temperatures("250, 298.15") == [250, 298.15]
+  with pytest.raises(ValueError):
+    parse_temperatures("400:250:10")
+  with pytest.raises(ValueError):
+    parse_temperatures("warm")
+
+def test_translational_entropy():
+  # Sackur-Tetrode entropy of argon at 298.15 K and 1 atm is 154.7 J/(mol K)
+  temperatures = np.array([298.15, 298.16])
+  g = rrho(ARGON, np.array([]), temperatures) * HARTREE
+  entropy = -(g[1] - g[0]) / (temperatures[1] - temperatures[0])
+  assert entropy / BOLTZMANN * 8.314462618 == pytest.approx(154.7, abs=0.2)
+
+def test_spring_frequency():
+  mol = StubBackend.molecule(HYDROGEN)
+  wavenumbers = frequencies(HYDROGEN, StubBackend.hessian(mol))
+  # one bond stretch, translations and rotations are projected out
+  assert len([nu for nu in wavenumbers if abs(nu) > 1]) == 1
+  reduced_mass = 1.00794 / 2 * 1.66053906660e-27
+  force_constant = 0.4 * 4.3597447222071e-18 / 0.529177210903e-10**2
+  expected = np.sqrt(force_constant / reduced_mass) / (2 * np.pi * 2.99792458e10)
+  assert max(wavenumbers) == pytest.approx(expected, rel=1e-3)
+
+def test_cache_hessian(tmp_path):
+  options = SimulationOptions(cache_path=None)
+  hessian = np.arange(9, dtype=float).reshape(3, 3)
+  result = CalculationResult(free_energy=-1.0, total_energy=-1.1, geometry=ARGON, hessian=hessian)
+
+  cache = SimulationCache(tmp_path / "cache.sqlite")
+  cache.write(Smiles("[Ar]"), options, result)
+  geometry, stored = SimulationCache(tmp_path / "cache.sqlite").read_hessian(Smiles("[Ar]"), options)
+  assert geometry == ARGON
+  assert np.array_equal(stored, hessian)
+
+  memory = SimulationCache()
+  memory.write(Smiles("[Ar]"), options, result)
+  assert memory.read_hessian(Smiles("[Ar]"), options)[0] == ARGON
+  assert memory.read_hessian(Smiles("O"), options) is None
+
+def test_temperature_scan():
+  simulation = Simulation(SimulationOptions(backend="stub", cache_path=None), SimulationCache())
+  reaction = ReactionTemplate("[#6:1]=[#8:2].[#8:3]>>[#6:1](-[#8:3])-[#8:2]")
+  products = reaction.run_reaction([Molecule(Smiles("C=O")), Molecule(Smiles("O"))])[0]
+
+  delta_g = simulation.temperature_scan(products, [250, 298.15, 400])
+  assert delta_g.shape == (3,)
+  # forming one molecule of two loses entropy, ΔG rises with the temperature
+  assert delta_g[0] < delta_g[1] < delta_g[2]
+  # species calculated before hessians were stored have no scan
+  simulation.cache.write(Smiles("C"), simulation.options, -1.0)
+  assert simulation.temperature_scan(Molecule(Smiles("C")), [298.15]) is None
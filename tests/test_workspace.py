@@ -0,0 +1,35 @@
+import os
+import socket
+
+from morpheus.simulation.workspace import WorkspacePool, collect_garbage
+
+def test_workspace_reuse(tmp_path):
+  pool = WorkspacePool(tmp_path, size=1)
+  workspace = pool.acquire()
+  assert workspace.path.exists()
+  workspace.inp_path.write_text("xyz")
+  (workspace.path / "xtbopt.xyz").write_text("xyz")
+  pool.release(workspace)
+  # the directory is cleaned and handed out again
+  assert pool.acquire() is workspace
+  assert [p.name for p in workspace.path.iterdir() if not p.name.startswith("param")] == []
+
+def test_workspace_concurrent(tmp_path):
+  pool = WorkspacePool(tmp_path)
+  first, second = pool.acquire(), pool.acquire()
+  assert first.path != second.path
+
+def test_workspace_shared(tmp_path):
+  assert WorkspacePool.shared(tmp_path) is WorkspacePool.shared(tmp_path)
+
+def test_workspace_garbage_collection(tmp_path):
+  host = socket.gethostname()
+  # pid 2**22 + 1 is above the maximum pid on linux, so it can not be running
+  stale = tmp_path / f"ws-{host}-{2**22 + 1}-0"
+  alive = tmp_path / f"ws-{host}-{os.getpid()}-0"
+  other = tmp_path / "results"
+  for path in [stale, alive, other]:
+    path.mkdir()
+  collect_garbage(tmp_path)
+  assert not stale.exists()
+  assert alive.exists() and other.exists()
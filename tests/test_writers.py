@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from morpheus.cli.output import Output
+from morpheus.cli.parser.options import FileFormat
+from morpheus.cli.writers import open_writer
+from morpheus.simulation import SimulationOptions
+from morpheus.utils.units import EnergyUnit, EnergyValue
+
+RECORD = {"index": 1, "reactants": ["C=O", "O"], "products": ["OCO"], "delta_g (Eh)": -0.1}
+
+def test_jsonl_append(tmp_path):
+  path = tmp_path / "out.jsonl"
+  for _ in range(2):
+    writer = open_writer(FileFormat.JSONL, path, append=True)
+    writer.write(RECORD)
+    writer.close()
+  assert [json.loads(line) for line in path.read_text().splitlines()] == [RECORD, RECORD]
+
+def test_csv_append(tmp_path):
+  path = tmp_path / "out.csv"
+  for _ in range(2):
+    writer = open_writer(FileFormat.CSV, path, append=True)
+    writer.write(RECORD)
+    writer.close()
+  assert path.read_text().splitlines() == [
+    "index,reactants,products,delta_g (Eh)",
+    "1,C=O.O,OCO,-0.1",
+    "1,C=O.O,OCO,-0.1",
+  ]
+
+def test_json_streamed(tmp_path):
+  path = tmp_path / "out.json"
+  writer = open_writer(FileFormat.JSON, path)
+  writer.write(RECORD)
+  # every record is on disk before the writer is closed
+  assert "OCO" in path.read_text()
+  writer.write(RECORD)
+  writer.close()
+  assert json.loads(path.read_text()) == [RECORD, RECORD]
+  with pytest.raises(ValueError):
+    open_writer(FileFormat.JSON, path, append=True)
+
+def test_output(tmp_path):
+  output = Output(SimulationOptions())
+  paths = output.open([FileFormat.JSONL, FileFormat.CSV], tmp_path / "delta_g")
+  assert paths == [tmp_path / "delta_g.jsonl", tmp_path / "delta_g.csv"]
+  output.add_reaction(1, ["C=O", "O"], ["OCO"], EnergyValue(-0.1, EnergyUnit.Eh))
+  output.close()
+  assert json.loads(paths[0].read_text()) == RECORD
+
+def test_output_sweep_columns(tmp_path):
+  output = Output(SimulationOptions(), ["water", "gas"])
+  [path] = output.open([FileFormat.CSV], tmp_path / "delta_g")
+  # an outcome that failed in every solvent comes first, it still has every column
+  output.add_reaction(1, ["C=O", "O"], ["OCO"], EnergyValue(None, EnergyUnit.Eh), outcome=1)
+  output.add_reaction(1, ["C=O", "O"], ["OCO"], EnergyValue(-0.1, EnergyUnit.Eh), None, {"water": -0.1, "gas": -0.05}, 2)
+  output.close()
+  assert path.read_text().splitlines() == [
+    "index,outcome,reactants,products,delta_g (Eh),delta_g water (Eh),delta_g gas (Eh)",
+    "1,1,C=O.O,OCO,,,",
+    "1,2,C=O.O,OCO,-0.1,-0.1,-0.05",
+  ]